@@ -0,0 +1,86 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Runs the benchmarks without asv, eg. to get a quick baseline:
+
+    python -m benchmarks [substring of the benchmark names]
+
+The time_* benchmarks report the best time of a call, the track_* ones
+their value. The peakmem_* ones need asv.
+"""
+
+import itertools
+import sys
+import timeit
+
+from benchmarks import bench_client
+from benchmarks import bench_fleet
+from benchmarks import bench_wsman
+
+MODULES = (bench_wsman, bench_client, bench_fleet)
+REPEAT = 5
+
+
+def _benchmarks():
+    for module in MODULES:
+        for (suite_name, suite) in sorted(vars(module).items()):
+            if not (isinstance(suite, type) and suite_name.endswith('Suite')):
+                continue
+
+            for name in sorted(vars(suite)):
+                if name.startswith(('time_', 'track_')):
+                    yield ('%s.%s.%s' % (module.__name__.split('.')[-1],
+                                         suite_name, name), suite, name)
+
+
+def _run(suite, name, args):
+    instance = suite()
+    getattr(instance, 'setup', lambda *args: None)(*args)
+    try:
+        method = getattr(instance, name)
+        if name.startswith('track_'):
+            return '%s %s' % (method(*args), getattr(method, 'unit', ''))
+
+        timer = timeit.Timer(lambda: method(*args))
+        number, _ = timer.autorange()
+        best = min(timer.repeat(REPEAT, number)) / number
+        return '%.3f ms' % (best * 1000)
+    finally:
+        getattr(instance, 'teardown', lambda *args: None)(*args)
+
+
+def _combinations(suite):
+    params = getattr(suite, 'params', None)
+    if params is None:
+        return [()]
+    elif params and isinstance(params[0], (list, tuple)):
+        return list(itertools.product(*params))
+
+    return [(param,) for param in params]
+
+
+def main(argv):
+    pattern = argv[1] if len(argv) > 1 else ''
+    for (full_name, suite, name) in _benchmarks():
+        for args in _combinations(suite):
+            label = full_name
+            if args:
+                label += '(%s)' % ', '.join(str(arg) for arg in args)
+            if pattern in label:
+                print('%-70s %s' % (label, _run(suite, name, args)))
+                sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,82 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+End-to-end benchmarks of the DRACClient methods over the stub transport
+"""
+
+import tracemalloc
+
+from benchmarks import stub
+
+# DRACClient methods called for each resource group
+METHODS = {
+    'bios': ('list_bios_settings',),
+    'boot': ('list_boot_modes', 'list_boot_devices'),
+    'raid': ('list_raid_controllers', 'list_virtual_disks',
+             'list_physical_disks'),
+    'jobs': ('list_jobs',),
+    'lc': ('get_lifecycle_controller_version',),
+}
+
+
+class ClientSuite(object):
+    """Latency and memory of the DRACClient methods of each resource group
+
+    The requests go through the whole client, from building the payloads to
+    parsing the items, only the network is replaced by stub.ReplayAdapter.
+    """
+
+    params = stub.SCENARIOS
+    param_names = ['scenario']
+
+    def setup(self, scenario):
+        self.adapter = stub.ReplayAdapter(
+            stub.scenario_enumerations(scenario))
+        self.client = stub.create_client(self.adapter)
+        self.methods = [getattr(self.client, name)
+                        for name in METHODS[scenario.partition('-')[0]]]
+        # warms up the payload templates and the pages of the stub
+        self._call()
+
+    def teardown(self, scenario):
+        self.client.close()
+
+    def time_call(self, scenario):
+        self._call()
+
+    def peakmem_call(self, scenario):
+        self._call()
+
+    def track_peak_allocated(self, scenario):
+        # allocations of the Python objects only, the trees are allocated
+        # by libxml2 and show up in peakmem_call instead
+        tracemalloc.start()
+        try:
+            self._call()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    track_peak_allocated.unit = 'bytes'
+
+    def track_requests(self, scenario):
+        requests = self.adapter.requests
+        self._call()
+        return self.adapter.requests - requests
+
+    track_requests.unit = 'requests'
+
+    def _call(self):
+        for method in self.methods:
+            method()
@@ -0,0 +1,50 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Fleet-level benchmarks against the WS-Man simulator
+"""
+
+from dracclient import aiosimulator
+import dracclient.fleet
+
+# number of seconds every simulated request takes
+LATENCY = 0.01
+
+
+class FleetSuite(object):
+    """Throughput of FleetClient over simulated DRAC interfaces
+
+    Each run lists the jobs of every virtual host, over real sockets.
+    """
+
+    params = ([10, 100], [dracclient.fleet.MODE_THREAD,
+                          dracclient.fleet.MODE_ASYNCIO])
+    param_names = ['hosts', 'mode']
+
+    def setup(self, hosts, mode):
+        self.simulator = aiosimulator.Simulator(hosts=hosts, latency=LATENCY)
+        self._running = self.simulator.in_thread()
+        self._running.__enter__()
+        self.fleet = dracclient.fleet.FleetClient(self.simulator.nodes,
+                                                  max_concurrency=hosts,
+                                                  mode=mode)
+
+    def teardown(self, hosts, mode):
+        self.fleet.close()
+        self._running.__exit__(None, None, None)
+
+    def time_list_jobs(self, hosts, mode):
+        for result in self.fleet.run('list_jobs'):
+            if result.exception is not None:
+                raise result.exception
@@ -0,0 +1,101 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Benchmarks of building the WS-Man payloads and parsing the responses
+"""
+
+from lxml import etree as ElementTree
+
+from benchmarks import stub
+from dracclient.resources import job
+from dracclient.resources import uris
+from dracclient import wsman
+
+ENDPOINT = 'https://1.2.3.4:443/wsman'
+MESSAGE_ID = 'uuid:00000000-0000-0000-0000-000000000000'
+
+
+class PayloadBuildSuite(object):
+    """Building the payloads of the requests sent by DRACClient"""
+
+    def setup(self):
+        self.job_filter = job.JobManagement(None)._jobs_filter_query(
+            ['JID_%012d' % index for index in range(job.MAX_JOBS_PER_QUERY)])
+
+    def time_enumerate(self):
+        wsman._EnumeratePayload(ENDPOINT, uris.DCIM_BIOSEnumeration).build()
+
+    def time_enumerate_with_filter(self):
+        wsman._EnumeratePayload(ENDPOINT, uris.DCIM_LifecycleJob,
+                                filter_query=self.job_filter,
+                                filter_dialect='cql').build()
+
+    def time_enumerate_tree(self):
+        # the serialization of the whole document, bypassing the templates
+        payload = wsman._EnumeratePayload(ENDPOINT, uris.DCIM_BIOSEnumeration)
+        payload.message_id = MESSAGE_ID
+        payload._build_tree()
+
+    def time_pull(self):
+        wsman._PullPayload(ENDPOINT, uris.DCIM_BIOSEnumeration,
+                           'page-100').build()
+
+
+class SetAttributesPayloadSuite(object):
+    """Building the SetAttributes payload of set_bios_settings"""
+
+    params = [1, 100, 1000]
+    param_names = ['attributes']
+
+    def setup(self, attributes):
+        self.selectors = {'CreationClassName': 'DCIM_BIOSService',
+                          'Name': 'DCIM:BIOSService',
+                          'SystemCreationClassName': 'DCIM_ComputerSystem',
+                          'SystemName': 'DCIM:ComputerSystem'}
+        self.properties = {
+            'Target': 'BIOS.Setup.1-1',
+            'AttributeName': ['Attribute%d' % i for i in range(attributes)],
+            'AttributeValue': ['Value%d' % i for i in range(attributes)]}
+
+    def time_build(self, attributes):
+        wsman._InvokePayload(ENDPOINT, uris.DCIM_BIOSService,
+                             'SetAttributes', self.selectors,
+                             self.properties).build()
+
+
+class ResponseParseSuite(object):
+    """Parsing the enumeration responses of each resource group
+
+    The scale-ups are parsed as a single response, see bench_client for
+    the paged enumerations.
+    """
+
+    params = stub.SCENARIOS
+    param_names = ['scenario']
+
+    def setup(self, scenario):
+        self.bodies = stub.scenario_enumerations(scenario)
+        self.items = dict(
+            (resource_uri, wsman._enum_items(ElementTree.fromstring(body)))
+            for (resource_uri, body) in self.bodies.items())
+
+    def time_parse_document(self, scenario):
+        for body in self.bodies.values():
+            ElementTree.fromstring(body)
+
+    def time_parse_items(self, scenario):
+        for (resource_uri, items) in self.items.items():
+            parser = stub.ITEM_PARSERS[resource_uri]
+            for item in items:
+                parser(item)
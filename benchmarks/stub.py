@@ -0,0 +1,197 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Local transport replaying the WS-Man responses of the test fixtures
+"""
+
+import copy
+import io
+
+from lxml import etree as ElementTree
+import requests
+import requests.adapters
+import requests.structures
+
+import dracclient.client
+from dracclient import replay
+from dracclient.resources import bios
+from dracclient.resources import job
+from dracclient.resources import lifecycle_controller
+from dracclient.resources import raid
+from dracclient.resources import uris
+from dracclient import wsman
+
+# parameters of the stub DRAC interface
+ENDPOINT = {
+    'host': '1.2.3.4',
+    'port': '443',
+    'path': '/wsman',
+    'protocol': 'https',
+    'username': 'admin',
+    'password': 's3cr3t'
+}
+
+# resources enumerated by the benchmarked methods of each group
+RESOURCE_GROUPS = {
+    'bios': (uris.DCIM_BIOSEnumeration, uris.DCIM_BIOSString,
+             uris.DCIM_BIOSInteger),
+    'boot': (uris.DCIM_BootConfigSetting, uris.DCIM_BootSourceSetting),
+    'raid': (uris.DCIM_ControllerView, uris.DCIM_VirtualDiskView,
+             uris.DCIM_PhysicalDiskView),
+    'jobs': (uris.DCIM_LifecycleJob,),
+    'lc': (uris.DCIM_SystemView,),
+}
+
+# number of items of the synthetic scale-ups of the groups, spread over
+# their resources
+SCALE_UPS = {
+    'bios': 5000,
+    'raid': 300,
+    'jobs': 500,
+}
+
+# groups as in the fixtures, followed by their scale-ups, eg. 'jobs-500'
+SCENARIOS = sorted(list(RESOURCE_GROUPS) +
+                   ['%s-%d' % item for item in SCALE_UPS.items()])
+
+FIXTURES = dict((resource_uri, replay.DEFAULT_ENUMERATIONS[resource_uri])
+                for resource_uris in RESOURCE_GROUPS.values()
+                for resource_uri in resource_uris)
+
+# parsers of a single item of each resource
+ITEM_PARSERS = {
+    uris.DCIM_BIOSEnumeration: bios.BIOSEnumerableAttribute.parse,
+    uris.DCIM_BIOSString: bios.BIOSStringAttribute.parse,
+    uris.DCIM_BIOSInteger: bios.BIOSIntegerAttribute.parse,
+    uris.DCIM_BootConfigSetting:
+        bios.BootManagement(None)._parse_drac_boot_mode,
+    uris.DCIM_BootSourceSetting:
+        bios.BootManagement(None)._parse_drac_boot_device,
+    uris.DCIM_ControllerView:
+        raid.RAIDManagement(None)._parse_drac_raid_controller,
+    uris.DCIM_VirtualDiskView:
+        raid.RAIDManagement(None)._parse_drac_virtual_disk,
+    uris.DCIM_PhysicalDiskView:
+        raid.RAIDManagement(None)._parse_drac_physical_disk,
+    uris.DCIM_LifecycleJob: job.JobManagement(None)._parse_drac_job,
+    uris.DCIM_SystemView:
+        lifecycle_controller.LifecycleControllerManagement(
+            None)._parse_version,
+}
+
+# fields made unique in the items of the scale-ups
+UNIQUE_FIELDS = ('InstanceID', 'AttributeName')
+
+
+def scale_up(body, count):
+    """Returns an enumeration response with the items repeated
+
+    :param body: enumeration response used as a template
+    :param count: number of items of the new response. The items of the
+                  template are repeated in order, with the UNIQUE_FIELDS
+                  suffixed by the index of the item.
+    :returns: the new response as bytes
+    """
+    if not isinstance(body, bytes):
+        body = body.encode('utf-8')
+
+    doc = ElementTree.fromstring(body)
+    items_elem = doc.find('.//{%s}Items' % wsman.NS_WSMAN)
+    templates = list(items_elem.iterchildren(ElementTree.Element))
+    for item in list(items_elem):
+        items_elem.remove(item)
+
+    for index in range(count):
+        item = copy.deepcopy(templates[index % len(templates)])
+        for field in UNIQUE_FIELDS:
+            field_elem = item.find('{*}%s' % field)
+            if field_elem is not None:
+                field_elem.text = '%s_%d' % (field_elem.text, index)
+        items_elem.append(item)
+
+    return ElementTree.tostring(doc)
+
+
+def scenario_enumerations(scenario):
+    """Returns the enumeration responses of a scenario
+
+    :param scenario: name of a resource group, eg. 'bios', optionally
+                     followed by the number of items of its scale-up, eg.
+                     'bios-5000'
+    :returns: a dictionary of resource URIs and enumeration responses
+    """
+    group, _, count = scenario.partition('-')
+    resource_uris = RESOURCE_GROUPS[group]
+    if not count:
+        return dict((resource_uri, FIXTURES[resource_uri])
+                    for resource_uri in resource_uris)
+
+    per_resource, remainder = divmod(int(count), len(resource_uris))
+    return dict(
+        (resource_uri,
+         scale_up(FIXTURES[resource_uri],
+                  per_resource + (1 if index < remainder else 0)))
+        for (index, resource_uri) in enumerate(resource_uris))
+
+
+def create_client(adapter, **kwargs):
+    """Returns a DRACClient object sending its requests to a stub transport
+
+    :param adapter: a ReplayAdapter object
+    :param kwargs: additional arguments of DRACClient
+    """
+    client = dracclient.client.DRACClient(**dict(ENDPOINT, **kwargs))
+    client.client._get_session().mount('https://', adapter)
+    return client
+
+
+class ReplayAdapter(requests.adapters.BaseAdapter):
+    """Transport adapter answering the requests with canned responses
+
+    The requests are answered by a replay.Responder, without going
+    through a socket.
+    """
+
+    def __init__(self, enumerations=None, invocations=None):
+        """Creates ReplayAdapter object
+
+        :param enumerations: dictionary of resource URIs and their
+                             enumeration responses
+        :param invocations: dictionary of (resource URI, method name) tuples
+                            and the responses of the invocations
+        """
+        super(ReplayAdapter, self).__init__()
+        self.requests = 0
+        self.responder = replay.Responder(enumerations or {},
+                                          invocations or {})
+
+    def send(self, request, stream=False, timeout=None, verify=True,
+             cert=None, proxies=None):
+        self.requests += 1
+        status_code, content = self.responder.respond(request.body)
+
+        resp = requests.models.Response()
+        resp.status_code = status_code
+        resp.reason = replay.REASONS.get(status_code)
+        resp.headers = requests.structures.CaseInsensitiveDict(
+            {'Content-Type': 'application/soap+xml;charset=UTF-8',
+             'Content-Length': str(len(content))})
+        resp.encoding = 'utf-8'
+        resp.raw = io.BytesIO(content)
+        resp.url = request.url
+        resp.request = request
+        return resp
+
+    def close(self):
+        pass
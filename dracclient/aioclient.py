@@ -0,0 +1,691 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+asyncio counterpart of dracclient.client
+
+The resource management classes below override the public methods of their
+blocking counterparts with coroutines, reusing the request building and
+response parsing helpers of the blocking classes. Requires Python 3.6 or
+newer.
+"""
+
+import asyncio
+import logging
+
+from dracclient import aiowsman
+from dracclient import client
+from dracclient.resources import bios
+from dracclient.resources import job
+from dracclient.resources import lifecycle_controller
+from dracclient.resources import raid
+from dracclient.resources import uris
+from dracclient import utils
+from dracclient import wsman
+
+LOG = logging.getLogger(__name__)
+
+
+class AsyncDRACClient(object):
+    """asyncio client for managing DRAC nodes
+
+    Exposes the methods of DRACClient as coroutines, with the same
+    parameters, return values and exceptions.
+    """
+
+    BIOS_DEVICE_FQDD = client.DRACClient.BIOS_DEVICE_FQDD
+
+    def __init__(self, host, username, password, port=443, path='/wsman',
+                 protocol='https', pool_size=wsman.DEFAULT_POOL_SIZE,
+                 idle_timeout=None, max_requests_per_connection=None,
+                 timeout=None, cache=None, coalesce=False,
+                 max_in_flight=None, retry_policy=None, observers=None,
+                 log_policy=None):
+        """Creates client object
+
+        :param host: hostname or IP of the DRAC interface
+        :param username: username for accessing the DRAC interface
+        :param password: password for accessing the DRAC interface
+        :param port: port for accessing the DRAC interface
+        :param path: path for accessing the DRAC interface
+        :param protocol: protocol for accessing the DRAC interface
+        :param pool_size: maximum number of connections kept open to the DRAC
+                          interface
+        :param idle_timeout: number of seconds after which idle connections
+                             are discarded instead of being reused
+        :param max_requests_per_connection: number of requests after which
+                                            a connection is closed
+        :param timeout: number of seconds to wait for the DRAC interface to
+                        accept the connection or to send data before giving up
+        :param cache: a cache.ResourceCache object used to cache the slow
+                      changing inventory. See DRACClient.
+        :param coalesce: indicates whether identical reads running
+                         concurrently in several tasks should share a single
+                         request to the DRAC interface
+        :param max_in_flight: maximum number of requests in flight to the DRAC
+                              interface, shared by every client of the node
+                              in the event loop. If not set, there is no
+                              limit.
+        :param retry_policy: a wsman.RetryPolicy object used to retry the
+                             requests failed with transient errors. See
+                             DRACClient.
+        :param observers: list of wsman.Observer objects notified of every
+                          request
+        :param log_policy: a wsman.LogPolicy object controlling the sampling,
+                           truncation and redaction of the bodies logged at
+                           debug level
+        """
+        self.client = AsyncWSManClient(
+            host, username, password, port, path, protocol,
+            pool_size=pool_size, idle_timeout=idle_timeout,
+            max_requests_per_connection=max_requests_per_connection,
+            timeout=timeout, max_in_flight=max_in_flight,
+            retry_policy=retry_policy, observers=observers,
+            log_policy=log_policy, cache=cache, coalesce=coalesce)
+        self._job_mgmt = AsyncJobManagement(self.client)
+        self._power_mgmt = AsyncPowerManagement(self.client)
+        self._boot_mgmt = AsyncBootManagement(self.client)
+        self._bios_cfg = AsyncBIOSConfiguration(self.client)
+        self._lc_mgmt = AsyncLifecycleControllerManagement(self.client)
+        self._raid_mgmt = AsyncRAIDManagement(self.client)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        """Closes the connections kept open to the DRAC interface"""
+        await self.client.close()
+
+    def invalidate_cache(self, resource_uris=None):
+        """Drops the cached inventory
+
+        See DRACClient.invalidate_cache.
+        """
+        self.client.invalidate_cache(resource_uris)
+
+    async def get_power_state(self):
+        """Returns the current power state of the node
+
+        See DRACClient.get_power_state.
+        """
+        return await self._power_mgmt.get_power_state()
+
+    async def set_power_state(self, target_state):
+        """Turns the server power on/off or do a reboot
+
+        See DRACClient.set_power_state.
+        """
+        await self._power_mgmt.set_power_state(target_state)
+
+    async def list_boot_modes(self):
+        """Returns the list of boot modes
+
+        See DRACClient.list_boot_modes.
+        """
+        return await self._boot_mgmt.list_boot_modes()
+
+    async def list_boot_devices(self):
+        """Returns the list of boot devices
+
+        See DRACClient.list_boot_devices.
+        """
+        return await self._boot_mgmt.list_boot_devices()
+
+    async def change_boot_device_order(self, boot_mode, boot_device_list):
+        """Changes the boot device sequence for a boot mode
+
+        See DRACClient.change_boot_device_order.
+        """
+        return await self._boot_mgmt.change_boot_device_order(
+            boot_mode, boot_device_list)
+
+    async def list_bios_settings(self, concurrent=False):
+        """List the BIOS configuration settings
+
+        See DRACClient.list_bios_settings.
+        """
+        return await self._bios_cfg.list_bios_settings(concurrent)
+
+    async def set_bios_settings(self, settings, concurrent=False,
+                                current_settings=None,
+                                max_attributes=bios.MAX_ATTRIBUTES_PER_INVOKE,
+                                max_bytes=bios.MAX_BYTES_PER_INVOKE):
+        """Sets the BIOS configuration
+
+        See DRACClient.set_bios_settings.
+        """
+        return await self._bios_cfg.set_bios_settings(settings, concurrent,
+                                                      current_settings,
+                                                      max_attributes,
+                                                      max_bytes)
+
+    async def list_jobs(self, only_unfinished=False):
+        """Returns a list of jobs from the job queue
+
+        See DRACClient.list_jobs.
+        """
+        return await self._job_mgmt.list_jobs(only_unfinished)
+
+    async def get_job(self, job_id):
+        """Returns a job from the job queue
+
+        See DRACClient.get_job.
+        """
+        return await self._job_mgmt.get_job(job_id)
+
+    async def get_jobs(self, job_ids):
+        """Returns many jobs from the job queue
+
+        See DRACClient.get_jobs.
+        """
+        return await self._job_mgmt.get_jobs(job_ids)
+
+    async def wait_for_jobs(self, job_ids,
+                            timeout=job.DEFAULT_WAIT_TIMEOUT,
+                            poll_interval=job.DEFAULT_POLL_INTERVAL,
+                            max_poll_interval=job.DEFAULT_MAX_POLL_INTERVAL):
+        """Waits until the jobs reach a terminal state
+
+        See DRACClient.wait_for_jobs.
+        """
+        return await self._job_mgmt.wait_for_jobs(
+            job_ids, timeout, poll_interval, max_poll_interval)
+
+    async def wait_for_job(self, job_id, timeout=job.DEFAULT_WAIT_TIMEOUT,
+                           poll_interval=job.DEFAULT_POLL_INTERVAL,
+                           max_poll_interval=job.DEFAULT_MAX_POLL_INTERVAL):
+        """Waits until a job reaches a terminal state
+
+        See DRACClient.wait_for_job.
+        """
+        return await self._job_mgmt.wait_for_job(
+            job_id, timeout, poll_interval, max_poll_interval)
+
+    async def create_config_job(
+            self, resource_uri, cim_creation_class_name, cim_name, target,
+            cim_system_creation_class_name='DCIM_ComputerSystem',
+            cim_system_name='DCIM:ComputerSystem', reboot=False):
+        """Creates a config job
+
+        See DRACClient.create_config_job.
+        """
+        return await self._job_mgmt.create_config_job(
+            resource_uri, cim_creation_class_name, cim_name, target,
+            cim_system_creation_class_name, cim_system_name, reboot)
+
+    async def delete_pending_config(
+            self, resource_uri, cim_creation_class_name, cim_name, target,
+            cim_system_creation_class_name='DCIM_ComputerSystem',
+            cim_system_name='DCIM:ComputerSystem'):
+        """Cancels pending configuration
+
+        See DRACClient.delete_pending_config.
+        """
+        await self._job_mgmt.delete_pending_config(
+            resource_uri, cim_creation_class_name, cim_name, target,
+            cim_system_creation_class_name, cim_system_name)
+
+    async def commit_pending_bios_changes(self, reboot=False):
+        """Applies all pending changes on the BIOS by creating a config job
+
+        See DRACClient.commit_pending_bios_changes.
+        """
+        return await self._job_mgmt.create_config_job(
+            resource_uri=uris.DCIM_BIOSService,
+            cim_creation_class_name='DCIM_BIOSService',
+            cim_name='DCIM:BIOSService', target=self.BIOS_DEVICE_FQDD,
+            reboot=reboot)
+
+    async def abandon_pending_bios_changes(self):
+        """Deletes all pending changes on the BIOS
+
+        See DRACClient.abandon_pending_bios_changes.
+        """
+        await self._job_mgmt.delete_pending_config(
+            resource_uri=uris.DCIM_BIOSService,
+            cim_creation_class_name='DCIM_BIOSService',
+            cim_name='DCIM:BIOSService', target=self.BIOS_DEVICE_FQDD)
+
+    async def get_lifecycle_controller_version(self):
+        """Returns the Lifecycle controller version
+
+        See DRACClient.get_lifecycle_controller_version.
+        """
+        return await self._lc_mgmt.get_version()
+
+    async def list_raid_controllers(self):
+        """Returns the list of RAID controllers
+
+        See DRACClient.list_raid_controllers.
+        """
+        return await self._raid_mgmt.list_raid_controllers()
+
+    async def list_virtual_disks(self):
+        """Returns the list of RAID arrays
+
+        See DRACClient.list_virtual_disks.
+        """
+        return await self._raid_mgmt.list_virtual_disks()
+
+    async def list_physical_disks(self):
+        """Returns the list of physical disks
+
+        See DRACClient.list_physical_disks.
+        """
+        return await self._raid_mgmt.list_physical_disks()
+
+    async def create_virtual_disk(self, raid_controller, physical_disks,
+                                  raid_level, size_mb, disk_name=None,
+                                  span_length=None, span_depth=None):
+        """Creates a virtual disk
+
+        See DRACClient.create_virtual_disk.
+        """
+        return await self._raid_mgmt.create_virtual_disk(
+            raid_controller, physical_disks, raid_level, size_mb, disk_name,
+            span_length, span_depth)
+
+    async def delete_virtual_disk(self, virtual_disk):
+        """Deletes a virtual disk
+
+        See DRACClient.delete_virtual_disk.
+        """
+        return await self._raid_mgmt.delete_virtual_disk(virtual_disk)
+
+    async def commit_pending_raid_changes(self, raid_controller,
+                                          reboot=False):
+        """Applies all pending changes on a RAID controller
+
+        See DRACClient.commit_pending_raid_changes.
+        """
+        return await self._job_mgmt.create_config_job(
+            resource_uri=uris.DCIM_RAIDService,
+            cim_creation_class_name='DCIM_RAIDService',
+            cim_name='DCIM:RAIDService', target=raid_controller, reboot=reboot)
+
+    async def abandon_pending_raid_changes(self, raid_controller):
+        """Deletes all pending changes on a RAID controller
+
+        See DRACClient.abandon_pending_raid_changes.
+        """
+        await self._job_mgmt.delete_pending_config(
+            resource_uri=uris.DCIM_RAIDService,
+            cim_creation_class_name='DCIM_RAIDService',
+            cim_name='DCIM:RAIDService', target=raid_controller)
+
+
+async def _parse_items(items, parse):
+    # parses the items of an enumeration one by one as the pages arrive
+    result = []
+    async for item in items:
+        result.extend(parse([item]))
+
+    return result
+
+
+class AsyncWSManClient(aiowsman.Client):
+    """Wrapper for aiowsman.Client with return value checking and caching"""
+
+    def __init__(self, *args, **kwargs):
+        """Creates client object
+
+        See WSManClient.
+        """
+        self.cache = kwargs.pop('cache', None)
+        self._in_flight = None
+        if kwargs.pop('coalesce', False):
+            self._in_flight = _SingleFlight()
+        super(AsyncWSManClient, self).__init__(*args, **kwargs)
+
+    async def enumerate(self, resource_uri, optimization=True, max_elems=100,
+                        auto_pull=True, filter_query=None,
+                        filter_dialect='cql', **kwargs):
+        """Executes enumerate operation over WSMan
+
+        See WSManClient.enumerate.
+        """
+        def enumerate():
+            return super(AsyncWSManClient, self).enumerate(
+                resource_uri, optimization, max_elems, auto_pull,
+                filter_query, filter_dialect, **kwargs)
+
+        if not auto_pull:
+            return await enumerate()
+
+        return await self._shared_read(
+            resource_uri,
+            client._read_key('enumerate', optimization, max_elems,
+                             filter_query, filter_dialect, **kwargs),
+            enumerate)
+
+    async def iter_enumerate(self, resource_uri, max_elems=100,
+                             filter_query=None, filter_dialect='cql',
+                             **kwargs):
+        """Executes enumerate operation over WSMan, yielding the items
+
+        See WSManClient.iter_enumerate.
+        """
+        enumeration = super(AsyncWSManClient, self).iter_enumerate(
+            resource_uri, max_elems, filter_query, filter_dialect, **kwargs)
+
+        if self._in_flight is None and (
+                self.cache is None or not self.cache.is_cached(resource_uri)):
+            try:
+                async for item in enumeration:
+                    yield item
+            finally:
+                await enumeration.aclose()
+            return
+
+        async def read():
+            return [item async for item in enumeration]
+
+        items = await self._shared_read(
+            resource_uri,
+            client._read_key('iter_enumerate', max_elems, filter_query,
+                             filter_dialect, **kwargs),
+            read)
+
+        for item in items:
+            yield item
+
+    async def _shared_read(self, resource_uri, key, read):
+        cacheable = (self.cache is not None and
+                     self.cache.is_cached(resource_uri))
+        if cacheable:
+            value = self.cache.get(resource_uri, key)
+            if value is not None:
+                return value
+
+        if self._in_flight is not None:
+            value = await self._in_flight.do((resource_uri, key), read)
+        else:
+            value = await read()
+
+        if cacheable:
+            self.cache.set(resource_uri, key, value)
+
+        return value
+
+    def invalidate_cache(self, resource_uris=None):
+        """Drops the cached enumerations
+
+        See WSManClient.invalidate_cache.
+        """
+        if self.cache is not None:
+            self.cache.invalidate(resource_uris)
+
+    async def invoke(self, resource_uri, method, selectors=None,
+                     properties=None, expected_return_value=None,
+                     idempotent=False):
+        """Invokes a remote WS-Man method
+
+        See WSManClient.invoke.
+        """
+        if selectors is None:
+            selectors = {}
+
+        if properties is None:
+            properties = {}
+
+        try:
+            resp = await super(AsyncWSManClient, self).invoke(
+                resource_uri, method, selectors, properties, idempotent)
+        finally:
+            if self.cache is not None:
+                self.cache.invalidate_for_invoke(resource_uri)
+
+        utils.check_return_value(resp, resource_uri, expected_return_value)
+
+        return resp
+
+
+class AsyncPowerManagement(bios.PowerManagement):
+
+    async def get_power_state(self):
+        doc = await self.client.enumerate(
+            uris.DCIM_ComputerSystem,
+            filter_query=bios.POWER_STATE_FILTER_QUERY)
+
+        return self._parse_power_state(doc)
+
+    async def set_power_state(self, target_state):
+        await self.client.invoke(**self._build_set_power_state(target_state))
+
+
+class AsyncBootManagement(bios.BootManagement):
+
+    async def list_boot_modes(self):
+        items = self.client.iter_enumerate(uris.DCIM_BootConfigSetting)
+
+        return await _parse_items(items, self._parse_drac_boot_modes)
+
+    async def list_boot_devices(self):
+        doc = await self.client.enumerate(uris.DCIM_BootSourceSetting)
+
+        try:
+            boot_devices = self._parse_drac_boot_devices(doc)
+        except AttributeError:
+            # DRAC 11g doesn't have the BootSourceType attribute on the
+            # DCIM_BootSourceSetting resource
+            controller_version = await AsyncLifecycleControllerManagement(
+                self.client).get_version()
+
+            if controller_version < bios.LC_CONTROLLER_VERSION_12G:
+                boot_devices = self._parse_drac_boot_devices_11g(doc)
+            else:
+                raise
+
+        return self._group_boot_devices(boot_devices)
+
+    async def change_boot_device_order(self, boot_mode, boot_device_list):
+        await self.client.invoke(**self._build_change_boot_device_order(
+            boot_mode, boot_device_list))
+
+
+class AsyncBIOSConfiguration(bios.BIOSConfiguration):
+
+    async def list_bios_settings(self, concurrent=False):
+        if concurrent:
+            configs = await asyncio.gather(*[
+                self._get_config(namespace, attr_cls)
+                for (namespace, attr_cls) in bios.BIOS_ATTRIBUTE_NAMESPACES])
+        else:
+            configs = []
+            for (namespace, attr_cls) in bios.BIOS_ATTRIBUTE_NAMESPACES:
+                configs.append(await self._get_config(namespace, attr_cls))
+
+        result = {}
+        for attribs in configs:
+            self._merge_config(result, attribs)
+        return result
+
+    async def _get_config(self, resource, attr_cls):
+        attribs = {}
+        async for item in self.client.iter_enumerate(resource):
+            attribs.update(self._parse_config([item], attr_cls))
+
+        return attribs
+
+    async def set_bios_settings(self, new_settings, concurrent=False,
+                                current_settings=None,
+                                max_attributes=bios.MAX_ATTRIBUTES_PER_INVOKE,
+                                max_bytes=bios.MAX_BYTES_PER_INVOKE):
+        if current_settings is None:
+            current_settings = await self.list_bios_settings(concurrent)
+        invocations = self._build_set_attributes(new_settings,
+                                                 current_settings,
+                                                 max_attributes, max_bytes)
+
+        docs = []
+        for invocation in invocations:
+            docs.append(await self.client.invoke(**invocation))
+
+        return self._parse_set_attributes(docs)
+
+
+class AsyncJobManagement(job.JobManagement):
+
+    async def list_jobs(self, only_unfinished=False):
+        filter_query = None
+        if only_unfinished:
+            filter_query = job.UNFINISHED_JOBS_FILTER_QUERY
+
+        items = self.client.iter_enumerate(uris.DCIM_LifecycleJob,
+                                           filter_query=filter_query)
+
+        return await _parse_items(items, self._parse_drac_jobs)
+
+    async def get_job(self, job_id):
+        filter_query = self._job_filter_query(job_id)
+        doc = await self.client.enumerate(uris.DCIM_LifecycleJob,
+                                          filter_query=filter_query)
+
+        drac_job = utils.find_xml(doc, 'DCIM_LifecycleJob',
+                                  uris.DCIM_LifecycleJob)
+
+        if drac_job is not None:
+            return self._parse_drac_job(drac_job)
+
+    async def get_jobs(self, job_ids):
+        jobs, filter_queries = self._build_get_jobs(job_ids)
+        for filter_query in filter_queries:
+            items = self.client.iter_enumerate(uris.DCIM_LifecycleJob,
+                                               filter_query=filter_query)
+            self._merge_drac_jobs(
+                jobs, await _parse_items(items, self._parse_drac_jobs))
+
+        return jobs
+
+    async def wait_for_jobs(self, job_ids,
+                            timeout=job.DEFAULT_WAIT_TIMEOUT,
+                            poll_interval=job.DEFAULT_POLL_INTERVAL,
+                            max_poll_interval=job.DEFAULT_MAX_POLL_INTERVAL):
+        poller = job._JobPoller(job_ids, timeout, poll_interval,
+                                max_poll_interval)
+
+        while True:
+            delay = poller.update(await self.get_jobs(poller.pending))
+            if delay is None:
+                return poller.finished
+
+            await asyncio.sleep(delay)
+
+    async def wait_for_job(self, job_id, timeout=job.DEFAULT_WAIT_TIMEOUT,
+                           poll_interval=job.DEFAULT_POLL_INTERVAL,
+                           max_poll_interval=job.DEFAULT_MAX_POLL_INTERVAL):
+        jobs = await self.wait_for_jobs([job_id], timeout, poll_interval,
+                                        max_poll_interval)
+        return jobs[job_id]
+
+    async def create_config_job(
+            self, resource_uri, cim_creation_class_name, cim_name, target,
+            cim_system_creation_class_name='DCIM_ComputerSystem',
+            cim_system_name='DCIM:ComputerSystem', reboot=False):
+        doc = await self.client.invoke(**self._build_create_config_job(
+            resource_uri, cim_creation_class_name, cim_name, target,
+            cim_system_creation_class_name, cim_system_name, reboot))
+
+        return self._parse_job_id(doc)
+
+    async def delete_pending_config(
+            self, resource_uri, cim_creation_class_name, cim_name, target,
+            cim_system_creation_class_name='DCIM_ComputerSystem',
+            cim_system_name='DCIM:ComputerSystem'):
+        await self.client.invoke(**self._build_delete_pending_config(
+            resource_uri, cim_creation_class_name, cim_name, target,
+            cim_system_creation_class_name, cim_system_name))
+
+
+class AsyncLifecycleControllerManagement(
+        lifecycle_controller.LifecycleControllerManagement):
+
+    async def get_version(self):
+        doc = await self.client.enumerate(
+            uris.DCIM_SystemView,
+            filter_query=lifecycle_controller.LC_VERSION_FILTER_QUERY)
+
+        return self._parse_version(doc)
+
+
+class AsyncRAIDManagement(raid.RAIDManagement):
+
+    async def list_raid_controllers(self):
+        items = self.client.iter_enumerate(uris.DCIM_ControllerView)
+
+        return await _parse_items(items, self._parse_drac_raid_controllers)
+
+    async def list_virtual_disks(self):
+        items = self.client.iter_enumerate(uris.DCIM_VirtualDiskView)
+
+        return await _parse_items(items, self._parse_drac_virtual_disks)
+
+    async def list_physical_disks(self):
+        items = self.client.iter_enumerate(uris.DCIM_PhysicalDiskView)
+
+        return await _parse_items(items, self._parse_drac_physical_disks)
+
+    async def create_virtual_disk(self, raid_controller, physical_disks,
+                                  raid_level, size_mb, disk_name=None,
+                                  span_length=None, span_depth=None):
+        doc = await self.client.invoke(**self._build_create_virtual_disk(
+            raid_controller, physical_disks, raid_level, size_mb, disk_name,
+            span_length, span_depth))
+
+        return self._parse_raid_service_result(doc)
+
+    async def delete_virtual_disk(self, virtual_disk):
+        doc = await self.client.invoke(**self._build_delete_virtual_disk(
+            virtual_disk))
+
+        return self._parse_raid_service_result(doc)
+
+
+class _SingleFlight(object):
+    """Shares the result of identical coroutines running at the same time"""
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, func):
+        """Awaits func(), unless a call with the same key is running already
+
+        :param key: hashable key identifying the call
+        :param func: callable without arguments returning an awaitable
+        :returns: the result of the call
+        :raises: the exception raised by the call
+        """
+        call = self._calls.get(key)
+        if call is not None:
+            # cancelling a waiter must not cancel the shared call
+            return await asyncio.shield(call)
+
+        call = self._calls[key] = asyncio.get_event_loop().create_future()
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            call.cancel()
+            raise
+        except BaseException as exc:
+            call.set_exception(exc)
+            # the waiters, if any, get the exception
+            call.exception()
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
@@ -0,0 +1,122 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+asyncio mode of dracclient.fleet
+
+Runs AsyncDRACClient operations on the nodes of a fleet.FleetClient. It is
+imported by FleetClient on demand. Requires Python 3.6 or newer.
+"""
+
+import asyncio
+
+from dracclient import aioclient
+from dracclient import fleet as drac_fleet
+
+
+async def arun(fleet, method, *args, **kwargs):
+    """Runs an AsyncDRACClient method on every node of a fleet
+
+    See FleetClient.arun.
+
+    :param fleet: a FleetClient object
+    :param method: name of the DRACClient method, eg. 'get_power_state'
+    :param args: positional arguments of the method
+    :param kwargs: keyword arguments of the method
+    :returns: asynchronous generator of FleetResult objects
+    :raises: InvalidParameterValue on unknown method
+    """
+    fleet._check_method(method)
+
+    nodes = iter(fleet.nodes)
+    pending = set()
+
+    try:
+        while True:
+            for node in nodes:
+                pending.add(asyncio.ensure_future(
+                    _run_node(fleet, node, method, args, kwargs)))
+                if len(pending) >= fleet.max_concurrency:
+                    break
+
+            if not pending:
+                return
+
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def aclose(fleet):
+    """Closes the connections opened by arun to the nodes of a fleet
+
+    :param fleet: a FleetClient object
+    """
+    for drac_client in fleet._async_clients.values():
+        await drac_client.close()
+    fleet._async_clients.clear()
+
+
+def run_event_loop(fleet, method, args, kwargs):
+    """Runs arun in a new event loop, yielding the results
+
+    :param fleet: a FleetClient object
+    :param method: name of the DRACClient method
+    :param args: positional arguments of the method
+    :param kwargs: keyword arguments of the method
+    :returns: generator of FleetResult objects
+    """
+    loop = asyncio.new_event_loop()
+    results = arun(fleet, method, *args, **kwargs)
+
+    try:
+        while True:
+            try:
+                result = loop.run_until_complete(results.__anext__())
+            except StopAsyncIteration:
+                return
+
+            yield result
+    finally:
+        loop.run_until_complete(results.aclose())
+        # the connections are bound to this event loop
+        loop.run_until_complete(aclose(fleet))
+        loop.close()
+
+
+def _get_client(fleet, node):
+    key = fleet._client_key(node)
+    drac_client = fleet._async_clients.get(key)
+    if drac_client is None:
+        drac_client = aioclient.AsyncDRACClient(**fleet._client_params(node))
+        fleet._async_clients[key] = drac_client
+
+    return drac_client
+
+
+async def _run_node(fleet, node, method, args, kwargs):
+    drac_client = _get_client(fleet, node)
+    try:
+        result = await asyncio.wait_for(
+            getattr(drac_client, method)(*args, **kwargs), fleet.timeout)
+    except asyncio.TimeoutError:
+        return drac_fleet.FleetResult(
+            node['host'], None, fleet._timeout_exception(node, method))
+    except Exception as exc:
+        return drac_fleet.FleetResult(node['host'], None, exc)
+
+    return drac_fleet.FleetResult(node['host'], result, None)
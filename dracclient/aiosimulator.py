@@ -0,0 +1,303 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Simulator of DRAC interfaces answering WS-Man requests over HTTP
+
+Every virtual host listens on its own port and answers Enumerate, Pull and
+Invoke requests with the responses of a dracclient.replay.Responder. It can
+also be run stand-alone, eg.:
+
+    python -m dracclient.aiosimulator --hosts 1000 --latency 0.05
+
+Each virtual host needs a file descriptor for its listening socket and one
+per open connection, so simulating thousands of them may require raising
+the limit of open files. Requires Python 3.7 or newer.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import random
+import threading
+
+from dracclient import replay
+
+
+class HostStats(object):
+    """Counters of a virtual host"""
+
+    COUNTERS = ('connections', 'requests', 'rejected', 'errors', 'dropped')
+
+    def __init__(self):
+        for counter in self.COUNTERS:
+            setattr(self, counter, 0)
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+
+class VirtualHost(object):
+    """A single simulated DRAC interface"""
+
+    def __init__(self, simulator):
+        self.simulator = simulator
+        self.stats = HostStats()
+        self.server = None
+        self.port = None
+        self._writers = set()
+
+    async def start(self):
+        self.server = await asyncio.start_server(
+            self._handle, self.simulator.address, 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        for writer in list(self._writers):
+            writer.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.stats.connections += 1
+        self._writers.add(writer)
+        try:
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+
+                headers, body = request
+                response = await self._respond(body)
+                if response is None:
+                    # simulates a reset connection
+                    writer.transport.abort()
+                    break
+
+                writer.write(response)
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _respond(self, body):
+        simulator = self.simulator
+        stats = self.stats
+        stats.requests += 1
+
+        if (simulator.max_concurrency is not None and
+                stats.in_flight >= simulator.max_concurrency):
+            stats.rejected += 1
+            return _http_response(
+                replay.BUSY_STATUS_CODE,
+                replay.fault('Too many concurrent requests'))
+
+        stats.in_flight += 1
+        stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+        try:
+            delay = simulator.latency
+            if simulator.jitter:
+                delay += simulator.random.uniform(0, simulator.jitter)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            failure = simulator.random.random()
+            if failure < simulator.drop_rate:
+                stats.dropped += 1
+                return None
+            elif failure < simulator.drop_rate + simulator.error_rate:
+                stats.errors += 1
+                return _http_response(simulator.error_status,
+                                      replay.fault('Injected failure'))
+
+            return _http_response(*simulator.responder.respond(body))
+        finally:
+            stats.in_flight -= 1
+
+
+class Simulator(object):
+    """Runs many virtual DRAC interfaces in an event loop
+
+    Use it as an asynchronous context manager in a running event loop, or
+    with in_thread for blocking clients.
+    """
+
+    def __init__(self, hosts=1, responder=None, latency=0.0, jitter=0.0,
+                 max_concurrency=None, error_rate=0.0, drop_rate=0.0,
+                 error_status=500, seed=None, address='127.0.0.1'):
+        """Creates Simulator object
+
+        :param hosts: number of virtual hosts
+        :param responder: a Responder object shared by the virtual hosts.
+                          Defaults to one answering with the fixtures.
+        :param latency: number of seconds every request takes
+        :param jitter: maximum number of seconds randomly added to the
+                       latency
+        :param max_concurrency: maximum number of requests processed at the
+                                same time by a virtual host. Requests over the
+                                limit are rejected with a 503 response. If
+                                not set, there is no limit.
+        :param error_rate: fraction of the requests failed with error_status
+        :param drop_rate: fraction of the requests whose connection is reset
+                          instead of being answered
+        :param error_status: status code of the failed requests
+        :param seed: seed of the random failures and jitter
+        :param address: address the virtual hosts listen on
+        """
+        self.responder = responder or replay.Responder()
+        self.latency = latency
+        self.jitter = jitter
+        self.max_concurrency = max_concurrency
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.address = address
+        self.hosts = [VirtualHost(self) for _ in range(hosts)]
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.stop()
+
+    async def start(self):
+        """Starts listening on a new port for each virtual host"""
+
+        for host in self.hosts:
+            await host.start()
+
+    async def stop(self):
+        """Stops the virtual hosts and closes their connections"""
+
+        for host in self.hosts:
+            await host.stop()
+        # lets the connection handlers notice the closed connections
+        await asyncio.sleep(0)
+
+    @contextlib.contextmanager
+    def in_thread(self):
+        """Runs the simulator in an event loop on a background thread"""
+
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever)
+        thread.daemon = True
+        thread.start()
+        try:
+            asyncio.run_coroutine_threadsafe(self.start(), loop).result()
+            try:
+                yield self
+            finally:
+                asyncio.run_coroutine_threadsafe(self.stop(), loop).result()
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+
+    @property
+    def nodes(self):
+        """Returns the DRACClient parameters of the virtual hosts
+
+        :returns: list of dictionaries, eg. to be passed to FleetClient
+        """
+        return [{'host': self.address, 'port': host.port, 'protocol': 'http',
+                 'username': 'admin', 'password': 's3cr3t'}
+                for host in self.hosts]
+
+    def stats(self):
+        """Returns the counters summed over the virtual hosts
+
+        :returns: a dictionary of the HostStats counters and the highest
+                  max_in_flight of the virtual hosts
+        """
+        result = dict((counter, sum(getattr(host.stats, counter)
+                                    for host in self.hosts))
+                      for counter in HostStats.COUNTERS)
+        result['max_in_flight'] = max(
+            [host.stats.max_in_flight for host in self.hosts] or [0])
+        return result
+
+
+async def _read_request(reader):
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    body = await reader.readexactly(int(headers.get('content-length', 0)))
+    return headers, body
+
+
+def _http_response(status_code, content):
+    head = ('HTTP/1.1 %d %s\r\n'
+            'Content-Type: application/soap+xml;charset=UTF-8\r\n'
+            'Content-Length: %d\r\n\r\n') % (
+                status_code, replay.REASONS.get(status_code, 'Unknown'),
+                len(content))
+    return head.encode('ascii') + content
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Simulates DRAC interfaces answering WS-Man requests.')
+    parser.add_argument('--hosts', type=int, default=1,
+                        help='number of virtual hosts')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='number of seconds every request takes')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='maximum number of seconds added to the latency')
+    parser.add_argument('--max-concurrency', type=int,
+                        help='maximum number of concurrent requests per host')
+    parser.add_argument('--page-size', type=int,
+                        help='maximum number of items per page')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='fraction of the requests failed with a 500')
+    parser.add_argument('--drop-rate', type=float, default=0.0,
+                        help='fraction of the requests reset')
+    parser.add_argument('--seed', type=int, help='seed of the failures')
+    parser.add_argument('--address', default='127.0.0.1',
+                        help='address to listen on')
+    args = parser.parse_args()
+
+    simulator = Simulator(
+        hosts=args.hosts,
+        responder=replay.Responder(page_size=args.page_size),
+        latency=args.latency, jitter=args.jitter,
+        max_concurrency=args.max_concurrency, error_rate=args.error_rate,
+        drop_rate=args.drop_rate, seed=args.seed, address=args.address)
+
+    async def serve():
+        async with simulator:
+            for node in simulator.nodes:
+                print('%(host)s:%(port)d' % node, flush=True)
+            await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,590 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+asyncio based client for talking over WSMan protocol
+
+Mirrors wsman.Client, sharing its payload generation and response handling.
+Requires Python 3.6 or newer.
+"""
+
+import asyncio
+import base64
+import collections
+import datetime
+import logging
+import ssl
+import weakref
+
+from lxml import etree as ElementTree
+
+from dracclient import exceptions
+from dracclient import wsman
+
+LOG = logging.getLogger(__name__)
+
+# limiters shared by the clients talking to the same host and port, per
+# event loop
+_host_limiters = weakref.WeakKeyDictionary()
+
+
+class _Response(object):
+    """HTTP response received from the WSMan endpoint."""
+
+    def __init__(self, status_code, reason, headers, content, elapsed):
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.content = content
+        # time between sending the request and receiving the headers, like
+        # requests.Response.elapsed
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+
+class _Connection(object):
+    """Keep-alive HTTP/1.1 connection to the WSMan endpoint."""
+
+    def __init__(self, reader, writer, timeout=None):
+        self.reader = reader
+        self.writer = writer
+        self.timeout = timeout
+        self.requests = 0
+        self.last_used = wsman._monotonic()
+        self.reusable = True
+
+    async def request(self, data):
+        self.requests += 1
+        started = wsman._monotonic()
+        self.writer.write(data)
+        await self._wait(self.writer.drain())
+
+        status_line = await self._wait(self.reader.readline())
+        if not status_line:
+            raise ConnectionResetError('Connection closed by the endpoint')
+
+        version, status_code, reason = self._parse_status_line(status_line)
+        headers = await self._wait(self._read_headers())
+        elapsed = datetime.timedelta(seconds=wsman._monotonic() - started)
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            content = await self._read_chunked()
+        elif 'content-length' in headers:
+            content = await self._wait(self.reader.readexactly(
+                int(headers['content-length'])))
+        else:
+            content = await self._wait(self.reader.read())
+            self.reusable = False
+
+        connection = headers.get('connection', '').lower()
+        if connection == 'close' or (version == 'HTTP/1.0' and
+                                     connection != 'keep-alive'):
+            self.reusable = False
+
+        self.last_used = wsman._monotonic()
+
+        return _Response(status_code, reason, headers, content, elapsed)
+
+    def close(self):
+        self.reusable = False
+        self.writer.close()
+
+    async def _wait(self, awaitable):
+        # the timeout applies to every read, like the one of requests
+        return await asyncio.wait_for(awaitable, self.timeout)
+
+    def _parse_status_line(self, status_line):
+        parts = status_line.decode('latin-1').rstrip('\r\n').split(' ', 2)
+        if len(parts) < 2:
+            raise ValueError('Malformed status line %r' % status_line)
+
+        reason = parts[2] if len(parts) == 3 else ''
+        return parts[0], int(parts[1]), reason
+
+    async def _read_headers(self):
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                return headers
+
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+    async def _read_chunked(self):
+        chunks = []
+        while True:
+            size_line = await self._wait(self.reader.readline())
+            size = int(size_line.split(b';', 1)[0].strip(), 16)
+            if size == 0:
+                # skip trailers
+                await self._wait(self._read_headers())
+                return b''.join(chunks)
+
+            chunks.append(await self._wait(self.reader.readexactly(size)))
+            await self._wait(self.reader.readexactly(2))
+
+
+def get_host_limiter(host, port, max_in_flight):
+    """Returns the limiter shared by the clients of a host
+
+    The limiters are asyncio.Semaphore objects, so they are shared by the
+    clients running in the same event loop only.
+
+    :param host: hostname or IP of the WSMan endpoint
+    :param port: port of the WSMan endpoint
+    :param max_in_flight: maximum number of requests in flight, only used
+                          when creating the limiter
+    :returns: an asyncio.Semaphore object
+    """
+    limiters = _host_limiters.setdefault(asyncio.get_event_loop(), {})
+    limiter = limiters.get((host, port))
+    if limiter is None:
+        limiter = limiters[(host, port)] = asyncio.Semaphore(max_in_flight)
+
+    return limiter
+
+
+class Client(object):
+    """Simple asyncio client for talking over WSMan protocol."""
+
+    def __init__(self, host, username, password, port=443, path='/wsman',
+                 protocol='https', pool_size=wsman.DEFAULT_POOL_SIZE,
+                 idle_timeout=None, max_requests_per_connection=None,
+                 timeout=None, max_in_flight=None, retry_policy=None,
+                 observers=None, log_policy=None):
+        """Creates client object
+
+        :param host: hostname or IP of the WSMan endpoint
+        :param username: username for accessing the WSMan endpoint
+        :param password: password for accessing the WSMan endpoint
+        :param port: port for accessing the WSMan endpoint
+        :param path: path for accessing the WSMan endpoint
+        :param protocol: protocol for accessing the WSMan endpoint
+        :param pool_size: maximum number of connections kept open to the
+                          endpoint, which also limits the number of
+                          concurrent requests
+        :param idle_timeout: number of seconds after which idle connections
+                             are discarded instead of being reused
+        :param max_requests_per_connection: number of requests after which
+                                            a connection is closed
+        :param timeout: number of seconds to wait for the endpoint to accept
+                        the connection or to send data before giving up. If
+                        not set, waits forever.
+        :param max_in_flight: maximum number of requests in flight to the
+                              host, shared by every client talking to the
+                              same host and port in the event loop. If not
+                              set, there is no limit.
+        :param retry_policy: a wsman.RetryPolicy object used to retry the
+                             requests failed with transient errors. See
+                             wsman.Client.
+        :param observers: list of wsman.Observer objects notified of every
+                          request
+        :param log_policy: a wsman.LogPolicy object controlling the logging of
+                           the bodies of the requests and responses at debug
+                           level
+        :raises: InvalidParameterValue on non-positive max_in_flight
+        """
+        self.host = host
+        self.username = username
+        self.password = password
+        self.port = port
+        self.path = path
+        self.protocol = protocol
+        self.endpoint = ('%(protocol)s://%(host)s:%(port)s%(path)s' % {
+            'protocol': self.protocol,
+            'host': self.host,
+            'port': self.port,
+            'path': self.path})
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.max_requests_per_connection = max_requests_per_connection
+        self.timeout = timeout
+
+        if max_in_flight is not None and max_in_flight < 1:
+            raise exceptions.InvalidParameterValue(
+                reason="'max_in_flight' must be a positive integer")
+        self.max_in_flight = max_in_flight
+
+        self.retry_policy = retry_policy
+        self.observers = list(observers or ())
+        self.log_policy = log_policy or wsman.LogPolicy()
+
+        credentials = ('%s:%s' % (username, password)).encode('utf-8')
+        self._auth_header = 'Basic %s' % (
+            base64.b64encode(credentials).decode('ascii'))
+        self._idle_connections = collections.deque()
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        """Closes the connections kept open to the endpoint"""
+
+        while self._idle_connections:
+            self._idle_connections.pop().close()
+
+    async def _connect(self):
+        ssl_context = None
+        if self.protocol == 'https':
+            ssl_context = ssl.create_default_context()
+            # TODO(ifarkas): enable cert verification
+            ssl_context.check_hostname = False
+            ssl_context.verify_mode = ssl.CERT_NONE
+
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, int(self.port),
+                                    ssl=ssl_context),
+            self.timeout)
+
+        return _Connection(reader, writer, self.timeout)
+
+    def _is_expired(self, conn):
+        if (self.idle_timeout is not None and
+                wsman._monotonic() - conn.last_used > self.idle_timeout):
+            return True
+
+        return (self.max_requests_per_connection is not None and
+                conn.requests >= self.max_requests_per_connection)
+
+    def _get_idle_connection(self):
+        while self._idle_connections:
+            conn = self._idle_connections.pop()
+            if self._is_expired(conn) or conn.reader.at_eof():
+                conn.close()
+            else:
+                return conn
+
+    def _release_connection(self, conn):
+        if conn.reusable and not self._is_expired(conn):
+            self._idle_connections.append(conn)
+        else:
+            conn.close()
+
+    def _build_request(self, payload):
+        headers = ['POST %s HTTP/1.1' % self.path,
+                   'Host: %s:%s' % (self.host, self.port),
+                   'Authorization: %s' % self._auth_header,
+                   'Content-Type: application/soap+xml;charset=UTF-8',
+                   'Content-Length: %d' % len(payload),
+                   'Connection: keep-alive']
+
+        return ('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1') + payload
+
+    async def _send(self, data, idempotent=True):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.pool_size)
+
+        async with self._semaphore:
+            conn = self._get_idle_connection()
+            if conn is not None:
+                try:
+                    resp = await conn.request(data)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    # the endpoint may close idle keep-alive connections,
+                    # but the request might have been processed already,
+                    # so only idempotent ones are sent again
+                    conn.close()
+                    if not idempotent:
+                        raise
+                except BaseException:
+                    conn.close()
+                    raise
+                else:
+                    self._release_connection(conn)
+                    return resp
+
+            conn = await self._connect()
+            try:
+                resp = await conn.request(data)
+            except BaseException:
+                conn.close()
+                raise
+
+            self._release_connection(conn)
+            return resp
+
+    async def _do_request(self, payload, idempotent=True, observation=None):
+        if idempotent and self.retry_policy is not None:
+            return await self._retry(lambda: self._limited_request(
+                payload, idempotent, observation))
+
+        return await self._limited_request(payload, idempotent, observation)
+
+    async def _retry(self, request):
+        # the asyncio counterpart of wsman.RetryPolicy.call
+        policy = self.retry_policy
+        policy._refill()
+
+        started = wsman._monotonic()
+        attempt = 1
+        while True:
+            try:
+                return await request()
+            except (exceptions.WSManRequestFailure,
+                    exceptions.WSManInvalidResponse) as exc:
+                delay = policy._retry_delay(exc, attempt, started)
+                if delay is None:
+                    raise
+
+            LOG.debug('Retrying request in %(delay).2f seconds, attempt '
+                      '%(attempt)d of %(max_attempts)d',
+                      {'delay': delay, 'attempt': attempt + 1,
+                       'max_attempts': policy.max_attempts})
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _request_xml(self, payload, idempotent=True):
+        # sends the request and parses the response, notifying the observers
+        if not self.observers:
+            resp = await self._do_request(payload, idempotent)
+            return ElementTree.fromstring(resp.content), len(resp.content)
+
+        observation = wsman._Observation(payload)
+        try:
+            resp = await self._do_request(payload, idempotent, observation)
+            started = wsman._monotonic()
+            resp_xml = ElementTree.fromstring(resp.content)
+            observation.parse_time = wsman._monotonic() - started
+        except Exception as exc:
+            wsman._notify(self.observers, 'request_finished',
+                          observation.stats(exc))
+            raise
+
+        wsman._notify(self.observers, 'request_finished', observation.stats())
+        return resp_xml, len(resp.content)
+
+    async def _limited_request(self, payload, idempotent, observation):
+        if self.max_in_flight is None:
+            return await self._send_request(payload, idempotent, observation)
+
+        async with get_host_limiter(self.host, self.port, self.max_in_flight):
+            return await self._send_request(payload, idempotent, observation)
+
+    async def _send_request(self, payload, idempotent, observation=None):
+        payload = payload.build()
+        log_bodies = self.log_policy.sample()
+        if log_bodies:
+            LOG.debug('Sending request to %(endpoint)s: %(payload)s',
+                      {'endpoint': self.endpoint,
+                       'payload': self.log_policy.format(payload)})
+        started = wsman._monotonic()
+        try:
+            resp = await self._send(self._build_request(payload), idempotent)
+        except (OSError, ValueError, asyncio.IncompleteReadError,
+                asyncio.TimeoutError):
+            LOG.exception('Request failed')
+            if observation is not None:
+                observation.record_attempt(len(payload))
+            raise exceptions.WSManRequestFailure()
+
+        if observation is not None:
+            observation.record_attempt(len(payload), resp,
+                                       wsman._monotonic() - started)
+
+        if log_bodies:
+            LOG.debug('Received response from %(endpoint)s: %(payload)s',
+                      {'endpoint': self.endpoint,
+                       'payload': self.log_policy.format(resp.content)})
+
+        if not resp.ok:
+            raise exceptions.WSManInvalidResponse(
+                status_code=resp.status_code,
+                reason=resp.reason)
+        else:
+            return resp
+
+    async def enumerate(self, resource_uri, optimization=True, max_elems=100,
+                        auto_pull=True, filter_query=None,
+                        filter_dialect='cql', prefetch=False,
+                        max_page_size=None):
+        """Executes enumerate operation over WSMan.
+
+        :param resource_uri: URI of resource to enumerate.
+        :param optimization: flag to enable enumeration optimization. If
+                             disabled, the enumeration returns only an
+                             enumeration context.
+        :param max_elems: maximum number of elements returned by the operation.
+        :param auto_pull: flag to enable automatic pull on the enumeration
+                          context, merging the items returned.
+        :param filter_query: filter query string.
+        :param filter_dialect: filter dialect. Valid options are: 'cql' and
+                               'wql'.
+        :param prefetch: flag to send the next pull while the current
+                         response is being processed.
+        :param max_page_size: size of the pull responses to aim for, in bytes.
+                              See wsman.Client.enumerate.
+        :returns: an lxml.etree.Element object of the response received.
+        :raises: WSManRequestFailure on request failures
+        :raises: WSManInvalidResponse when receiving invalid response
+        """
+
+        payload = wsman._EnumeratePayload(self.endpoint, resource_uri,
+                                          optimization, max_elems,
+                                          filter_query, filter_dialect)
+
+        resp_xml, resp_size = await self._request_xml(payload)
+
+        if auto_pull:
+            enumeration = None
+            async for page in self._iter_pages(resource_uri, resp_xml,
+                                               resp_size, max_elems,
+                                               prefetch, max_page_size):
+                if enumeration is None:
+                    enumeration = wsman._Enumeration(page)
+                else:
+                    enumeration.add(page)
+
+            return enumeration.result()
+        else:
+            return resp_xml
+
+    async def iter_enumerate(self, resource_uri, max_elems=100,
+                             filter_query=None, filter_dialect='cql',
+                             prefetch=False, max_page_size=None):
+        """Executes enumerate operation over WSMan, yielding the items.
+
+        :param resource_uri: URI of resource to enumerate.
+        :param max_elems: maximum number of elements returned by a single
+                          operation.
+        :param filter_query: filter query string.
+        :param filter_dialect: filter dialect. Valid options are: 'cql' and
+                               'wql'.
+        :param prefetch: flag to pull the next page while the items of the
+                         current one are consumed.
+        :param max_page_size: size of the pull responses to aim for, in bytes.
+                              See wsman.Client.enumerate.
+        :returns: an asynchronous generator of lxml.etree.Element objects of
+                  the items received.
+        :raises: WSManRequestFailure on request failures
+        :raises: WSManInvalidResponse when receiving invalid response
+        """
+
+        payload = wsman._EnumeratePayload(self.endpoint, resource_uri, True,
+                                          max_elems, filter_query,
+                                          filter_dialect)
+        resp_xml, resp_size = await self._request_xml(payload)
+
+        pages = self._iter_pages(resource_uri, resp_xml, resp_size,
+                                 max_elems, prefetch, max_page_size)
+        del resp_xml
+
+        try:
+            async for page in pages:
+                items = wsman._enum_items(page)
+                del page
+
+                for item in items:
+                    yield item
+
+                del items
+        finally:
+            # unreferenced asynchronous generators are only finalized later
+            # by the event loop, which would leave the prefetch running
+            await pages.aclose()
+
+    async def _iter_pages(self, resource_uri, resp_xml, resp_size, max_elems,
+                          prefetch, max_page_size):
+        sizer = None
+        if max_page_size is not None:
+            sizer = wsman._PageSizer(max_elems, max_page_size)
+            sizer.update(resp_size, resp_xml)
+
+        next_page = None
+        pages = 0
+        try:
+            while True:
+                context = wsman._enum_context(resp_xml)
+                if context is not None and prefetch:
+                    next_page = asyncio.ensure_future(self._pull_page(
+                        resource_uri, context, max_elems, sizer))
+
+                yield resp_xml
+                pages += 1
+
+                if context is None:
+                    wsman._notify(self.observers, 'enumeration_finished',
+                                  resource_uri, pages)
+                    return
+
+                if next_page is not None:
+                    resp_xml = await next_page
+                    next_page = None
+                else:
+                    resp_xml = await self._pull_page(resource_uri, context,
+                                                     max_elems, sizer)
+        finally:
+            # the cancelled pull closes its connection when it is resumed,
+            # which is waited for before returning
+            if next_page is not None:
+                next_page.cancel()
+                await asyncio.wait([next_page])
+
+    async def _pull_page(self, resource_uri, context, max_elems, sizer):
+        if sizer is None:
+            return await self.pull(resource_uri, context, max_elems)
+
+        payload = wsman._PullPayload(self.endpoint, resource_uri, context,
+                                     sizer.max_elems)
+        resp_xml, resp_size = await self._request_xml(payload)
+        sizer.update(resp_size, resp_xml)
+
+        return resp_xml
+
+    async def pull(self, resource_uri, context, max_elems=100):
+        """Executes pull operation over WSMan.
+
+        :param resource_uri: URI of resource to pull
+        :param context: enumeration context
+        :param max_elems: maximum number of elements returned by the operation
+        :returns: an lxml.etree.Element object of the response received
+        :raises: WSManRequestFailure on request failures
+        :raises: WSManInvalidResponse when receiving invalid response
+        """
+
+        payload = wsman._PullPayload(self.endpoint, resource_uri, context,
+                                     max_elems)
+        resp_xml, _ = await self._request_xml(payload)
+
+        return resp_xml
+
+    async def invoke(self, resource_uri, method, selectors, properties,
+                     idempotent=False):
+        """Executes invoke operation over WSMan.
+
+        :param resource_uri: URI of resource to invoke
+        :param method: name of the method to invoke
+        :param selector: dict of selectors
+        :param properties: dict of properties
+        :param idempotent: indicates whether invoking the method again has no
+                           further effect, in which case failed requests are
+                           retried according to the retry policy, and sent
+                           again on a new connection when a kept-alive one
+                           was closed by the endpoint
+        :returns: an lxml.etree.Element object of the response received.
+        :raises: WSManRequestFailure on request failures
+        :raises: WSManInvalidResponse when receiving invalid response
+        """
+
+        payload = wsman._InvokePayload(self.endpoint, resource_uri, method,
+                                       selectors, properties)
+        resp_xml, _ = await self._request_xml(payload, idempotent)
+
+        return resp_xml
@@ -0,0 +1,154 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Cache for the enumerations of slow-changing DRAC resources
+"""
+
+import collections
+import threading
+
+from dracclient.resources import uris
+from dracclient import wsman
+
+DEFAULT_MAX_ENTRIES = 128
+
+# number of seconds the enumerations are cached for, resources which are not
+# listed are never cached
+DEFAULT_TTLS = {
+    uris.DCIM_SystemView: 3600,
+    uris.DCIM_ControllerView: 300,
+}
+
+# resources changed by the config jobs once they run on the DRAC, which the
+# cache can't observe. They are only cached when passed in the ttls of
+# ResourceCache, eg. dict(DEFAULT_TTLS, **CONFIGURATION_TTLS), by callers
+# tolerating stale values.
+CONFIGURATION_TTLS = {
+    uris.DCIM_PhysicalDiskView: 300,
+    uris.DCIM_VirtualDiskView: 300,
+    uris.DCIM_BootConfigSetting: 300,
+    uris.DCIM_BootSourceSetting: 300,
+    uris.DCIM_BIOSEnumeration: 300,
+    uris.DCIM_BIOSString: 300,
+    uris.DCIM_BIOSInteger: 300,
+}
+
+ALL_RESOURCES = object()
+
+# resources affected by invoking a method on a resource. Changing the power
+# state applies the pending configuration, so it affects every resource.
+INVALIDATIONS = {
+    uris.DCIM_BIOSService: (uris.DCIM_BIOSEnumeration,
+                            uris.DCIM_BIOSString,
+                            uris.DCIM_BIOSInteger),
+    uris.DCIM_BootConfigSetting: (uris.DCIM_BootConfigSetting,
+                                  uris.DCIM_BootSourceSetting),
+    uris.DCIM_RAIDService: (uris.DCIM_ControllerView,
+                            uris.DCIM_PhysicalDiskView,
+                            uris.DCIM_VirtualDiskView),
+    uris.DCIM_ComputerSystem: ALL_RESOURCES,
+}
+
+
+class ResourceCache(object):
+    """LRU cache of enumerations with a time to live per resource
+
+    The cached values are shared between callers and must not be modified.
+    """
+
+    def __init__(self, ttls=None, max_entries=DEFAULT_MAX_ENTRIES):
+        """Creates ResourceCache object
+
+        :param ttls: dictionary of resource URIs and the number of seconds
+                     their enumerations are cached for. Defaults to
+                     DEFAULT_TTLS.
+        :param max_entries: maximum number of cached enumerations. The least
+                            recently used ones are evicted first.
+        """
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def is_cached(self, resource_uri):
+        """Returns whether the enumerations of a resource are cached"""
+        return bool(self.ttls.get(resource_uri))
+
+    def get(self, resource_uri, key):
+        """Returns a cached value
+
+        :param resource_uri: URI of the enumerated resource
+        :param key: hashable key of the enumeration, eg. its filter
+        :returns: the cached value or None if it's missing or expired
+        """
+        with self._lock:
+            entry = self._entries.pop((resource_uri, key), None)
+            if entry is None:
+                return None
+
+            value, expires = entry
+            if wsman._monotonic() >= expires:
+                return None
+
+            # moved to the end as the most recently used
+            self._entries[(resource_uri, key)] = entry
+            return value
+
+    def set(self, resource_uri, key, value):
+        """Caches a value, unless the resource isn't cached
+
+        :param resource_uri: URI of the enumerated resource
+        :param key: hashable key of the enumeration, eg. its filter
+        :param value: value to cache
+        """
+        ttl = self.ttls.get(resource_uri)
+        if not ttl:
+            return
+
+        with self._lock:
+            self._entries.pop((resource_uri, key), None)
+            self._entries[(resource_uri, key)] = (value,
+                                                  wsman._monotonic() + ttl)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, resource_uris=None):
+        """Drops the cached enumerations
+
+        :param resource_uris: list of resource URIs whose enumerations are
+                              dropped. If not set, everything is dropped.
+        """
+        with self._lock:
+            if resource_uris is None:
+                self._entries.clear()
+                return
+
+            resource_uris = set(resource_uris)
+            for entry_key in list(self._entries):
+                if entry_key[0] in resource_uris:
+                    del self._entries[entry_key]
+
+    def invalidate_for_invoke(self, resource_uri):
+        """Drops the enumerations affected by invoking a method on a resource
+
+        :param resource_uri: URI of the resource the method was invoked on
+        """
+        affected = INVALIDATIONS.get(resource_uri, ())
+        if affected is ALL_RESOURCES:
+            self.invalidate()
+        elif affected:
+            self.invalidate(affected)
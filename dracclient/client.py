@@ -15,9 +15,10 @@
 Wrapper for pywsman.Client
 """
 
+from concurrent import futures
 import logging
+import threading
 
-from dracclient import exceptions
 from dracclient.resources import bios
 from dracclient.resources import job
 from dracclient.resources import lifecycle_controller
@@ -35,7 +36,11 @@ class DRACClient(object):
     BIOS_DEVICE_FQDD = 'BIOS.Setup.1-1'
 
     def __init__(self, host, username, password, port=443, path='/wsman',
-                 protocol='https'):
+                 protocol='https', pool_size=wsman.DEFAULT_POOL_SIZE,
+                 idle_timeout=None, max_requests_per_connection=None,
+                 timeout=None, cache=None, coalesce=False,
+                 max_in_flight=None, retry_policy=None, observers=None,
+                 log_policy=None):
         """Creates client object
 
         :param host: hostname or IP of the DRAC interface
@@ -44,15 +49,73 @@ class DRACClient(object):
         :param port: port for accessing the DRAC interface
         :param path: path for accessing the DRAC interface
         :param protocol: protocol for accessing the DRAC interface
+        :param pool_size: maximum number of keep-alive connections kept open
+                          to the DRAC interface
+        :param idle_timeout: number of seconds without any request after
+                             which the pool of connections is discarded
+                             instead of being reused. See wsman.Client.
+        :param max_requests_per_connection: number of requests after which
+                                            the pool of connections is
+                                            recycled. See wsman.Client.
+        :param timeout: number of seconds to wait for the DRAC interface to
+                        accept the connection or to send data before giving up
+        :param cache: a cache.ResourceCache object used to cache the slow
+                      changing inventory, eg. the RAID controllers or the
+                      Lifecycle controller version. Methods changing the
+                      configuration drop the affected entries. It must not
+                      be shared with other clients. If not set, nothing is
+                      cached.
+        :param coalesce: indicates whether identical reads running
+                         concurrently in several threads, eg. get_power_state
+                         or list_jobs, should share a single request to the
+                         DRAC interface
+        :param max_in_flight: maximum number of requests in flight to the DRAC
+                              interface, shared by every client of the node.
+                              Requests over the limit wait in FIFO order. If
+                              not set, there is no limit.
+        :param retry_policy: a wsman.RetryPolicy object used to retry the
+                             requests failed with transient errors, eg. 503
+                             responses or reset connections. Reads and
+                             idempotent methods are retried. If not set,
+                             nothing is retried.
+        :param observers: list of wsman.Observer objects notified of every
+                          request, eg. a metrics.HistogramCollector
+        :param log_policy: a wsman.LogPolicy object controlling the sampling,
+                           truncation and redaction of the bodies logged at
+                           debug level
         """
-        self.client = WSManClient(host, username, password, port, path,
-                                  protocol)
+        self.client = WSManClient(
+            host, username, password, port, path, protocol,
+            pool_size=pool_size, idle_timeout=idle_timeout,
+            max_requests_per_connection=max_requests_per_connection,
+            timeout=timeout, max_in_flight=max_in_flight,
+            retry_policy=retry_policy, observers=observers,
+            log_policy=log_policy, cache=cache, coalesce=coalesce)
         self._job_mgmt = job.JobManagement(self.client)
         self._power_mgmt = bios.PowerManagement(self.client)
         self._boot_mgmt = bios.BootManagement(self.client)
         self._bios_cfg = bios.BIOSConfiguration(self.client)
         self._raid_mgmt = raid.RAIDManagement(self.client)
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Closes the connections kept open to the DRAC interface"""
+        self.client.close()
+
+    def invalidate_cache(self, resource_uris=None):
+        """Drops the cached inventory
+
+        :param resource_uris: list of resource URIs whose enumerations are
+                              dropped, eg. [uris.DCIM_ControllerView]. If not
+                              set, everything is dropped.
+        """
+        self.client.invalidate_cache(resource_uris)
+
     def get_power_state(self):
         """Returns the current power state of the node
 
@@ -119,9 +182,11 @@ class DRACClient(object):
         return self._boot_mgmt.change_boot_device_order(boot_mode,
                                                         boot_device_list)
 
-    def list_bios_settings(self):
+    def list_bios_settings(self, concurrent=False):
         """List the BIOS configuration settings
 
+        :param concurrent: flag to enumerate the BIOS attribute resources
+                           concurrently instead of one after another
         :returns: a dictionary with the BIOS settings using its name as the
                   key. The attributes are either BIOSEnumerableAttribute,
                   BIOSStringAttribute or BIOSIntegerAttribute objects.
@@ -130,9 +195,12 @@ class DRACClient(object):
         :raises: DRACOperationFailed on error reported back by the DRAC
                  interface
         """
-        return self._bios_cfg.list_bios_settings()
+        return self._bios_cfg.list_bios_settings(concurrent)
 
-    def set_bios_settings(self, settings):
+    def set_bios_settings(self, settings, concurrent=False,
+                          current_settings=None,
+                          max_attributes=bios.MAX_ATTRIBUTES_PER_INVOKE,
+                          max_bytes=bios.MAX_BYTES_PER_INVOKE):
         """Sets the BIOS configuration
 
         To be more precise, it sets the pending_value parameter for each of the
@@ -142,6 +210,25 @@ class DRACClient(object):
         :param settings: a dictionary containing the proposed values, with
                          each key being the name of attribute and the value
                          being the proposed value.
+        :param concurrent: flag to read the current BIOS settings
+                           concurrently. See list_bios_settings.
+        :param current_settings: a dictionary of the BIOS settings previously
+                                 returned by list_bios_settings. If set, the
+                                 new settings are validated against it and
+                                 only the SetAttributes method is invoked,
+                                 without reading the settings again.
+                                 Attributes whose value in it equals the
+                                 proposed one are not set, so it must not be
+                                 older than the last change.
+        :param max_attributes: maximum number of attributes set by a single
+                               SetAttributes invocation, or None for no
+                               limit. Larger change sets are split over
+                               several invocations, sent one after the other.
+                               If one fails, the attributes set by the
+                               previous ones stay pending.
+        :param max_bytes: maximum size in bytes of the attribute names and
+                          values set by a single SetAttributes invocation,
+                          or None for no limit.
         :returns: a dictionary containing the commit_needed key with a boolean
                   value indicating whether a config job must be created for the
                   values to be applied.
@@ -152,7 +239,9 @@ class DRACClient(object):
         :raises: DRACUnexpectedReturnValue on return value mismatch
         :raises: InvalidParameterValue on invalid BIOS attribute
         """
-        return self._bios_cfg.set_bios_settings(settings)
+        return self._bios_cfg.set_bios_settings(settings, concurrent,
+                                                current_settings,
+                                                max_attributes, max_bytes)
 
     def list_jobs(self, only_unfinished=False):
         """Returns a list of jobs from the job queue
@@ -179,6 +268,65 @@ class DRACClient(object):
         """
         return self._job_mgmt.get_job(job_id)
 
+    def get_jobs(self, job_ids):
+        """Returns many jobs from the job queue
+
+        The jobs are fetched with a single enumeration instead of one per job.
+
+        :param job_ids: list of job ids
+        :returns: a dictionary of job ids and Job objects, or None for the
+                  jobs not found
+        :raises: WSManRequestFailure on request failures
+        :raises: WSManInvalidResponse when receiving invalid response
+        :raises: DRACOperationFailed on error reported back by the DRAC
+                 interface
+        """
+        return self._job_mgmt.get_jobs(job_ids)
+
+    def wait_for_jobs(self, job_ids, timeout=job.DEFAULT_WAIT_TIMEOUT,
+                      poll_interval=job.DEFAULT_POLL_INTERVAL,
+                      max_poll_interval=job.DEFAULT_MAX_POLL_INTERVAL):
+        """Waits until the jobs reach a terminal state
+
+        The jobs still running are fetched with a single enumeration per
+        poll, with an exponentially growing and randomized interval between
+        the polls.
+
+        :param job_ids: list of job ids, eg. returned by
+                        commit_pending_bios_changes
+        :param timeout: number of seconds after which waiting is given up
+        :param poll_interval: number of seconds between the first polls
+        :param max_poll_interval: maximum number of seconds between polls
+        :returns: a dictionary of job ids and Job objects in a terminal
+                  state, eg. 'Completed' or 'Failed'
+        :raises: WSManRequestFailure on request failures
+        :raises: WSManInvalidResponse when receiving invalid response
+        :raises: DRACOperationFailed on error reported back by the DRAC
+                 interface
+        :raises: DRACTimeout when the jobs don't finish in time
+        """
+        return self._job_mgmt.wait_for_jobs(job_ids, timeout, poll_interval,
+                                            max_poll_interval)
+
+    def wait_for_job(self, job_id, timeout=job.DEFAULT_WAIT_TIMEOUT,
+                     poll_interval=job.DEFAULT_POLL_INTERVAL,
+                     max_poll_interval=job.DEFAULT_MAX_POLL_INTERVAL):
+        """Waits until a job reaches a terminal state
+
+        :param job_id: id of the job
+        :param timeout: number of seconds after which waiting is given up
+        :param poll_interval: number of seconds between the first polls
+        :param max_poll_interval: maximum number of seconds between polls
+        :returns: a Job object in a terminal state
+        :raises: WSManRequestFailure on request failures
+        :raises: WSManInvalidResponse when receiving invalid response
+        :raises: DRACOperationFailed on error reported back by the DRAC
+                 interface
+        :raises: DRACTimeout when the job doesn't finish in time
+        """
+        return self._job_mgmt.wait_for_job(job_id, timeout, poll_interval,
+                                           max_poll_interval)
+
     def create_config_job(self, resource_uri, cim_creation_class_name,
                           cim_name, target,
                           cim_system_creation_class_name='DCIM_ComputerSystem',
@@ -404,10 +552,103 @@ class DRACClient(object):
 
 
 class WSManClient(wsman.Client):
-    """Wrapper for wsman.Client with return value checking"""
+    """Wrapper for wsman.Client with return value checking and caching"""
+
+    def __init__(self, *args, **kwargs):
+        """Creates client object
+
+        Takes the parameters of wsman.Client, and the following ones:
+
+        :param cache: a cache.ResourceCache object used to cache the
+                      enumerations. If not set, nothing is cached.
+        :param coalesce: indicates whether identical enumerations running
+                         concurrently in several threads should share a
+                         single request to the DRAC interface
+        """
+        self.cache = kwargs.pop('cache', None)
+        self._in_flight = None
+        if kwargs.pop('coalesce', False):
+            self._in_flight = _SingleFlight()
+        super(WSManClient, self).__init__(*args, **kwargs)
+
+    def enumerate(self, resource_uri, optimization=True, max_elems=100,
+                  auto_pull=True, filter_query=None, filter_dialect='cql',
+                  **kwargs):
+        """Executes enumerate operation over WSMan
+
+        Takes the parameters of wsman.Client.enumerate. The responses of
+        cached or coalesced enumerations are shared between callers and must
+        not be modified. Responses are only shared with auto_pull.
+        """
+        def enumerate():
+            return super(WSManClient, self).enumerate(
+                resource_uri, optimization, max_elems, auto_pull,
+                filter_query, filter_dialect, **kwargs)
+
+        if not auto_pull:
+            return enumerate()
+
+        return self._shared_read(
+            resource_uri,
+            _read_key('enumerate', optimization, max_elems, filter_query,
+                      filter_dialect, **kwargs),
+            enumerate)
+
+    def iter_enumerate(self, resource_uri, max_elems=100, filter_query=None,
+                       filter_dialect='cql', **kwargs):
+        """Executes enumerate operation over WSMan, yielding the items
+
+        Takes the parameters of wsman.Client.iter_enumerate. The items of
+        cached or coalesced enumerations are read in full before the first
+        one is yielded, they are shared between callers and must not be
+        modified.
+        """
+        def iter_enumerate():
+            return super(WSManClient, self).iter_enumerate(
+                resource_uri, max_elems, filter_query, filter_dialect,
+                **kwargs)
+
+        if self._in_flight is None and (
+                self.cache is None or not self.cache.is_cached(resource_uri)):
+            return iter_enumerate()
+
+        items = self._shared_read(
+            resource_uri,
+            _read_key('iter_enumerate', max_elems, filter_query,
+                      filter_dialect, **kwargs),
+            lambda: list(iter_enumerate()))
+
+        return iter(items)
+
+    def _shared_read(self, resource_uri, key, read):
+        cacheable = (self.cache is not None and
+                     self.cache.is_cached(resource_uri))
+        if cacheable:
+            value = self.cache.get(resource_uri, key)
+            if value is not None:
+                return value
+
+        if self._in_flight is not None:
+            value = self._in_flight.do((resource_uri, key), read)
+        else:
+            value = read()
+
+        if cacheable:
+            self.cache.set(resource_uri, key, value)
+
+        return value
+
+    def invalidate_cache(self, resource_uris=None):
+        """Drops the cached enumerations
+
+        :param resource_uris: list of resource URIs whose enumerations are
+                              dropped. If not set, everything is dropped.
+        """
+        if self.cache is not None:
+            self.cache.invalidate(resource_uris)
 
     def invoke(self, resource_uri, method, selectors=None, properties=None,
-               expected_return_value=None):
+               expected_return_value=None, idempotent=False):
         """Invokes a remote WS-Man method
 
         :param resource_uri: URI of the resource
@@ -418,6 +659,9 @@ class WSManClient(wsman.Client):
             the DRAC card. For return value codes check the profile
             documentation of the resource used in the method call. If not set,
             return value checking is skipped.
+        :param idempotent: indicates whether invoking the method again has no
+                           further effect, in which case failed requests are
+                           retried according to the retry policy
         :returns: an lxml.etree.Element object of the response received
         :raises: WSManRequestFailure on request failures
         :raises: WSManInvalidResponse when receiving invalid response
@@ -431,19 +675,65 @@ class WSManClient(wsman.Client):
         if properties is None:
             properties = {}
 
-        resp = super(WSManClient, self).invoke(resource_uri, method, selectors,
-                                               properties)
-
-        return_value = utils.find_xml(resp, 'ReturnValue', resource_uri).text
-        if return_value == utils.RET_ERROR:
-            message_elems = utils.find_xml(resp, 'Message', resource_uri, True)
-            messages = [message_elem.text for message_elem in message_elems]
-            raise exceptions.DRACOperationFailed(drac_messages=messages)
+        try:
+            resp = super(WSManClient, self).invoke(resource_uri, method,
+                                                   selectors, properties,
+                                                   idempotent)
+        finally:
+            if self.cache is not None:
+                self.cache.invalidate_for_invoke(resource_uri)
 
-        if (expected_return_value is not None and
-                return_value != expected_return_value):
-            raise exceptions.DRACUnexpectedReturnValue(
-                expected_return_value=expected_return_value,
-                actual_return_value=return_value)
+        utils.check_return_value(resp, resource_uri, expected_return_value)
 
         return resp
+
+
+def _read_key(operation, *args, **kwargs):
+    """Returns the key of a read, made of every parameter of the operation
+
+    :param operation: name of the operation, eg. 'enumerate'
+    :param args: positional parameters of the operation
+    :param kwargs: keyword parameters of the operation
+    :returns: a hashable tuple
+    """
+    return (operation,) + args + tuple(sorted(kwargs.items()))
+
+
+class _SingleFlight(object):
+    """Shares the result of identical calls running at the same time"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        """Calls func, unless a call with the same key is running already
+
+        :param key: hashable key identifying the call
+        :param func: callable without arguments
+        :returns: the return value of the call
+        :raises: the exception raised by the call
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                leader = False
+            else:
+                leader = True
+                call = self._calls[key] = futures.Future()
+
+        if not leader:
+            return call.result()
+
+        try:
+            result = func()
+        except BaseException as exc:
+            # the waiters are released even if the leader is interrupted
+            call.set_exception(exc)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
@@ -17,6 +17,7 @@ class BaseClientException(Exception):
     msg_fmt = 'An unknown exception occurred'
 
     def __init__(self, message=None, **kwargs):
+        self.kwargs = kwargs
         message = self.msg_fmt % kwargs
         super(BaseClientException, self).__init__(message)
 
@@ -35,6 +36,10 @@ class DRACUnexpectedReturnValue(DRACRequestFailed):
                '%(expected_return_value)s')
 
 
+class DRACTimeout(BaseClientException):
+    msg_fmt = ('%(operation)s did not finish in %(timeout)s seconds')
+
+
 class InvalidParameterValue(BaseClientException):
     msg_fmt = '%(reason)s'
 
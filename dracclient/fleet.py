@@ -0,0 +1,444 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Parallel execution of DRACClient operations on many DRAC nodes
+"""
+
+import collections
+from concurrent import futures
+import threading
+
+from dracclient import client
+from dracclient import exceptions
+from dracclient.resources import bios
+from dracclient import wsman
+
+MODE_THREAD = 'thread'
+MODE_ASYNCIO = 'asyncio'
+
+NODE_PARAMS = ('host', 'username', 'password', 'port', 'path', 'protocol')
+
+FleetResult = collections.namedtuple('FleetResult',
+                                     ['host', 'result', 'exception'])
+
+BIOSNodePlan = collections.namedtuple(
+    'BIOSNodePlan', ['node', 'changes', 'current_settings', 'exception'])
+
+BIOSNodeResult = collections.namedtuple(
+    'BIOSNodeResult', ['node', 'changes', 'job_id', 'exception'])
+
+
+class FleetClient(object):
+    """Runs DRACClient operations on many DRAC nodes in parallel"""
+
+    def __init__(self, nodes, max_concurrency=16, timeout=None,
+                 mode=MODE_THREAD, max_in_flight_per_host=None):
+        """Creates FleetClient object
+
+        :param nodes: list of nodes. A node is either a tuple of host,
+                      username and password, optionally followed by port,
+                      path and protocol, or a dictionary of DRACClient
+                      parameters.
+        :param max_concurrency: maximum number of nodes processed at the same
+                                time
+        :param timeout: number of seconds after which an operation on a single
+                        node is reported as failed with DRACTimeout. If not
+                        set, operations are not timed out.
+        :param mode: 'thread' to run the blocking DRACClient in a thread pool
+                     or 'asyncio' to run AsyncDRACClient in an event loop,
+                     which requires Python 3.6 or newer
+        :param max_in_flight_per_host: maximum number of requests in flight
+                                       to a single node, shared with the
+                                       other clients of the node
+        :raises: InvalidParameterValue on invalid mode or concurrency
+        """
+        if mode not in (MODE_THREAD, MODE_ASYNCIO):
+            msg = ("'%(mode)s' is not supported. Supported modes: "
+                   "%(supported_modes)r") % {
+                       'mode': mode,
+                       'supported_modes': [MODE_THREAD, MODE_ASYNCIO]}
+            raise exceptions.InvalidParameterValue(reason=msg)
+
+        if max_concurrency < 1:
+            raise exceptions.InvalidParameterValue(
+                reason="'max_concurrency' must be a positive integer")
+
+        self.nodes = [self._parse_node(node) for node in nodes]
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.mode = mode
+        self.max_in_flight_per_host = max_in_flight_per_host
+
+        self._clients = {}
+        self._clients_lock = threading.Lock()
+        self._async_clients = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Closes the connections kept open to the DRAC nodes"""
+
+        with self._clients_lock:
+            for drac_client in self._clients.values():
+                drac_client.close()
+            self._clients.clear()
+
+    def aclose(self):
+        """Closes the connections opened by arun to the DRAC nodes
+
+        Requires Python 3.6 or newer.
+
+        :returns: a coroutine
+        """
+        from dracclient import aiofleet
+
+        return aiofleet.aclose(self)
+
+    @property
+    def hosts(self):
+        return [node['host'] for node in self.nodes]
+
+    def run(self, method, *args, **kwargs):
+        """Runs a DRACClient method on every node
+
+        Results are yielded in completion order. At most max_concurrency
+        nodes are processed at the same time and no new node is started
+        until the results already finished are consumed.
+
+        :param method: name of the DRACClient method, eg. 'get_power_state'
+        :param args: positional arguments of the method
+        :param kwargs: keyword arguments of the method
+        :returns: generator of FleetResult objects, one per node, holding
+                  either the return value of the method or the exception
+                  raised by it
+        :raises: InvalidParameterValue on unknown method
+        """
+        self._check_method(method)
+
+        if self.mode == MODE_THREAD:
+            return self._run_threads(method, args, kwargs)
+
+        from dracclient import aiofleet
+
+        return aiofleet.run_event_loop(self, method, args, kwargs)
+
+    def arun(self, method, *args, **kwargs):
+        """Runs an AsyncDRACClient method on every node
+
+        Asynchronous version of run, to be used from an already running event
+        loop. The connections are kept open between calls until aclose is
+        awaited. Requires Python 3.6 or newer.
+
+        :param method: name of the DRACClient method, eg. 'get_power_state'
+        :param args: positional arguments of the method
+        :param kwargs: keyword arguments of the method
+        :returns: asynchronous generator of FleetResult objects
+        :raises: InvalidParameterValue on unknown method
+        """
+        from dracclient import aiofleet
+
+        return aiofleet.arun(self, method, *args, **kwargs)
+
+    def _parse_node(self, node):
+        if isinstance(node, dict):
+            return dict(node)
+
+        if not 3 <= len(node) <= len(NODE_PARAMS):
+            msg = ('Invalid node %(node)r. It must be a tuple of '
+                   '%(params)s.') % {'node': node,
+                                     'params': ', '.join(NODE_PARAMS)}
+            raise exceptions.InvalidParameterValue(reason=msg)
+
+        return dict(zip(NODE_PARAMS, node))
+
+    def _check_method(self, method):
+        if method.startswith('_') or not callable(
+                getattr(client.DRACClient, method, None)):
+            msg = "'%s' is not a DRACClient method" % method
+            raise exceptions.InvalidParameterValue(reason=msg)
+
+    def _client_key(self, node):
+        # nodes differing in any parameter get their own client, the
+        # unhashable parameters, eg. observers, are compared by identity
+        key = []
+        for name, value in sorted(node.items()):
+            try:
+                hash(value)
+            except TypeError:
+                value = id(value)
+            key.append((name, value))
+
+        return tuple(key)
+
+    def _client_params(self, node):
+        params = dict(node)
+        if self.timeout is not None:
+            params.setdefault('timeout', self.timeout)
+        if self.max_in_flight_per_host is not None:
+            params.setdefault('max_in_flight', self.max_in_flight_per_host)
+        params.setdefault('pool_size', 1)
+
+        return params
+
+    def _get_client(self, node):
+        # called from the worker threads, a client created by two of them
+        # at the same time would never be closed
+        key = self._client_key(node)
+        with self._clients_lock:
+            drac_client = self._clients.get(key)
+            if drac_client is None:
+                drac_client = client.DRACClient(**self._client_params(node))
+                self._clients[key] = drac_client
+
+        return drac_client
+
+    def _timeout_exception(self, node, method):
+        return exceptions.DRACTimeout(
+            operation='%s on %s' % (method, node['host']),
+            timeout=self.timeout)
+
+    def _run_node(self, drac_client, method, args, kwargs):
+        return getattr(drac_client, method)(*args, **kwargs)
+
+    def _run_threads(self, method, args, kwargs):
+        nodes = iter(self.nodes)
+        running = {}
+        executor = futures.ThreadPoolExecutor(
+            max_workers=self.max_concurrency)
+
+        try:
+            while True:
+                for node in nodes:
+                    future = executor.submit(self._run_node,
+                                             self._get_client(node), method,
+                                             args, kwargs)
+                    running[future] = (node, wsman._monotonic())
+                    if len(running) >= self.max_concurrency:
+                        break
+
+                if not running:
+                    return
+
+                done, _ = futures.wait(running,
+                                       timeout=self._next_deadline(running),
+                                       return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    node, started = running.pop(future)
+                    if started is None:
+                        # already reported as timed out
+                        continue
+
+                    try:
+                        yield FleetResult(node['host'], future.result(), None)
+                    except Exception as exc:
+                        yield FleetResult(node['host'], None, exc)
+
+                for future in self._timed_out(running):
+                    node, _ = running[future]
+                    # the worker thread can't be interrupted, so the node
+                    # keeps its slot until the request gives up as well
+                    running[future] = (node, None)
+                    yield FleetResult(node['host'], None,
+                                      self._timeout_exception(node, method))
+        finally:
+            for future in running:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def _next_deadline(self, running):
+        if self.timeout is None:
+            return None
+
+        started = [start for (_, start) in running.values()
+                   if start is not None]
+        if not started:
+            return None
+
+        return max(0, min(started) + self.timeout - wsman._monotonic())
+
+    def _timed_out(self, running):
+        if self.timeout is None:
+            return []
+
+        now = wsman._monotonic()
+        return [future for (future, (_, started)) in running.items()
+                if started is not None and now - started >= self.timeout]
+
+
+class BIOSPlan(object):
+    """Changes needed to apply a BIOS profile to the nodes of a fleet"""
+
+    def __init__(self, profile, node_plans):
+        """Creates BIOSPlan object
+
+        :param profile: dictionary of the desired BIOS settings
+        :param node_plans: list of BIOSNodePlan objects, in the order of the
+                           nodes of the fleet
+        """
+        self.profile = profile
+        self.nodes = node_plans
+
+    @property
+    def pending(self):
+        """Returns the plans of the nodes needing changes"""
+
+        return [node_plan for node_plan in self.nodes
+                if node_plan.exception is None and node_plan.changes]
+
+    @property
+    def up_to_date(self):
+        """Returns the plans of the nodes already matching the profile"""
+
+        return [node_plan for node_plan in self.nodes
+                if node_plan.exception is None and not node_plan.changes]
+
+    @property
+    def failed(self):
+        """Returns the plans of the nodes which can't be planned
+
+        Either their settings couldn't be read, or the profile is invalid for
+        them, eg. it sets attributes missing or read-only on their model.
+        """
+        return [node_plan for node_plan in self.nodes
+                if node_plan.exception is not None]
+
+    def groups(self):
+        """Groups the nodes needing the same changes
+
+        :returns: list of (changes, node plans) tuples, in the order of the
+                  first node of each group
+        """
+        groups = collections.OrderedDict()
+        for node_plan in self.pending:
+            key = tuple(sorted((name, str(value)) for (name, value)
+                               in node_plan.changes.items()))
+            groups.setdefault(key, (node_plan.changes, []))[1].append(
+                node_plan)
+
+        return list(groups.values())
+
+
+class BIOSPlanner(object):
+    """Applies a BIOS profile to the nodes of a fleet
+
+    Only the settings differing from the profile are set and only on the
+    nodes having any, so that the other nodes are neither changed nor
+    rebooted. It uses the blocking clients of the fleet, at most
+    max_concurrency nodes are processed at the same time.
+    """
+
+    def __init__(self, fleet):
+        """Creates BIOSPlanner object
+
+        :param fleet: a FleetClient object
+        """
+        self.fleet = fleet
+
+    def plan(self, profile):
+        """Reads the BIOS settings of the nodes and computes their changes
+
+        :param profile: a dictionary containing the desired values, with each
+                        key being the name of attribute and the value being
+                        the desired value
+        :returns: a BIOSPlan object
+        """
+        node_plans = self._map(lambda node: self._plan_node(node, profile))
+        return BIOSPlan(profile, node_plans)
+
+    def apply(self, plan, commit=True, reboot=False):
+        """Sets the planned changes on the nodes needing any
+
+        The nodes needing the same changes are applied together: the
+        changes of each group are validated once, against the settings read
+        by plan for its first node, and the resulting SetAttributes
+        invocations are sent to every node of the group. Each node costs a
+        SetAttributes invocation per chunk of its changes, see
+        bios.MAX_ATTRIBUTES_PER_INVOKE and bios.MAX_BYTES_PER_INVOKE,
+        followed by a config job if the changes need one.
+
+        :param plan: a BIOSPlan object
+        :param commit: indicates whether a config job should be created to
+                       apply the changes
+        :param reboot: indicates whether a RebootJob should be also be
+                       created or not
+        :returns: list of BIOSNodeResult objects of the nodes needing changes,
+                  holding the id of the config job, if created, or the
+                  exception raised
+        """
+        group_invocations = {}
+        for (changes, node_plans) in plan.groups():
+            invocations = self._build_group(changes, node_plans[0])
+            for node_plan in node_plans:
+                group_invocations[id(node_plan)] = invocations
+
+        return self._map(
+            lambda node_plan: self._apply_node(
+                node_plan, group_invocations[id(node_plan)], commit, reboot),
+            plan.pending)
+
+    def _build_group(self, changes, node_plan):
+        # returns the SetAttributes invocations shared by the nodes of a
+        # group, or the exception raised validating their changes
+        try:
+            return bios.BIOSConfiguration(None)._build_set_attributes(
+                changes, node_plan.current_settings)
+        except Exception as exc:
+            return exc
+
+    def _plan_node(self, node, profile):
+        try:
+            current_settings = self.fleet._get_client(
+                node).list_bios_settings()
+            validation = bios.validate_many(profile, current_settings)
+            validation.check()
+        except Exception as exc:
+            return BIOSNodePlan(node, None, None, exc)
+
+        return BIOSNodePlan(node, validation.changed, current_settings, None)
+
+    def _apply_node(self, node_plan, invocations, commit, reboot):
+        if isinstance(invocations, Exception):
+            return BIOSNodeResult(node_plan.node, node_plan.changes, None,
+                                  invocations)
+
+        drac_client = self.fleet._get_client(node_plan.node)
+        job_id = None
+        try:
+            docs = [drac_client.client.invoke(**invocation)
+                    for invocation in invocations]
+            result = drac_client._bios_cfg._parse_set_attributes(docs)
+            if commit and result['commit_required']:
+                job_id = drac_client.commit_pending_bios_changes(reboot)
+        except Exception as exc:
+            return BIOSNodeResult(node_plan.node, node_plan.changes, job_id,
+                                  exc)
+
+        return BIOSNodeResult(node_plan.node, node_plan.changes, job_id, None)
+
+    def _map(self, func, items=None):
+        # runs func on the items, defaulting to the nodes of the fleet, and
+        # returns the results in the same order
+        if items is None:
+            items = self.fleet.nodes
+        if not items:
+            return []
+
+        with futures.ThreadPoolExecutor(
+                max_workers=min(self.fleet.max_concurrency,
+                                len(items))) as executor:
+            return list(executor.map(func, items))
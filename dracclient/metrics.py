@@ -0,0 +1,151 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+In-memory metrics of the WS-Man requests
+"""
+
+import bisect
+import collections
+import threading
+
+from dracclient import wsman
+
+TIME_METRICS = ('wait_time', 'download_time', 'parse_time')
+SIZE_METRICS = ('request_size', 'response_size')
+
+# upper bound of the first bucket of the histograms
+FIRST_TIME_BOUND = 0.001
+FIRST_SIZE_BOUND = 256
+FIRST_PAGES_BOUND = 1
+
+HistogramSummary = collections.namedtuple(
+    'HistogramSummary', ['count', 'mean', 'min', 'max', 'p50', 'p90', 'p99'])
+
+
+class Histogram(object):
+    """Histogram with exponentially growing buckets
+
+    Percentiles are approximated by the upper bound of their bucket.
+    """
+
+    def __init__(self, first_bound, buckets=24, factor=2):
+        """Creates Histogram object
+
+        :param first_bound: upper bound of the first bucket
+        :param buckets: number of buckets, values above the upper bound of
+                        the last one are counted in an overflow bucket
+        :param factor: ratio of the upper bounds of consecutive buckets
+        """
+        self.bounds = [first_bound * factor ** i for i in range(buckets)]
+        self.counts = [0] * (buckets + 1)
+        self.count = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        """Adds a value to the histogram"""
+
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, percent):
+        """Returns the approximate percentile of the values
+
+        :param percent: percentage of the values below the percentile
+        :returns: the upper bound of the bucket of the percentile, capped by
+                  the maximum value, or None if the histogram is empty
+        """
+        if not self.count:
+            return None
+
+        rank = percent / 100.0 * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+
+        return self.max
+
+    def summary(self):
+        """Returns a HistogramSummary object of the values"""
+
+        mean = self.sum / float(self.count) if self.count else None
+        return HistogramSummary(
+            count=self.count, mean=mean, min=self.min, max=self.max,
+            p50=self.percentile(50), p90=self.percentile(90),
+            p99=self.percentile(99))
+
+
+class HistogramCollector(wsman.Observer):
+    """Collects the statistics of the requests in histograms
+
+    The histograms are kept per operation, ie. 'Enumerate', 'Pull' or
+    'Invoke', and per metric, eg. 'wait_time' or 'response_size'. Failed
+    requests are counted, but not included in the histograms.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.pages = Histogram(FIRST_PAGES_BOUND)
+        self.requests = collections.Counter()
+        self.errors = collections.Counter()
+
+    def request_finished(self, stats):
+        with self._lock:
+            self.requests[stats.operation] += 1
+            if stats.error is not None:
+                self.errors[stats.operation] += 1
+                return
+
+            for metric in TIME_METRICS:
+                self._histogram(stats.operation, metric,
+                                FIRST_TIME_BOUND).add(getattr(stats, metric))
+            for metric in SIZE_METRICS:
+                self._histogram(stats.operation, metric,
+                                FIRST_SIZE_BOUND).add(getattr(stats, metric))
+
+    def enumeration_finished(self, resource_uri, pages):
+        with self._lock:
+            self.pages.add(pages)
+
+    def summary(self):
+        """Returns the summary of the histograms
+
+        :returns: a dictionary of (operation, metric) tuples and
+                  HistogramSummary objects. The number of pages of the
+                  enumerations is under the ('Enumerate', 'pages') key.
+        """
+        with self._lock:
+            result = dict((key, histogram.summary())
+                          for (key, histogram) in self.histograms.items())
+            if self.pages.count:
+                result[('Enumerate', 'pages')] = self.pages.summary()
+
+            return result
+
+    def _histogram(self, operation, metric, first_bound):
+        histogram = self.histograms.get((operation, metric))
+        if histogram is None:
+            histogram = Histogram(first_bound)
+            self.histograms[(operation, metric)] = histogram
+
+        return histogram
@@ -0,0 +1,273 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Canned answers to WS-Man requests
+
+The Responder answers Enumerate, Pull and Invoke requests with the bodies of
+the wsman_mocks fixtures, independently of the transport. It is shared by
+dracclient.aiosimulator and the benchmarks.
+"""
+
+import collections
+import copy
+import os
+import re
+import threading
+
+from lxml import etree as ElementTree
+
+from dracclient.resources import uris
+from dracclient import wsman
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'tests',
+                            'wsman_mocks')
+
+
+def load_fixture(name):
+    """Returns the body of a wsman_mocks fixture
+
+    :param name: name of the fixture, without the .xml extension
+    """
+    with open(os.path.join(FIXTURES_DIR, '%s.xml' % name), 'rb') as f:
+        return f.read()
+
+
+DEFAULT_ENUMERATIONS = dict(
+    (resource_uri, load_fixture(name)) for (resource_uri, name) in [
+        (uris.DCIM_BIOSEnumeration, 'bios_enumeration-enum-ok'),
+        (uris.DCIM_BIOSString, 'bios_string-enum-ok'),
+        (uris.DCIM_BIOSInteger, 'bios_integer-enum-ok'),
+        (uris.DCIM_BootConfigSetting, 'boot_config_setting-enum-ok'),
+        (uris.DCIM_BootSourceSetting, 'boot_source_setting-enum-ok'),
+        (uris.DCIM_ComputerSystem, 'computer_system-enum-ok'),
+        (uris.DCIM_ControllerView, 'controller_view-enum-ok'),
+        (uris.DCIM_VirtualDiskView, 'virtual_disk_view-enum-ok'),
+        (uris.DCIM_PhysicalDiskView, 'physical_disk_view-enum-ok'),
+        (uris.DCIM_LifecycleJob, 'lifecycle_job-enum-ok'),
+        (uris.DCIM_SystemView, 'system_view-enum-ok')])
+
+DEFAULT_INVOCATIONS = dict(
+    ((resource_uri, method), load_fixture(name))
+    for (resource_uri, method, name) in [
+        (uris.DCIM_ComputerSystem, 'RequestStateChange',
+         'computer_system-invoke-request_state_change-ok'),
+        (uris.DCIM_BIOSService, 'SetAttributes',
+         'bios_service-invoke-set_attributes-ok'),
+        (uris.DCIM_BIOSService, 'CreateTargetedConfigJob',
+         'bios_service-invoke-create_targeted_config_job-ok'),
+        (uris.DCIM_BIOSService, 'DeletePendingConfiguration',
+         'bios_service-invoke-delete_pending_configuration-ok'),
+        (uris.DCIM_BootConfigSetting, 'ChangeBootOrderByInstanceID',
+         'boot_config_setting-invoke-change_boot_order_by_instance_id-ok'),
+        (uris.DCIM_RAIDService, 'CreateVirtualDisk',
+         'raid_service-invoke-create_virtual_disk-ok'),
+        (uris.DCIM_RAIDService, 'DeleteVirtualDisk',
+         'raid_service-invoke-delete_virtual_disk-ok')])
+
+# maximum number of serialized pages kept, the least recently used ones are
+# rendered again when needed
+MAX_CACHED_PAGES = 256
+
+# status code of the responses rejected over the concurrency limit
+BUSY_STATUS_CODE = 503
+
+REASONS = {200: 'OK', 400: 'Bad Request', 500: 'Internal Server Error',
+           503: 'Service Unavailable'}
+
+FAULT = """<s:Envelope xmlns:s="http://www.w3.org/2003/05/soap-envelope">
+  <s:Body>
+    <s:Fault>
+      <s:Reason><s:Text>%s</s:Text></s:Reason>
+    </s:Fault>
+  </s:Body>
+</s:Envelope>"""
+
+_RESOURCE_URI_RE = re.compile(br'<wsman:ResourceURI[^>]*>([^<]*)<')
+_ACTION_RE = re.compile(br'<wsa:Action[^>]*>([^<]*)<')
+_MAX_ELEMS_RE = re.compile(br'<wsman:MaxElements>(\d+)<')
+_CONTEXT_RE = re.compile(br'<wsen:EnumerationContext>page-(\d+)<')
+
+_ENUMERATE_ACTION = '%s/Enumerate' % wsman.NS_WSMAN_ENUM
+_PULL_ACTION = '%s/Pull' % wsman.NS_WSMAN_ENUM
+
+
+class Responder(object):
+    """Answers WS-Man requests with canned responses
+
+    Enumerations are split into pages of at most MaxElements items, which are
+    pulled with the offset of the next page as the enumeration context.
+    Filters are ignored. The most recently used pages are serialized once
+    and reused, up to MAX_CACHED_PAGES of them. It can be shared by threads.
+    """
+
+    def __init__(self, enumerations=None, invocations=None, page_size=None):
+        """Creates Responder object
+
+        :param enumerations: dictionary of resource URIs and their
+                             enumeration responses. Defaults to
+                             DEFAULT_ENUMERATIONS.
+        :param invocations: dictionary of (resource URI, method name) tuples
+                            and the responses of the invocations. Defaults to
+                            DEFAULT_INVOCATIONS.
+        :param page_size: maximum number of items per page, regardless of
+                          MaxElements
+        """
+        self.page_size = page_size
+        self._enumerations = {}
+        self._invocations = {}
+        self._pages = collections.OrderedDict()
+        self._pages_lock = threading.Lock()
+
+        if enumerations is None:
+            enumerations = DEFAULT_ENUMERATIONS
+        if invocations is None:
+            invocations = DEFAULT_INVOCATIONS
+
+        for (resource_uri, body) in enumerations.items():
+            self.add_enumeration(resource_uri, body)
+        for ((resource_uri, method), body) in invocations.items():
+            self.add_invocation(resource_uri, method, body)
+
+    def add_enumeration(self, resource_uri, body):
+        """Sets the enumeration response of a resource
+
+        :param resource_uri: URI of the resource
+        :param body: enumeration response holding every item
+        """
+        doc = ElementTree.fromstring(_to_bytes(body))
+        items_elem = doc.find('.//{%s}Items' % wsman.NS_WSMAN)
+        items = []
+        if items_elem is not None:
+            items = list(items_elem.iterchildren(ElementTree.Element))
+            for item in list(items_elem):
+                items_elem.remove(item)
+
+        for context_elem in list(doc.iterfind(
+                './/{%s}EnumerationContext' % wsman.NS_WSMAN_ENUM)):
+            context_elem.getparent().remove(context_elem)
+
+        with self._pages_lock:
+            self._enumerations[resource_uri] = (doc, items)
+            for key in list(self._pages):
+                if key[0] == resource_uri:
+                    del self._pages[key]
+
+    def add_invocation(self, resource_uri, method, body):
+        """Sets the response of invoking a method
+
+        :param resource_uri: URI of the resource
+        :param method: name of the method
+        :param body: response of the invocation
+        """
+        self._invocations[(resource_uri, method)] = _to_bytes(body)
+
+    def respond(self, body):
+        """Returns the response of a request
+
+        :param body: body of the request
+        :returns: a tuple of the status code and the body of the response
+        """
+        resource_uri = _match(_RESOURCE_URI_RE, body)
+        action = _match(_ACTION_RE, body)
+        if resource_uri is None or action is None:
+            return 400, fault('Malformed request')
+
+        if action == _ENUMERATE_ACTION:
+            return self._page(resource_uri, 0, body, False)
+        elif action == _PULL_ACTION:
+            offset = _match(_CONTEXT_RE, body)
+            if offset is None:
+                return 400, fault('Invalid enumeration context')
+
+            return self._page(resource_uri, int(offset), body, True)
+
+        content = self._invocations.get(
+            (resource_uri, action[len(resource_uri) + 1:]))
+        if content is None:
+            return 400, fault('Unknown action %s' % action)
+
+        return 200, content
+
+    def _page(self, resource_uri, offset, body, pull):
+        if resource_uri not in self._enumerations:
+            return 400, fault('Unknown resource %s' % resource_uri)
+
+        max_elems = int(_match(_MAX_ELEMS_RE, body) or 100)
+        if self.page_size is not None:
+            max_elems = min(max_elems, self.page_size)
+
+        key = (resource_uri, offset, max_elems, pull)
+        with self._pages_lock:
+            content = self._pages.pop(key, None)
+            if content is not None:
+                # moved to the end as the most recently used
+                self._pages[key] = content
+                return 200, content
+
+            enumeration = self._enumerations[resource_uri]
+
+        content = self._render_page(enumeration, offset, max_elems, pull)
+        with self._pages_lock:
+            # unless the enumeration was replaced while rendering
+            if self._enumerations.get(resource_uri) is enumeration:
+                self._pages[key] = content
+            while len(self._pages) > MAX_CACHED_PAGES:
+                self._pages.popitem(last=False)
+
+        return 200, content
+
+    def _render_page(self, enumeration, offset, max_elems, pull):
+        template, items = enumeration
+        doc = copy.deepcopy(template)
+        resp_elem = doc.find('.//{%s}EnumerateResponse' % wsman.NS_WSMAN_ENUM)
+        items_elem = resp_elem.find('{%s}Items' % wsman.NS_WSMAN)
+        if items_elem is None:
+            items_elem = ElementTree.SubElement(
+                resp_elem, '{%s}Items' % wsman.NS_WSMAN)
+        if pull:
+            resp_elem.tag = '{%s}PullResponse' % wsman.NS_WSMAN_ENUM
+            items_elem.tag = '{%s}Items' % wsman.NS_WSMAN_ENUM
+
+        end = offset + max_elems
+        items_elem.extend(copy.deepcopy(item) for item in items[offset:end])
+
+        if end < len(items):
+            context_elem = ElementTree.Element(
+                '{%s}EnumerationContext' % wsman.NS_WSMAN_ENUM)
+            context_elem.text = 'page-%d' % end
+            resp_elem.insert(0, context_elem)
+        elif pull:
+            ElementTree.SubElement(
+                resp_elem, '{%s}EndOfSequence' % wsman.NS_WSMAN_ENUM)
+
+        return ElementTree.tostring(doc)
+
+
+def fault(reason):
+    """Returns a SOAP fault as bytes"""
+
+    return (FAULT % reason).encode('utf-8')
+
+
+def _match(regex, body):
+    match = regex.search(body)
+    if match is not None:
+        return match.group(1).decode('utf-8')
+
+
+def _to_bytes(body):
+    if isinstance(body, bytes):
+        return body
+
+    return body.encode('utf-8')
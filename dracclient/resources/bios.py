@@ -12,6 +12,7 @@
 #    under the License.
 
 import collections
+from concurrent import futures
 import logging
 import re
 
@@ -20,7 +21,6 @@ from dracclient import exceptions
 from dracclient.resources import lifecycle_controller
 from dracclient.resources import uris
 from dracclient import utils
-from dracclient import wsman
 
 LOG = logging.getLogger(__name__)
 
@@ -45,6 +45,14 @@ BOOT_MODE_IS_NEXT = {
 
 LC_CONTROLLER_VERSION_12G = (2, 0, 0)
 
+POWER_STATE_FILTER_QUERY = ('select EnabledState from '
+                            'DCIM_ComputerSystem where Name="srv:system"')
+
+BIOS_SERVICE_SELECTORS = {'CreationClassName': 'DCIM_BIOSService',
+                          'Name': 'DCIM:BIOSService',
+                          'SystemCreationClassName': 'DCIM_ComputerSystem',
+                          'SystemName': 'DCIM:ComputerSystem'}
+
 BootMode = collections.namedtuple('BootMode', ['id', 'name', 'is_current',
                                                'is_next'])
 
@@ -53,6 +61,50 @@ BootDevice = collections.namedtuple(
     ['id',  'boot_mode', 'current_assigned_sequence',
      'pending_assigned_sequence', 'bios_boot_string'])
 
+# maximum number of compiled regexes and sets of possible values cached
+MAX_CACHED_VALIDATORS = 1024
+
+# maximum number of canonical attribute names, values and metadata kept
+MAX_SHARED_VALUES = 65536
+
+# default limits of a single SetAttributes invocation, larger change sets are
+# split over several invocations. The bytes are those of the attribute names
+# and values, and of the elements holding them.
+MAX_ATTRIBUTES_PER_INVOKE = 256
+MAX_BYTES_PER_INVOKE = 64 * 1024
+
+# serialized size of the elements of a single attribute, besides its name and
+# value
+_SET_ATTRIBUTES_ITEM_OVERHEAD = len(
+    '<ns0:AttributeName></ns0:AttributeName>'
+    '<ns0:AttributeValue></ns0:AttributeValue>')
+
+BOOT_MODE_FIELDS = utils.WSManFieldMap(
+    uris.DCIM_BootConfigSetting, BootMode,
+    [('id', 'InstanceID'),
+     ('name', 'ElementName'),
+     ('is_current', 'IsCurrent', BOOT_MODE_IS_CURRENT.__getitem__),
+     ('is_next', 'IsNext', BOOT_MODE_IS_NEXT.__getitem__)])
+
+BOOT_DEVICE_FIELDS = utils.WSManFieldMap(
+    uris.DCIM_BootSourceSetting, BootDevice,
+    [('id', 'InstanceID'),
+     ('boot_mode', 'BootSourceType'),
+     ('current_assigned_sequence', 'CurrentAssignedSequence', int),
+     ('pending_assigned_sequence', 'PendingAssignedSequence', int),
+     ('bios_boot_string', 'BIOSBootString')])
+
+# DRAC 11g doesn't have the BootSourceType attribute, the boot mode is the
+# prefix of the InstanceID
+BOOT_DEVICE_FIELDS_11G = utils.WSManFieldMap(
+    uris.DCIM_BootSourceSetting, BootDevice,
+    [('id', 'InstanceID'),
+     ('boot_mode', 'InstanceID',
+      lambda instance_id: instance_id.split(':')[0]),
+     ('current_assigned_sequence', 'CurrentAssignedSequence', int),
+     ('pending_assigned_sequence', 'PendingAssignedSequence', int),
+     ('bios_boot_string', 'BIOSBootString')])
+
 
 class PowerManagement(object):
 
@@ -74,14 +126,10 @@ class PowerManagement(object):
                  interface
         """
 
-        filter_query = ('select EnabledState from '
-                        'DCIM_ComputerSystem where Name="srv:system"')
         doc = self.client.enumerate(uris.DCIM_ComputerSystem,
-                                    filter_query=filter_query)
-        enabled_state = utils.find_xml(doc, 'EnabledState',
-                                       uris.DCIM_ComputerSystem)
+                                    filter_query=POWER_STATE_FILTER_QUERY)
 
-        return POWER_STATES[enabled_state.text]
+        return self._parse_power_state(doc)
 
     def set_power_state(self, target_state):
         """Turns the server power on/off or do a reboot
@@ -96,6 +144,16 @@ class PowerManagement(object):
         :raises: InvalidParameterValue on invalid target power state
         """
 
+        self.client.invoke(**self._build_set_power_state(target_state))
+
+    def _parse_power_state(self, doc):
+        enabled_state = utils.find_xml(doc, 'EnabledState',
+                                       uris.DCIM_ComputerSystem)
+
+        return POWER_STATES[enabled_state.text]
+
+    def _build_set_power_state(self, target_state):
+        # returns the arguments of the RequestStateChange invocation
         try:
             drac_requested_state = REVERSE_POWER_STATES[target_state]
         except KeyError:
@@ -109,8 +167,10 @@ class PowerManagement(object):
                      'Name': 'srv:system'}
         properties = {'RequestedState': drac_requested_state}
 
-        self.client.invoke(uris.DCIM_ComputerSystem, 'RequestStateChange',
-                           selectors, properties)
+        return {'resource_uri': uris.DCIM_ComputerSystem,
+                'method': 'RequestStateChange',
+                'selectors': selectors,
+                'properties': properties}
 
 
 class BootManagement(object):
@@ -132,14 +192,9 @@ class BootManagement(object):
                  interface
         """
 
-        doc = self.client.enumerate(uris.DCIM_BootConfigSetting)
+        items = self.client.iter_enumerate(uris.DCIM_BootConfigSetting)
 
-        drac_boot_modes = utils.find_xml(doc, 'DCIM_BootConfigSetting',
-                                         uris.DCIM_BootConfigSetting,
-                                         find_all=True)
-
-        return [self._parse_drac_boot_mode(drac_boot_mode)
-                for drac_boot_mode in drac_boot_modes]
+        return self._parse_drac_boot_modes(items)
 
     def list_boot_devices(self):
         """Returns the list of boot devices
@@ -155,12 +210,8 @@ class BootManagement(object):
 
         doc = self.client.enumerate(uris.DCIM_BootSourceSetting)
 
-        drac_boot_devices = utils.find_xml(doc, 'DCIM_BootSourceSetting',
-                                           uris.DCIM_BootSourceSetting,
-                                           find_all=True)
         try:
-            boot_devices = [self._parse_drac_boot_device(drac_boot_device)
-                            for drac_boot_device in drac_boot_devices]
+            boot_devices = self._parse_drac_boot_devices(doc)
         except AttributeError:
             # DRAC 11g doesn't have the BootSourceType attribute on the
             # DCIM_BootSourceSetting resource
@@ -169,12 +220,13 @@ class BootManagement(object):
                     self.client).get_version())
 
             if controller_version < LC_CONTROLLER_VERSION_12G:
-                boot_devices = [
-                    self._parse_drac_boot_device_11g(drac_boot_device)
-                    for drac_boot_device in drac_boot_devices]
+                boot_devices = self._parse_drac_boot_devices_11g(doc)
             else:
                 raise
 
+        return self._group_boot_devices(boot_devices)
+
+    def _group_boot_devices(self, boot_devices):
         # group devices by boot mode
         boot_devices_per_mode = {device.boot_mode: []
                                  for device in boot_devices}
@@ -202,65 +254,189 @@ class BootManagement(object):
         :raises: DRACUnexpectedReturnValue on return value mismatch
         """
 
-        selectors = {'InstanceID': boot_mode}
-        properties = {'source': boot_device_list}
+        self.client.invoke(**self._build_change_boot_device_order(
+            boot_mode, boot_device_list))
 
-        self.client.invoke(uris.DCIM_BootConfigSetting,
-                           'ChangeBootOrderByInstanceID', selectors,
-                           properties, expected_return_value=utils.RET_SUCCESS)
+    def _build_change_boot_device_order(self, boot_mode, boot_device_list):
+        # returns the arguments of the ChangeBootOrderByInstanceID invocation
+        return {'resource_uri': uris.DCIM_BootConfigSetting,
+                'method': 'ChangeBootOrderByInstanceID',
+                'selectors': {'InstanceID': boot_mode},
+                'properties': {'source': boot_device_list},
+                'expected_return_value': utils.RET_SUCCESS,
+                'idempotent': True}
+
+    def _parse_drac_boot_modes(self, items):
+        drac_boot_modes = utils.filter_xml(items, 'DCIM_BootConfigSetting',
+                                           uris.DCIM_BootConfigSetting)
+
+        return [self._parse_drac_boot_mode(drac_boot_mode)
+                for drac_boot_mode in drac_boot_modes]
 
     def _parse_drac_boot_mode(self, drac_boot_mode):
-        return BootMode(
-            id=self._get_boot_mode_attr(drac_boot_mode, 'InstanceID'),
-            name=self._get_boot_mode_attr(drac_boot_mode, 'ElementName'),
-            is_current=BOOT_MODE_IS_CURRENT[self._get_boot_mode_attr(
-                drac_boot_mode, 'IsCurrent')],
-            is_next=BOOT_MODE_IS_NEXT[self._get_boot_mode_attr(
-                drac_boot_mode, 'IsNext')])
-
-    def _get_boot_mode_attr(self, drac_boot_mode, attr_name):
-        return utils.get_wsman_resource_attr(drac_boot_mode,
-                                             uris.DCIM_BootConfigSetting,
-                                             attr_name)
-
-    def _parse_drac_boot_device_common(self, drac_boot_device, instance_id,
-                                       boot_mode):
-        return BootDevice(
-            id=instance_id,
-            boot_mode=boot_mode,
-            current_assigned_sequence=int(self._get_boot_device_attr(
-                drac_boot_device, 'CurrentAssignedSequence')),
-            pending_assigned_sequence=int(self._get_boot_device_attr(
-                drac_boot_device, 'PendingAssignedSequence')),
-            bios_boot_string=self._get_boot_device_attr(drac_boot_device,
-                                                        'BIOSBootString'))
+        return BOOT_MODE_FIELDS.parse(drac_boot_mode)
 
-    def _parse_drac_boot_device(self, drac_boot_device):
-        instance_id = self._get_boot_device_attr(drac_boot_device,
-                                                 'InstanceID')
-        boot_mode = self._get_boot_device_attr(drac_boot_device,
-                                               'BootSourceType')
+    def _find_drac_boot_devices(self, doc):
+        return utils.find_xml(doc, 'DCIM_BootSourceSetting',
+                              uris.DCIM_BootSourceSetting, find_all=True)
+
+    def _parse_drac_boot_devices(self, doc):
+        return [self._parse_drac_boot_device(drac_boot_device)
+                for drac_boot_device in self._find_drac_boot_devices(doc)]
 
-        return self._parse_drac_boot_device_common(drac_boot_device,
-                                                   instance_id, boot_mode)
+    def _parse_drac_boot_devices_11g(self, doc):
+        return [self._parse_drac_boot_device_11g(drac_boot_device)
+                for drac_boot_device in self._find_drac_boot_devices(doc)]
+
+    def _parse_drac_boot_device(self, drac_boot_device):
+        return BOOT_DEVICE_FIELDS.parse(drac_boot_device)
 
     def _parse_drac_boot_device_11g(self, drac_boot_device):
-        instance_id = self._get_boot_device_attr(drac_boot_device,
-                                                 'InstanceID')
-        boot_mode = instance_id.split(':')[0]
+        return BOOT_DEVICE_FIELDS_11G.parse(drac_boot_device)
+
+
+# Python equivalents of the POSIX character classes of PCRE, used inside
+# brackets
+_POSIX_CLASSES = {
+    'alnum': 'a-zA-Z0-9',
+    'alpha': 'a-zA-Z',
+    'ascii': '\\x00-\\x7f',
+    'blank': ' \\t',
+    'cntrl': '\\x00-\\x1f\\x7f',
+    'digit': '0-9',
+    'graph': '!-~',
+    'lower': 'a-z',
+    'print': ' -~',
+    'punct': '!-/:-@\\[-`{-~',
+    'space': '\\s',
+    'upper': 'A-Z',
+    'word': '\\w',
+    'xdigit': '0-9A-Fa-f',
+}
+
+# Python equivalents of the PCRE escapes missing from the re module
+_PCRE_ESCAPES = {
+    'z': '\\Z',
+    'Z': '(?=\\n?\\Z)',
+    'h': '[ \\t]',
+    'H': '[^ \\t]',
+}
+
+_POSIX_CLASS_RE = re.compile(r'\[:(\^?)([a-z]+):\]')
+_NAMED_GROUP_RE = re.compile(r"\(\?(?:<([A-Za-z_]\w*)>|'([A-Za-z_]\w*)')")
+
+_validators = {}
+
+
+def _cached_validator(key, create):
+    # the validators only depend on the definition of the attributes, which
+    # is shared by the nodes of the same model and BIOS version
+    validator = _validators.get(key)
+    if validator is None:
+        validator = create()
+        if len(_validators) >= MAX_CACHED_VALIDATORS:
+            _validators.clear()
+        _validators[key] = validator
+
+    return validator
+
+
+def _translate_pcre(pcre_regex):
+    """Translates a PCRE regular expression to the syntax of the re module
+
+    Covers the named groups, the POSIX character classes and the \\z, \\Z,
+    \\h and \\H escapes. The rest of the syntax is shared by the two.
+    """
+    result = []
+    index = 0
+    in_brackets = False
+    while index < len(pcre_regex):
+        char = pcre_regex[index]
+        if char == '\\' and index + 1 < len(pcre_regex):
+            escaped = pcre_regex[index + 1]
+            if not in_brackets and escaped in _PCRE_ESCAPES:
+                result.append(_PCRE_ESCAPES[escaped])
+            else:
+                result.append(pcre_regex[index:index + 2])
+            index += 2
+            continue
+
+        if in_brackets:
+            match = _POSIX_CLASS_RE.match(pcre_regex, index)
+            if match is not None and match.group(2) in _POSIX_CLASSES:
+                if match.group(1):
+                    raise re.error('negated POSIX class %s' % match.group(0))
+                result.append(_POSIX_CLASSES[match.group(2)])
+                index = match.end()
+                continue
+            if char == ']':
+                in_brackets = False
+        elif char == '[':
+            in_brackets = True
+            result.append(char)
+            index += 1
+            # a closing bracket right after the opening one is a literal
+            for prefix in ('^', ']'):
+                if pcre_regex.startswith(prefix, index):
+                    result.append(prefix)
+                    index += 1
+            continue
+        elif char == '(':
+            match = _NAMED_GROUP_RE.match(pcre_regex, index)
+            if match is not None:
+                result.append('(?P<%s>' % (match.group(1) or match.group(2)))
+                index = match.end()
+                continue
+
+        result.append(char)
+        index += 1
+
+    return ''.join(result)
+
+
+def _compile_pcre(pcre_regex):
+    """Returns the compiled regex of a PCRE regular expression, cached"""
+
+    return _cached_validator(
+        ('regex', pcre_regex),
+        lambda: re.compile(_translate_pcre(pcre_regex)))
+
+
+def _possible_values_set(possible_values):
+    """Returns the set of the possible values of an attribute, cached"""
+
+    return _cached_validator(('values', possible_values),
+                             lambda: frozenset(possible_values))
+
+
+# canonical instances of the names and metadata of the BIOS attributes. They
+# are the same on the nodes of the same model and BIOS version, so a single
+# copy is kept, whatever the number of nodes.
+_shared_values = {}
+
+
+def _shared(value):
+    """Returns the canonical instance of an immutable value"""
 
-        return self._parse_drac_boot_device_common(drac_boot_device,
-                                                   instance_id, boot_mode)
+    if value is None:
+        return value
 
-    def _get_boot_device_attr(self, drac_boot_device, attr_name):
-        return utils.get_wsman_resource_attr(drac_boot_device,
-                                             uris.DCIM_BootSourceSetting,
-                                             attr_name)
+    shared = _shared_values.get(value)
+    if shared is None:
+        # values of retired models are dropped along with the others,
+        # the current ones being shared again as the nodes are listed
+        if len(_shared_values) >= MAX_SHARED_VALUES:
+            _shared_values.clear()
+        shared = _shared_values.setdefault(value, value)
+
+    return shared
 
 
 class BIOSAttribute(object):
     """Generic BIOS attribute class"""
 
+    __slots__ = ('name', 'current_value', 'pending_value', 'read_only')
+
     def __init__(self, name, current_value, pending_value, read_only):
         """Creates BIOSAttribute object
 
@@ -270,28 +446,54 @@ class BIOSAttribute(object):
                 an unprocessed change (eg. config job not completed)
         :param read_only: indicates whether this BIOS attribute can be changed
         """
-        self.name = name
+        self.name = _shared(name)
         self.current_value = current_value
         self.pending_value = pending_value
         self.read_only = read_only
 
     def __eq__(self, other):
-        return self.__dict__ == other.__dict__
+        if not isinstance(other, BIOSAttribute):
+            return NotImplemented
+
+        return self._values() == other._values()
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+
+        return not equal
+
+    def _values(self):
+        # the values of the slots of every class, compared like the
+        # attributes of the objects before they had slots
+        return dict((slot, getattr(self, slot))
+                    for cls in type(self).__mro__
+                    for slot in getattr(cls, '__slots__', ()))
 
     @classmethod
     def parse(cls, namespace, bios_attr_xml):
         """Parses XML and creates BIOSAttribute object"""
 
-        name = utils.get_wsman_resource_attr(
-            bios_attr_xml, namespace, 'AttributeName')
-        current_value = utils.get_wsman_resource_attr(
-            bios_attr_xml, namespace, 'CurrentValue', nullable=True)
-        pending_value = utils.get_wsman_resource_attr(
-            bios_attr_xml, namespace, 'PendingValue', nullable=True)
-        read_only = utils.get_wsman_resource_attr(
-            bios_attr_xml, namespace, 'IsReadOnly')
+        attrs = BIOSAttribute._get_attrs(namespace, bios_attr_xml)
+
+        return cls(*BIOSAttribute._common_args(attrs))
 
-        return cls(name, current_value, pending_value, (read_only == 'true'))
+    @staticmethod
+    def _get_attrs(namespace, bios_attr_xml, attr_names=(),
+                   nullable_attrs=()):
+        # the common and the type specific attributes are looked up in a
+        # single pass
+        return utils.get_wsman_resource_attrs(
+            bios_attr_xml, namespace,
+            ('AttributeName', 'CurrentValue', 'PendingValue',
+             'IsReadOnly') + attr_names,
+            ('CurrentValue', 'PendingValue') + nullable_attrs)
+
+    @staticmethod
+    def _common_args(attrs):
+        return (attrs['AttributeName'], attrs['CurrentValue'],
+                attrs['PendingValue'], attrs['IsReadOnly'] == 'true')
 
 
 class BIOSEnumerableAttribute(BIOSAttribute):
@@ -299,6 +501,8 @@ class BIOSEnumerableAttribute(BIOSAttribute):
 
     namespace = uris.DCIM_BIOSEnumeration
 
+    __slots__ = ('possible_values',)
+
     def __init__(self, name, current_value, pending_value, read_only,
                  possible_values):
         """Creates BIOSEnumerableAttribute object
@@ -309,34 +513,34 @@ class BIOSEnumerableAttribute(BIOSAttribute):
                 an unprocessed change (eg. config job not completed)
         :param read_only: indicates whether this BIOS attribute can be changed
         :param possible_values: list containing the allowed values for the BIOS
-                                attribute
+                                attribute. It is stored as a tuple shared
+                                with the attributes having the same values.
         """
-        super(BIOSEnumerableAttribute, self).__init__(name, current_value,
-                                                      pending_value, read_only)
-        self.possible_values = possible_values
+        super(BIOSEnumerableAttribute, self).__init__(
+            name, _shared(current_value), _shared(pending_value), read_only)
+        self.possible_values = _shared(tuple(_shared(value)
+                                             for value in possible_values))
 
     @classmethod
     def parse(cls, bios_attr_xml):
         """Parses XML and creates BIOSEnumerableAttribute object"""
 
-        bios_attr = BIOSAttribute.parse(cls.namespace, bios_attr_xml)
+        attrs = BIOSAttribute._get_attrs(cls.namespace, bios_attr_xml)
         possible_values = [attr.text for attr
                            in utils.find_xml(bios_attr_xml, 'PossibleValues',
                                              cls.namespace, find_all=True)]
 
-        return cls(bios_attr.name, bios_attr.current_value,
-                   bios_attr.pending_value, bios_attr.read_only,
-                   possible_values)
+        return cls(*BIOSAttribute._common_args(attrs) + (possible_values,))
 
     def validate(self, new_value):
         """Validates new value"""
 
-        if str(new_value) not in self.possible_values:
+        if str(new_value) not in _possible_values_set(self.possible_values):
             msg = ("Attribute '%(attr)s' cannot be set to value '%(val)s'."
                    " It must be in %(possible_values)r.") % {
                        'attr': self.name,
                        'val': new_value,
-                       'possible_values': self.possible_values}
+                       'possible_values': list(self.possible_values)}
             return msg
 
 
@@ -345,6 +549,8 @@ class BIOSStringAttribute(BIOSAttribute):
 
     namespace = uris.DCIM_BIOSString
 
+    __slots__ = ('min_length', 'max_length', 'pcre_regex')
+
     def __init__(self, name, current_value, pending_value, read_only,
                  min_length, max_length, pcre_regex):
         """Creates BIOSStringAttribute object
@@ -363,29 +569,26 @@ class BIOSStringAttribute(BIOSAttribute):
                                                   pending_value, read_only)
         self.min_length = min_length
         self.max_length = max_length
-        self.pcre_regex = pcre_regex
+        self.pcre_regex = _shared(pcre_regex)
 
     @classmethod
     def parse(cls, bios_attr_xml):
         """Parses XML and creates BIOSStringAttribute object"""
 
-        bios_attr = BIOSAttribute.parse(cls.namespace, bios_attr_xml)
-        min_length = int(utils.get_wsman_resource_attr(
-            bios_attr_xml, cls.namespace, 'MinLength'))
-        max_length = int(utils.get_wsman_resource_attr(
-            bios_attr_xml, cls.namespace, 'MaxLength'))
-        pcre_regex = utils.get_wsman_resource_attr(
-            bios_attr_xml, cls.namespace, 'ValueExpression', nullable=True)
+        attrs = BIOSAttribute._get_attrs(
+            cls.namespace, bios_attr_xml,
+            ('MinLength', 'MaxLength', 'ValueExpression'),
+            ('ValueExpression',))
 
-        return cls(bios_attr.name, bios_attr.current_value,
-                   bios_attr.pending_value, bios_attr.read_only,
-                   min_length, max_length, pcre_regex)
+        return cls(*BIOSAttribute._common_args(attrs) + (
+            int(attrs['MinLength']), int(attrs['MaxLength']),
+            attrs['ValueExpression']))
 
     def validate(self, new_value):
         """Validates new value"""
 
         if self.pcre_regex is not None:
-            regex = re.compile(self.pcre_regex)
+            regex = _compile_pcre(self.pcre_regex)
             if regex.search(str(new_value)) is None:
                 msg = ("Attribute '%(attr)s' cannot be set to value '%(val)s.'"
                        " It must match regex '%(re)s'.") % {
@@ -400,6 +603,8 @@ class BIOSIntegerAttribute(BIOSAttribute):
 
     namespace = uris.DCIM_BIOSInteger
 
+    __slots__ = ('lower_bound', 'upper_bound')
+
     def __init__(self, name, current_value, pending_value, read_only,
                  lower_bound, upper_bound):
         """Creates BIOSIntegerAttribute object
@@ -421,20 +626,18 @@ class BIOSIntegerAttribute(BIOSAttribute):
     def parse(cls, bios_attr_xml):
         """Parses XML and creates BIOSIntegerAttribute object"""
 
-        bios_attr = BIOSAttribute.parse(cls.namespace, bios_attr_xml)
-        lower_bound = utils.get_wsman_resource_attr(
-            bios_attr_xml, cls.namespace, 'LowerBound')
-        upper_bound = utils.get_wsman_resource_attr(
-            bios_attr_xml, cls.namespace, 'UpperBound')
+        attrs = BIOSAttribute._get_attrs(cls.namespace, bios_attr_xml,
+                                         ('LowerBound', 'UpperBound'))
+        (name, current_value, pending_value,
+         read_only) = BIOSAttribute._common_args(attrs)
 
-        if bios_attr.current_value:
-            bios_attr.current_value = int(bios_attr.current_value)
-        if bios_attr.pending_value:
-            bios_attr.pending_value = int(bios_attr.pending_value)
+        if current_value:
+            current_value = int(current_value)
+        if pending_value:
+            pending_value = int(pending_value)
 
-        return cls(bios_attr.name, bios_attr.current_value,
-                   bios_attr.pending_value, bios_attr.read_only,
-                   int(lower_bound), int(upper_bound))
+        return cls(name, current_value, pending_value, read_only,
+                   int(attrs['LowerBound']), int(attrs['UpperBound']))
 
     def validate(self, new_value):
         """Validates new value"""
@@ -450,6 +653,118 @@ class BIOSIntegerAttribute(BIOSAttribute):
             return msg
 
 
+BIOS_ATTRIBUTE_NAMESPACES = [
+    (uris.DCIM_BIOSEnumeration, BIOSEnumerableAttribute),
+    (uris.DCIM_BIOSString, BIOSStringAttribute),
+    (uris.DCIM_BIOSInteger, BIOSIntegerAttribute)]
+
+
+class BIOSSettingsValidation(collections.namedtuple(
+        'BIOSSettingsValidation',
+        ['changed', 'unchanged', 'read_only', 'unknown', 'invalid'])):
+    """Result of validating BIOS settings, see validate_many"""
+
+    __slots__ = ()
+
+    def check(self):
+        """Raises the error of setting the validated settings, if any
+
+        :raises: InvalidParameterValue on unknown BIOS attributes
+        :raises: DRACOperationFailed on invalid values or read-only BIOS
+                 attributes
+        """
+        if self.unknown:
+            msg = ('Unknown BIOS attributes found: %(unknown_keys)r' %
+                   {'unknown_keys': set(self.unknown)})
+            raise exceptions.InvalidParameterValue(reason=msg)
+
+        if self.invalid or self.read_only:
+            if self.read_only:
+                read_only_msg = ['Cannot set read-only BIOS attributes: %r.'
+                                 % self.read_only]
+            else:
+                read_only_msg = []
+
+            drac_messages = '\n'.join(list(self.invalid.values()) +
+                                      read_only_msg)
+            raise exceptions.DRACOperationFailed(
+                drac_messages=drac_messages)
+
+
+def _attribute_size(name, value):
+    return (len(name.encode('utf-8')) + len(str(value).encode('utf-8')) +
+            _SET_ATTRIBUTES_ITEM_OVERHEAD)
+
+
+def _split_settings(settings, max_attributes, max_bytes):
+    """Splits settings into chunks within the limits, keeping their order
+
+    :param settings: an ordered dictionary of attribute names and values
+    :param max_attributes: maximum number of attributes of a chunk, or None
+    :param max_bytes: maximum size in bytes of a chunk, or None
+    :returns: a list of ordered dictionaries
+    """
+    chunks = []
+    chunk = None
+    chunk_size = 0
+    for (name, value) in settings.items():
+        size = _attribute_size(name, value)
+        if (chunk is None or
+                (max_attributes is not None and
+                 len(chunk) >= max_attributes) or
+                (max_bytes is not None and chunk_size + size > max_bytes)):
+            chunk = collections.OrderedDict()
+            chunk_size = 0
+            chunks.append(chunk)
+
+        chunk[name] = value
+        chunk_size += size
+
+    return chunks
+
+
+def validate_many(new_settings, current_settings):
+    """Validates BIOS settings against a snapshot of the current ones
+
+    The snapshot can be shared by the nodes of the same model and BIOS
+    version, the validators of the attributes are compiled once.
+
+    :param new_settings: a dictionary containing the proposed values, with
+                         each key being the name of attribute and the value
+                         being the proposed value.
+    :param current_settings: a dictionary of the current BIOS settings, as
+                             returned by list_bios_settings
+    :returns: a BIOSSettingsValidation object, holding the dictionary of the
+              valid changes and the lists of the unchanged, read-only and
+              unknown attributes, and a dictionary of the invalid attributes
+              and their validation messages
+    """
+    changed = collections.OrderedDict()
+    unchanged = []
+    read_only = []
+    unknown = []
+    invalid = collections.OrderedDict()
+
+    for (name, value) in new_settings.items():
+        attr = current_settings.get(name)
+        if attr is None:
+            unknown.append(name)
+        elif str(value) == str(attr.current_value):
+            unchanged.append(name)
+        elif attr.read_only:
+            read_only.append(name)
+        else:
+            validation_msg = attr.validate(value)
+            if validation_msg is None:
+                changed[name] = value
+            else:
+                invalid[name] = validation_msg
+
+    return BIOSSettingsValidation(changed=changed, unchanged=unchanged,
+                                  read_only=read_only, unknown=unknown,
+                                  invalid=invalid)
+
+
 class BIOSConfiguration(object):
 
     def __init__(self, client):
@@ -459,9 +774,11 @@ class BIOSConfiguration(object):
         """
         self.client = client
 
-    def list_bios_settings(self):
+    def list_bios_settings(self, concurrent=False):
         """List the BIOS configuration settings
 
+        :param concurrent: flag to enumerate the BIOS attribute resources
+                           concurrently instead of one after another
         :returns: a dictionary with the BIOS settings using its name as the
                   key. The attributes are either BIOSEnumerableAttribute,
                   BIOSStringAttribute or BIOSIntegerAttribute objects.
@@ -471,24 +788,37 @@ class BIOSConfiguration(object):
                  interface
         """
 
+        if concurrent:
+            with futures.ThreadPoolExecutor(
+                    max_workers=len(BIOS_ATTRIBUTE_NAMESPACES)) as executor:
+                pending = [executor.submit(self._get_config, namespace,
+                                           attr_cls)
+                           for (namespace, attr_cls)
+                           in BIOS_ATTRIBUTE_NAMESPACES]
+                configs = [future.result() for future in pending]
+        else:
+            configs = [self._get_config(namespace, attr_cls)
+                       for (namespace, attr_cls) in BIOS_ATTRIBUTE_NAMESPACES]
+
         result = {}
-        namespaces = [(uris.DCIM_BIOSEnumeration, BIOSEnumerableAttribute),
-                      (uris.DCIM_BIOSString, BIOSStringAttribute),
-                      (uris.DCIM_BIOSInteger, BIOSIntegerAttribute)]
-        for (namespace, attr_cls) in namespaces:
-            attribs = self._get_config(namespace, attr_cls)
-            if not set(result).isdisjoint(set(attribs)):
-                raise exceptions.DRACOperationFailed(
-                    drac_messages=('Colliding attributes %r' % (
-                        set(result) & set(attribs))))
-            result.update(attribs)
+        for attribs in configs:
+            self._merge_config(result, attribs)
         return result
 
+    def _merge_config(self, result, attribs):
+        if not set(result).isdisjoint(set(attribs)):
+            raise exceptions.DRACOperationFailed(
+                drac_messages=('Colliding attributes %r' % (
+                    set(result) & set(attribs))))
+        result.update(attribs)
+
     def _get_config(self, resource, attr_cls):
-        result = {}
+        items = self.client.iter_enumerate(resource)
+
+        return self._parse_config(items, attr_cls)
 
-        doc = self.client.enumerate(resource)
-        items = doc.find('.//{%s}Items' % wsman.NS_WSMAN)
+    def _parse_config(self, items, attr_cls):
+        result = {}
 
         for item in items:
             attribute = attr_cls.parse(item)
@@ -496,16 +826,37 @@ class BIOSConfiguration(object):
 
         return result
 
-    def set_bios_settings(self, new_settings):
+    def set_bios_settings(self, new_settings, concurrent=False,
+                          current_settings=None,
+                          max_attributes=MAX_ATTRIBUTES_PER_INVOKE,
+                          max_bytes=MAX_BYTES_PER_INVOKE):
         """Sets the BIOS configuration
 
         To be more precise, it sets the pending_value parameter for each of the
         attributes passed in. For the values to be applied, a config job must
         be created and the node must be rebooted.
 
+        The changed attributes are set by as few SetAttributes invocations as
+        the limits allow, one after the other. If one of them fails, the
+        attributes set by the previous ones stay pending, see
+        abandon_pending_bios_changes.
+
         :param new_settings: a dictionary containing the proposed values, with
                              each key being the name of attribute and the
                              value being the proposed value.
+        :param concurrent: flag to read the current BIOS settings
+                           concurrently. See list_bios_settings.
+        :param current_settings: a dictionary of the BIOS settings previously
+                                 returned by list_bios_settings, used to
+                                 validate the new settings instead of reading
+                                 them again. Attributes whose value in it
+                                 equals the proposed one are not set, so it
+                                 must not be older than the last change.
+        :param max_attributes: maximum number of attributes set by a single
+                               SetAttributes invocation, or None for no limit
+        :param max_bytes: maximum size in bytes of the attributes set by a
+                          single SetAttributes invocation, or None for no
+                          limit. An attribute larger than it is set alone.
         :returns: a dictionary containing the commit_needed key with a boolean
                   value indicating whether a config job must be created for the
                   values to be applied.
@@ -517,61 +868,39 @@ class BIOSConfiguration(object):
         :raises: InvalidParameterValue on invalid BIOS attribute
         """
 
-        current_settings = self.list_bios_settings()
-        unknown_keys = set(new_settings) - set(current_settings)
-        if unknown_keys:
-            msg = ('Unknown BIOS attributes found: %(unknown_keys)r' %
-                   {'unknown_keys': unknown_keys})
-            raise exceptions.InvalidParameterValue(reason=msg)
+        if current_settings is None:
+            current_settings = self.list_bios_settings(concurrent)
+        invocations = self._build_set_attributes(new_settings,
+                                                 current_settings,
+                                                 max_attributes, max_bytes)
 
-        read_only_keys = []
-        unchanged_attribs = []
-        invalid_attribs_msgs = []
-        attrib_names = []
-        candidates = set(new_settings)
-
-        for attr in candidates:
-            if str(new_settings[attr]) == str(
-                    current_settings[attr].current_value):
-                unchanged_attribs.append(attr)
-            elif current_settings[attr].read_only:
-                read_only_keys.append(attr)
-            else:
-                validation_msg = current_settings[attr].validate(
-                    new_settings[attr])
-                if validation_msg is None:
-                    attrib_names.append(attr)
-                else:
-                    invalid_attribs_msgs.append(validation_msg)
-
-        if unchanged_attribs:
-            LOG.warn('Ignoring unchanged BIOS attributes: %r' %
-                     unchanged_attribs)
+        docs = [self.client.invoke(**invocation)
+                for invocation in invocations]
 
-        if invalid_attribs_msgs or read_only_keys:
-            if read_only_keys:
-                read_only_msg = ['Cannot set read-only BIOS attributes: %r.'
-                                 % read_only_keys]
-            else:
-                read_only_msg = []
+        return self._parse_set_attributes(docs)
 
-            drac_messages = '\n'.join(invalid_attribs_msgs + read_only_msg)
-            raise exceptions.DRACOperationFailed(
-                drac_messages=drac_messages)
+    def _build_set_attributes(self, new_settings, current_settings,
+                              max_attributes=MAX_ATTRIBUTES_PER_INVOKE,
+                              max_bytes=MAX_BYTES_PER_INVOKE):
+        # returns the arguments of the SetAttributes invocations needed
+        validation = validate_many(new_settings, current_settings)
+        validation.check()
 
-        if not attrib_names:
-            return {'commit_required': False}
-
-        selectors = {'CreationClassName': 'DCIM_BIOSService',
-                     'Name': 'DCIM:BIOSService',
-                     'SystemCreationClassName': 'DCIM_ComputerSystem',
-                     'SystemName': 'DCIM:ComputerSystem'}
-        properties = {'Target': 'BIOS.Setup.1-1',
-                      'AttributeName': attrib_names,
-                      'AttributeValue': [new_settings[attr] for attr
-                                         in attrib_names]}
-        doc = self.client.invoke(uris.DCIM_BIOSService, 'SetAttributes',
-                                 selectors, properties)
-
-        return {'commit_required': utils.is_reboot_required(
-            doc, uris.DCIM_BIOSService)}
+        if validation.unchanged:
+            LOG.warn('Ignoring unchanged BIOS attributes: %r' %
+                     validation.unchanged)
+
+        return [{'resource_uri': uris.DCIM_BIOSService,
+                 'method': 'SetAttributes',
+                 'selectors': dict(BIOS_SERVICE_SELECTORS),
+                 'properties': {'Target': 'BIOS.Setup.1-1',
+                                'AttributeName': list(chunk),
+                                'AttributeValue': list(chunk.values())},
+                 'idempotent': True}
+                for chunk in _split_settings(validation.changed,
+                                             max_attributes, max_bytes)]
+
+    def _parse_set_attributes(self, docs):
+        return {'commit_required': any(
+            utils.is_reboot_required(doc, uris.DCIM_BIOSService)
+            for doc in docs)}
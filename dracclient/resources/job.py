@@ -12,7 +12,10 @@
 #    under the License.
 
 import collections
+import random
+import time
 
+from dracclient import exceptions
 from dracclient.resources import uris
 from dracclient import utils
 from dracclient import wsman
@@ -20,6 +23,33 @@ from dracclient import wsman
 Job = collections.namedtuple('Job', ['id', 'name', 'start_time', 'until_time',
                                      'message', 'state', 'percent_complete'])
 
+JOB_FIELDS = utils.WSManFieldMap(
+    uris.DCIM_LifecycleJob, Job,
+    [('id', 'InstanceID'),
+     ('name', 'Name'),
+     ('start_time', 'JobStartTime'),
+     ('until_time', 'JobUntilTime'),
+     ('message', 'Message'),
+     ('state', 'JobStatus'),
+     ('percent_complete', 'PercentComplete')])
+
+UNFINISHED_JOBS_FILTER_QUERY = ('select * from DCIM_LifecycleJob '
+                                'where Name != "CLEARALL" and '
+                                'JobStatus != "Reboot Completed" and '
+                                'JobStatus != "Completed" and '
+                                'JobStatus != "Completed with Errors" and '
+                                'JobStatus != "Failed"')
+
+TERMINAL_JOB_STATES = frozenset(['Reboot Completed', 'Completed',
+                                 'Completed with Errors', 'Failed'])
+
+# maximum number of job ids OR'd in a single filter query
+MAX_JOBS_PER_QUERY = 32
+
+DEFAULT_WAIT_TIMEOUT = 3600
+DEFAULT_POLL_INTERVAL = 5
+DEFAULT_MAX_POLL_INTERVAL = 60
+
 
 class JobManagement(object):
 
@@ -44,20 +74,12 @@ class JobManagement(object):
 
         filter_query = None
         if only_unfinished:
-            filter_query = ('select * from DCIM_LifecycleJob '
-                            'where Name != "CLEARALL" and '
-                            'JobStatus != "Reboot Completed" and '
-                            'JobStatus != "Completed" and '
-                            'JobStatus != "Completed with Errors" and '
-                            'JobStatus != "Failed"')
-
-        doc = self.client.enumerate(uris.DCIM_LifecycleJob,
-                                    filter_query=filter_query)
+            filter_query = UNFINISHED_JOBS_FILTER_QUERY
 
-        drac_jobs = utils.find_xml(doc, 'DCIM_LifecycleJob',
-                                   uris.DCIM_LifecycleJob, find_all=True)
+        items = self.client.iter_enumerate(uris.DCIM_LifecycleJob,
+                                           filter_query=filter_query)
 
-        return [self._parse_drac_job(drac_job) for drac_job in drac_jobs]
+        return self._parse_drac_jobs(items)
 
     def get_job(self, job_id):
         """Returns a job from the job queue
@@ -70,18 +92,109 @@ class JobManagement(object):
                  interface
         """
 
-        filter_query = ('select * from DCIM_LifecycleJob where InstanceID="%s"'
-                        % job_id)
-
+        filter_query = self._job_filter_query(job_id)
         doc = self.client.enumerate(uris.DCIM_LifecycleJob,
                                     filter_query=filter_query)
 
         drac_job = utils.find_xml(doc, 'DCIM_LifecycleJob',
                                   uris.DCIM_LifecycleJob)
 
-        if drac_job:
+        if drac_job is not None:
             return self._parse_drac_job(drac_job)
 
+    def wait_for_jobs(self, job_ids, timeout=DEFAULT_WAIT_TIMEOUT,
+                      poll_interval=DEFAULT_POLL_INTERVAL,
+                      max_poll_interval=DEFAULT_MAX_POLL_INTERVAL):
+        """Waits until the jobs reach a terminal state
+
+        The jobs still running are fetched with a single enumeration per
+        poll. The interval between the polls is doubled after each one, up
+        to max_poll_interval, and randomized to spread the load of many
+        waiters. Jobs missing from the job queue are waited for as well.
+
+        :param job_ids: list of job ids
+        :param timeout: number of seconds after which waiting is given up
+        :param poll_interval: number of seconds between the first polls
+        :param max_poll_interval: maximum number of seconds between polls
+        :returns: a dictionary of job ids and Job objects in a terminal
+                  state, eg. 'Completed' or 'Failed'
+        :raises: WSManRequestFailure on request failures
+        :raises: WSManInvalidResponse when receiving invalid response
+        :raises: DRACOperationFailed on error reported back by the DRAC
+                 interface
+        :raises: DRACTimeout when the jobs don't finish in time
+        """
+
+        poller = _JobPoller(job_ids, timeout, poll_interval,
+                            max_poll_interval)
+
+        while True:
+            delay = poller.update(self.get_jobs(poller.pending))
+            if delay is None:
+                return poller.finished
+
+            time.sleep(delay)
+
+    def wait_for_job(self, job_id, timeout=DEFAULT_WAIT_TIMEOUT,
+                     poll_interval=DEFAULT_POLL_INTERVAL,
+                     max_poll_interval=DEFAULT_MAX_POLL_INTERVAL):
+        """Waits until a job reaches a terminal state
+
+        See wait_for_jobs.
+
+        :param job_id: id of the job
+        :param timeout: number of seconds after which waiting is given up
+        :param poll_interval: number of seconds between the first polls
+        :param max_poll_interval: maximum number of seconds between polls
+        :returns: a Job object in a terminal state
+        :raises: WSManRequestFailure on request failures
+        :raises: WSManInvalidResponse when receiving invalid response
+        :raises: DRACOperationFailed on error reported back by the DRAC
+                 interface
+        :raises: DRACTimeout when the job doesn't finish in time
+        """
+
+        return self.wait_for_jobs([job_id], timeout, poll_interval,
+                                  max_poll_interval)[job_id]
+
+    def get_jobs(self, job_ids):
+        """Returns many jobs from the job queue
+
+        The jobs are fetched with a single enumeration, filtered on the job
+        ids, for every MAX_JOBS_PER_QUERY jobs.
+
+        :param job_ids: list of job ids
+        :returns: a dictionary of job ids and Job objects, or None for the
+                  jobs not found
+        :raises: WSManRequestFailure on request failures
+        :raises: WSManInvalidResponse when receiving invalid response
+        :raises: DRACOperationFailed on error reported back by the DRAC
+                 interface
+        """
+
+        jobs, filter_queries = self._build_get_jobs(job_ids)
+        for filter_query in filter_queries:
+            items = self.client.iter_enumerate(uris.DCIM_LifecycleJob,
+                                               filter_query=filter_query)
+            self._merge_drac_jobs(jobs, self._parse_drac_jobs(items))
+
+        return jobs
+
+    def _build_get_jobs(self, job_ids):
+        # returns the dictionary of the jobs to fill and the filter queries
+        # of the enumerations fetching them
+        job_ids = list(collections.OrderedDict.fromkeys(job_ids))
+        filter_queries = [
+            self._jobs_filter_query(job_ids[i:i + MAX_JOBS_PER_QUERY])
+            for i in range(0, len(job_ids), MAX_JOBS_PER_QUERY)]
+
+        return dict.fromkeys(job_ids), filter_queries
+
+    def _merge_drac_jobs(self, jobs, drac_jobs):
+        for drac_job in drac_jobs:
+            if drac_job.id in jobs:
+                jobs[drac_job.id] = drac_job
+
     def create_config_job(self, resource_uri, cim_creation_class_name,
                           cim_name, target,
                           cim_system_creation_class_name='DCIM_ComputerSystem',
@@ -113,10 +226,20 @@ class JobManagement(object):
         :raises: DRACUnexpectedReturnValue on return value mismatch
         """
 
-        selectors = {'SystemCreationClassName': cim_system_creation_class_name,
-                     'SystemName': cim_system_name,
-                     'CreationClassName': cim_creation_class_name,
-                     'Name': cim_name}
+        doc = self.client.invoke(**self._build_create_config_job(
+            resource_uri, cim_creation_class_name, cim_name, target,
+            cim_system_creation_class_name, cim_system_name, reboot))
+
+        return self._parse_job_id(doc)
+
+    def _build_create_config_job(self, resource_uri, cim_creation_class_name,
+                                 cim_name, target,
+                                 cim_system_creation_class_name,
+                                 cim_system_name, reboot):
+        # returns the arguments of the invocation creating the job
+        selectors = self._config_selectors(
+            cim_creation_class_name, cim_name, cim_system_creation_class_name,
+            cim_system_name)
 
         properties = {'Target': target,
                       'ScheduledStartTime': 'TIME_NOW'}
@@ -124,10 +247,13 @@ class JobManagement(object):
         if reboot:
             properties['RebootJobType'] = '3'
 
-        doc = self.client.invoke(resource_uri, 'CreateTargetedConfigJob',
-                                 selectors, properties,
-                                 expected_return_value=utils.RET_CREATED)
+        return {'resource_uri': resource_uri,
+                'method': 'CreateTargetedConfigJob',
+                'selectors': selectors,
+                'properties': properties,
+                'expected_return_value': utils.RET_CREATED}
 
+    def _parse_job_id(self, doc):
         query = ('.//{%(namespace)s}%(item)s[@%(attribute_name)s='
                  '"%(attribute_value)s"]' %
                  {'namespace': wsman.NS_WSMAN, 'item': 'Selector',
@@ -166,27 +292,172 @@ class JobManagement(object):
         :raises: DRACUnexpectedReturnValue on return value mismatch
         """
 
-        selectors = {'SystemCreationClassName': cim_system_creation_class_name,
-                     'SystemName': cim_system_name,
-                     'CreationClassName': cim_creation_class_name,
-                     'Name': cim_name}
+        self.client.invoke(**self._build_delete_pending_config(
+            resource_uri, cim_creation_class_name, cim_name, target,
+            cim_system_creation_class_name, cim_system_name))
+
+    def _build_delete_pending_config(self, resource_uri,
+                                     cim_creation_class_name, cim_name,
+                                     target, cim_system_creation_class_name,
+                                     cim_system_name):
+        # returns the arguments of the invocation deleting the configuration
+        selectors = self._config_selectors(
+            cim_creation_class_name, cim_name, cim_system_creation_class_name,
+            cim_system_name)
 
         properties = {'Target': target}
 
-        self.client.invoke(resource_uri, 'DeletePendingConfiguration',
-                           selectors, properties,
-                           expected_return_value=utils.RET_SUCCESS)
+        return {'resource_uri': resource_uri,
+                'method': 'DeletePendingConfiguration',
+                'selectors': selectors,
+                'properties': properties,
+                'expected_return_value': utils.RET_SUCCESS}
+
+    def _job_filter_query(self, job_id):
+        return ('select * from DCIM_LifecycleJob where InstanceID="%s"'
+                % job_id)
+
+    def _jobs_filter_query(self, job_ids):
+        return ('select * from DCIM_LifecycleJob where %s'
+                % ' or '.join('InstanceID="%s"' % job_id
+                              for job_id in job_ids))
+
+    def _config_selectors(self, cim_creation_class_name, cim_name,
+                          cim_system_creation_class_name, cim_system_name):
+        return {'SystemCreationClassName': cim_system_creation_class_name,
+                'SystemName': cim_system_name,
+                'CreationClassName': cim_creation_class_name,
+                'Name': cim_name}
+
+    def _parse_drac_jobs(self, items):
+        drac_jobs = utils.filter_xml(items, 'DCIM_LifecycleJob',
+                                     uris.DCIM_LifecycleJob)
+
+        return [self._parse_drac_job(drac_job) for drac_job in drac_jobs]
 
     def _parse_drac_job(self, drac_job):
-        return Job(id=self._get_job_attr(drac_job, 'InstanceID'),
-                   name=self._get_job_attr(drac_job, 'Name'),
-                   start_time=self._get_job_attr(drac_job, 'JobStartTime'),
-                   until_time=self._get_job_attr(drac_job, 'JobUntilTime'),
-                   message=self._get_job_attr(drac_job, 'Message'),
-                   state=self._get_job_attr(drac_job, 'JobStatus'),
-                   percent_complete=self._get_job_attr(drac_job,
-                                                       'PercentComplete'))
-
-    def _get_job_attr(self, drac_job, attr_name):
-        return utils.get_wsman_resource_attr(drac_job, uris.DCIM_LifecycleJob,
-                                             attr_name)
+        return JOB_FIELDS.parse(drac_job)
+
+
+class _JobPoller(object):
+    """Tracks the jobs waited for and the delay of the next poll"""
+
+    def __init__(self, job_ids, timeout, poll_interval, max_poll_interval):
+        self.pending = list(collections.OrderedDict.fromkeys(job_ids))
+        self.finished = {}
+        self.timeout = timeout
+        self.deadline = wsman._monotonic() + timeout
+        self.interval = poll_interval
+        self.max_interval = max_poll_interval
+
+    def update(self, jobs):
+        """Records the polled jobs
+
+        :param jobs: dictionary of job ids and Job objects
+        :returns: number of seconds to wait before the next poll or None if
+                  every job is finished
+        :raises: DRACTimeout when the deadline has passed
+        """
+        for job_id in self.pending:
+            drac_job = jobs.get(job_id)
+            if drac_job is not None and drac_job.state in TERMINAL_JOB_STATES:
+                self.finished[job_id] = drac_job
+
+        self.pending = [job_id for job_id in self.pending
+                        if job_id not in self.finished]
+        if not self.pending:
+            return None
+
+        remaining = self.deadline - wsman._monotonic()
+        if remaining <= 0:
+            raise exceptions.DRACTimeout(
+                operation='Jobs %s' % ', '.join(self.pending),
+                timeout=self.timeout)
+
+        delay = random.uniform(self.interval / 2.0, self.interval)
+        self.interval = min(self.interval * 2, self.max_interval)
+
+        return min(delay, remaining)
+
+
+class JobQueueWatcher(object):
+    """Reports the jobs of the job queue changed between polls"""
+
+    def __init__(self, client, only_unfinished=False):
+        """Creates JobQueueWatcher object
+
+        :param client: an object listing the jobs, eg. a DRACClient or a
+                       JobManagement object
+        :param only_unfinished: indicates whether only unfinished jobs should
+                                be watched. Jobs leaving the queue on
+                                completion aren't reported then.
+        """
+        self.client = client
+        self.only_unfinished = only_unfinished
+        self._snapshot = {}
+
+    def poll(self):
+        """Lists the jobs and returns the ones changed since the last poll
+
+        A job is changed when it is new or its state, percent_complete or
+        message differs. The first poll returns every job.
+
+        :returns: a list of Job objects
+        :raises: WSManRequestFailure on request failures
+        :raises: WSManInvalidResponse when receiving invalid response
+        :raises: DRACOperationFailed on error reported back by the DRAC
+                 interface
+        """
+
+        return self.update(self.client.list_jobs(self.only_unfinished))
+
+    def update(self, jobs):
+        """Records the jobs and returns the ones changed since the last update
+
+        Useful when the jobs are listed by other means, eg. with an
+        AsyncDRACClient.
+
+        :param jobs: list of Job objects in the job queue
+        :returns: a list of Job objects
+        """
+
+        snapshot = {}
+        changed = []
+        for drac_job in jobs:
+            status = (drac_job.state, drac_job.percent_complete,
+                      drac_job.message)
+            snapshot[drac_job.id] = status
+            if self._snapshot.get(drac_job.id) != status:
+                changed.append(drac_job)
+
+        self._snapshot = snapshot
+        return changed
+
+    def watch(self, poll_interval=DEFAULT_POLL_INTERVAL, timeout=None):
+        """Polls the job queue, yielding the jobs changed
+
+        :param poll_interval: number of seconds between the polls
+        :param timeout: number of seconds after which watching stops. If not
+                        set, the generator never stops.
+        :returns: generator of Job objects
+        :raises: WSManRequestFailure on request failures
+        :raises: WSManInvalidResponse when receiving invalid response
+        :raises: DRACOperationFailed on error reported back by the DRAC
+                 interface
+        """
+
+        deadline = None
+        if timeout is not None:
+            deadline = wsman._monotonic() + timeout
+
+        while True:
+            for drac_job in self.poll():
+                yield drac_job
+
+            if deadline is not None:
+                remaining = deadline - wsman._monotonic()
+                if remaining <= 0:
+                    return
+                time.sleep(min(poll_interval, remaining))
+            else:
+                time.sleep(poll_interval)
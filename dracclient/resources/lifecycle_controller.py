@@ -14,6 +14,9 @@
 from dracclient.resources import uris
 from dracclient import utils
 
+LC_VERSION_FILTER_QUERY = ('select LifecycleControllerVersion '
+                           'from DCIM_SystemView')
+
 
 class LifecycleControllerManagement(object):
 
@@ -34,10 +37,12 @@ class LifecycleControllerManagement(object):
                  interface
         """
 
-        filter_query = ('select LifecycleControllerVersion '
-                        'from DCIM_SystemView')
         doc = self.client.enumerate(uris.DCIM_SystemView,
-                                    filter_query=filter_query)
+                                    filter_query=LC_VERSION_FILTER_QUERY)
+
+        return self._parse_version(doc)
+
+    def _parse_version(self, doc):
         lc_version_str = utils.find_xml(doc, 'LifecycleControllerVersion',
                                         uris.DCIM_SystemView).text
 
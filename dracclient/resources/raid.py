@@ -71,6 +71,11 @@ PHYSICAL_DISK_BUS_PROTOCOL = {
     '6': 'sas'
 }
 
+RAID_SERVICE_SELECTORS = {'SystemCreationClassName': 'DCIM_ComputerSystem',
+                          'CreationClassName': 'DCIM_RAIDService',
+                          'SystemName': 'DCIM:ComputerSystem',
+                          'Name': 'DCIM:RAIDService'}
+
 PhysicalDisk = collections.namedtuple(
     'PhysicalDisk',
     ['id', 'description', 'controller', 'manufacturer', 'model', 'media_type',
@@ -87,6 +92,55 @@ VirtualDisk = collections.namedtuple(
      'state', 'raid_state', 'span_depth', 'span_length', 'pending_operations'])
 
 
+def _size_mb(size_b):
+    return int(size_b) / 2 ** 20
+
+
+def _fqdd_part(index):
+    return lambda fqdd: fqdd.split(':')[index]
+
+
+RAID_CONTROLLER_FIELDS = utils.WSManFieldMap(
+    uris.DCIM_ControllerView, RAIDController,
+    [('id', 'FQDD'),
+     ('description', 'DeviceDescription'),
+     ('manufacturer', 'DeviceCardManufacturer'),
+     ('model', 'ProductName'),
+     ('firmware_version', 'ControllerFirmwareVersion')])
+
+VIRTUAL_DISK_FIELDS = utils.WSManFieldMap(
+    uris.DCIM_VirtualDiskView, VirtualDisk,
+    [('id', 'FQDD'),
+     ('name', 'Name'),
+     ('description', 'DeviceDescription'),
+     ('controller', 'FQDD', _fqdd_part(1)),
+     ('raid_level', 'RAIDTypes', REVERSE_RAID_LEVELS.__getitem__),
+     ('size_mb', 'SizeInBytes', _size_mb),
+     ('state', 'PrimaryStatus', DISK_STATUS.__getitem__),
+     ('raid_state', 'RAIDStatus', DISK_RAID_STATUS.__getitem__),
+     ('span_depth', 'SpanDepth', int),
+     ('span_length', 'SpanLength', int),
+     ('pending_operations', 'PendingOperations',
+      VIRTUAL_DISK_PENDING_OPERATIONS.__getitem__)])
+
+PHYSICAL_DISK_FIELDS = utils.WSManFieldMap(
+    uris.DCIM_PhysicalDiskView, PhysicalDisk,
+    [('id', 'FQDD'),
+     ('description', 'DeviceDescription'),
+     ('controller', 'FQDD', _fqdd_part(2)),
+     ('manufacturer', 'Manufacturer'),
+     ('model', 'Model'),
+     ('media_type', 'MediaType', PHYSICAL_DISK_MEDIA_TYPE.__getitem__),
+     ('interface_type', 'BusProtocol',
+      PHYSICAL_DISK_BUS_PROTOCOL.__getitem__),
+     ('size_mb', 'SizeInBytes', _size_mb),
+     ('free_size_mb', 'FreeSizeInBytes', _size_mb),
+     ('serial_number', 'SerialNumber'),
+     ('firmware_version', 'Revision'),
+     ('state', 'PrimaryStatus', DISK_STATUS.__getitem__),
+     ('raid_state', 'RaidStatus', DISK_RAID_STATUS.__getitem__)])
+
+
 class RAIDManagement(object):
 
     def __init__(self, client):
@@ -106,30 +160,19 @@ class RAIDManagement(object):
                  interface
         """
 
-        doc = self.client.enumerate(uris.DCIM_ControllerView)
+        items = self.client.iter_enumerate(uris.DCIM_ControllerView)
 
-        drac_raid_controllers = utils.find_xml(doc, 'DCIM_ControllerView',
-                                               uris.DCIM_ControllerView,
-                                               find_all=True)
+        return self._parse_drac_raid_controllers(items)
+
+    def _parse_drac_raid_controllers(self, items):
+        drac_raid_controllers = utils.filter_xml(items, 'DCIM_ControllerView',
+                                                 uris.DCIM_ControllerView)
 
         return [self._parse_drac_raid_controller(controller)
                 for controller in drac_raid_controllers]
 
     def _parse_drac_raid_controller(self, drac_controller):
-        return RAIDController(
-            id=self._get_raid_controller_attr(drac_controller, 'FQDD'),
-            description=self._get_raid_controller_attr(
-                drac_controller, 'DeviceDescription'),
-            manufacturer=self._get_raid_controller_attr(
-                drac_controller, 'DeviceCardManufacturer'),
-            model=self._get_raid_controller_attr(
-                drac_controller, 'ProductName'),
-            firmware_version=self._get_raid_controller_attr(
-                drac_controller, 'ControllerFirmwareVersion'))
-
-    def _get_raid_controller_attr(self, drac_controller, attr_name):
-        return utils.get_wsman_resource_attr(
-            drac_controller, uris.DCIM_ControllerView, attr_name)
+        return RAID_CONTROLLER_FIELDS.parse(drac_controller)
 
     def list_virtual_disks(self):
         """Returns the list of virtual disks
@@ -141,44 +184,19 @@ class RAIDManagement(object):
                  interface
         """
 
-        doc = self.client.enumerate(uris.DCIM_VirtualDiskView)
+        items = self.client.iter_enumerate(uris.DCIM_VirtualDiskView)
+
+        return self._parse_drac_virtual_disks(items)
 
-        drac_virtual_disks = utils.find_xml(doc, 'DCIM_VirtualDiskView',
-                                            uris.DCIM_VirtualDiskView,
-                                            find_all=True)
+    def _parse_drac_virtual_disks(self, items):
+        drac_virtual_disks = utils.filter_xml(items, 'DCIM_VirtualDiskView',
+                                              uris.DCIM_VirtualDiskView)
 
         return [self._parse_drac_virtual_disk(disk)
                 for disk in drac_virtual_disks]
 
     def _parse_drac_virtual_disk(self, drac_disk):
-        fqdd = self._get_virtual_disk_attr(drac_disk, 'FQDD')
-        drac_raid_level = self._get_virtual_disk_attr(drac_disk, 'RAIDTypes')
-        size_b = self._get_virtual_disk_attr(drac_disk, 'SizeInBytes')
-        drac_status = self._get_virtual_disk_attr(drac_disk, 'PrimaryStatus')
-        drac_raid_status = self._get_virtual_disk_attr(drac_disk, 'RAIDStatus')
-        drac_pending_operations = self._get_virtual_disk_attr(
-            drac_disk, 'PendingOperations')
-
-        return VirtualDisk(
-            id=fqdd,
-            name=self._get_virtual_disk_attr(drac_disk, 'Name'),
-            description=self._get_virtual_disk_attr(drac_disk,
-                                                    'DeviceDescription'),
-            controller=fqdd.split(':')[1],
-            raid_level=REVERSE_RAID_LEVELS[drac_raid_level],
-            size_mb=int(size_b) / 2 ** 20,
-            state=DISK_STATUS[drac_status],
-            raid_state=DISK_RAID_STATUS[drac_raid_status],
-            span_depth=int(self._get_virtual_disk_attr(drac_disk,
-                                                       'SpanDepth')),
-            span_length=int(self._get_virtual_disk_attr(drac_disk,
-                                                        'SpanLength')),
-            pending_operations=(
-                VIRTUAL_DISK_PENDING_OPERATIONS[drac_pending_operations]))
-
-    def _get_virtual_disk_attr(self, drac_disk, attr_name):
-        return utils.get_wsman_resource_attr(
-            drac_disk, uris.DCIM_VirtualDiskView, attr_name)
+        return VIRTUAL_DISK_FIELDS.parse(drac_disk)
 
     def list_physical_disks(self):
         """Returns the list of physical disks
@@ -190,49 +208,19 @@ class RAIDManagement(object):
                  interface
         """
 
-        doc = self.client.enumerate(uris.DCIM_PhysicalDiskView)
+        items = self.client.iter_enumerate(uris.DCIM_PhysicalDiskView)
+
+        return self._parse_drac_physical_disks(items)
 
-        drac_physical_disks = utils.find_xml(doc, 'DCIM_PhysicalDiskView',
-                                             uris.DCIM_PhysicalDiskView,
-                                             find_all=True)
+    def _parse_drac_physical_disks(self, items):
+        drac_physical_disks = utils.filter_xml(items, 'DCIM_PhysicalDiskView',
+                                               uris.DCIM_PhysicalDiskView)
 
         return [self._parse_drac_physical_disk(disk)
                 for disk in drac_physical_disks]
 
     def _parse_drac_physical_disk(self, drac_disk):
-        fqdd = self._get_physical_disk_attr(drac_disk, 'FQDD')
-        size_b = self._get_physical_disk_attr(drac_disk, 'SizeInBytes')
-        free_size_b = self._get_physical_disk_attr(drac_disk,
-                                                   'FreeSizeInBytes')
-        drac_status = self._get_physical_disk_attr(drac_disk, 'PrimaryStatus')
-        drac_raid_status = self._get_physical_disk_attr(drac_disk,
-                                                        'RaidStatus')
-        drac_media_type = self._get_physical_disk_attr(drac_disk, 'MediaType')
-        drac_bus_protocol = self._get_physical_disk_attr(drac_disk,
-                                                         'BusProtocol')
-
-        return PhysicalDisk(
-            id=fqdd,
-            description=self._get_physical_disk_attr(drac_disk,
-                                                     'DeviceDescription'),
-            controller=fqdd.split(':')[2],
-            manufacturer=self._get_physical_disk_attr(drac_disk,
-                                                      'Manufacturer'),
-            model=self._get_physical_disk_attr(drac_disk, 'Model'),
-            media_type=PHYSICAL_DISK_MEDIA_TYPE[drac_media_type],
-            interface_type=PHYSICAL_DISK_BUS_PROTOCOL[drac_bus_protocol],
-            size_mb=int(size_b) / 2 ** 20,
-            free_size_mb=int(free_size_b) / 2 ** 20,
-            serial_number=self._get_physical_disk_attr(drac_disk,
-                                                       'SerialNumber'),
-            firmware_version=self._get_physical_disk_attr(drac_disk,
-                                                          'Revision'),
-            state=DISK_STATUS[drac_status],
-            raid_state=DISK_RAID_STATUS[drac_raid_status])
-
-    def _get_physical_disk_attr(self, drac_disk, attr_name):
-        return utils.get_wsman_resource_attr(
-            drac_disk, uris.DCIM_PhysicalDiskView, attr_name)
+        return PHYSICAL_DISK_FIELDS.parse(drac_disk)
 
     def create_virtual_disk(self, raid_controller, physical_disks, raid_level,
                             size_mb, disk_name=None, span_length=None,
@@ -260,6 +248,16 @@ class RAIDManagement(object):
         :raises: InvalidParameterValue on invalid input parameter
         """
 
+        doc = self.client.invoke(**self._build_create_virtual_disk(
+            raid_controller, physical_disks, raid_level, size_mb, disk_name,
+            span_length, span_depth))
+
+        return self._parse_raid_service_result(doc)
+
+    def _build_create_virtual_disk(self, raid_controller, physical_disks,
+                                   raid_level, size_mb, disk_name,
+                                   span_length, span_depth):
+        # returns the arguments of the CreateVirtualDisk invocation
         virtual_disk_prop_names = []
         virtual_disk_prop_values = []
         error_msgs = []
@@ -310,20 +308,16 @@ class RAIDManagement(object):
                    'the provided parameters: %r') % ','.join(error_msgs)
             raise exceptions.InvalidParameterValue(reason=msg)
 
-        selectors = {'SystemCreationClassName': 'DCIM_ComputerSystem',
-                     'CreationClassName': 'DCIM_RAIDService',
-                     'SystemName': 'DCIM:ComputerSystem',
-                     'Name': 'DCIM:RAIDService'}
         properties = {'Target': raid_controller,
                       'PDArray': physical_disks,
                       'VDPropNameArray': virtual_disk_prop_names,
                       'VDPropValueArray': virtual_disk_prop_values}
-        doc = self.client.invoke(uris.DCIM_RAIDService, 'CreateVirtualDisk',
-                                 selectors, properties,
-                                 expected_return_value=utils.RET_SUCCESS)
 
-        return {'commit_required': utils.is_reboot_required(
-            doc, uris.DCIM_RAIDService)}
+        return {'resource_uri': uris.DCIM_RAIDService,
+                'method': 'CreateVirtualDisk',
+                'selectors': dict(RAID_SERVICE_SELECTORS),
+                'properties': properties,
+                'expected_return_value': utils.RET_SUCCESS}
 
     def delete_virtual_disk(self, virtual_disk):
         """Deletes a virtual disk
@@ -342,15 +336,19 @@ class RAIDManagement(object):
         :raises: DRACUnexpectedReturnValue on return value mismatch
         """
 
-        selectors = {'SystemCreationClassName': 'DCIM_ComputerSystem',
-                     'CreationClassName': 'DCIM_RAIDService',
-                     'SystemName': 'DCIM:ComputerSystem',
-                     'Name': 'DCIM:RAIDService'}
-        properties = {'Target': virtual_disk}
+        doc = self.client.invoke(**self._build_delete_virtual_disk(
+            virtual_disk))
+
+        return self._parse_raid_service_result(doc)
 
-        doc = self.client.invoke(uris.DCIM_RAIDService, 'DeleteVirtualDisk',
-                                 selectors, properties,
-                                 expected_return_value=utils.RET_SUCCESS)
+    def _build_delete_virtual_disk(self, virtual_disk):
+        # returns the arguments of the DeleteVirtualDisk invocation
+        return {'resource_uri': uris.DCIM_RAIDService,
+                'method': 'DeleteVirtualDisk',
+                'selectors': dict(RAID_SERVICE_SELECTORS),
+                'properties': {'Target': virtual_disk},
+                'expected_return_value': utils.RET_SUCCESS}
 
+    def _parse_raid_service_result(self, doc):
         return {'commit_required': utils.is_reboot_required(
             doc, uris.DCIM_RAIDService)}
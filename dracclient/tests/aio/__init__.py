@@ -0,0 +1,33 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Tests of the asyncio modules
+
+They use the async syntax and asyncio.run, so they are named *_test.py
+instead of test*.py to be skipped by the default discovery of older Python
+versions, and only loaded by load_tests on Python 3.7 or newer.
+"""
+
+import os
+import sys
+
+PATTERN = '*_test.py'
+
+
+def load_tests(loader, tests, pattern):
+    if sys.version_info >= (3, 7):
+        tests.addTests(loader.discover(start_dir=os.path.dirname(__file__),
+                                       pattern=PATTERN))
+
+    return tests
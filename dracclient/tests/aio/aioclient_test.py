@@ -0,0 +1,695 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import asyncio
+
+import lxml.etree
+import mock
+
+import dracclient.aioclient
+import dracclient.cache
+import dracclient.aiowsman
+from dracclient import exceptions
+from dracclient.resources import bios
+from dracclient.resources import uris
+from dracclient.tests import base
+from dracclient.tests import utils as test_utils
+import dracclient.wsman
+
+
+class FakeEndpoint(object):
+    """Minimal HTTP/1.1 server replaying canned WS-Man responses.
+
+    The responses are either a list of (status, text) tuples returned in
+    order, or a callable returning one for the body of each request. A None
+    response closes the connection without replying.
+    """
+
+    def __init__(self, responses, chunked=False):
+        if callable(responses):
+            self.respond = responses
+        else:
+            self.responses = list(responses)
+            self.respond = lambda body: self.responses.pop(0)
+        self.chunked = chunked
+        self.requests = []
+        self.connections = 0
+        self._writers = []
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self._handle, '127.0.0.1', 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.server.close()
+        for writer in self._writers:
+            writer.close()
+        await self.server.wait_closed()
+        # let the connection handlers notice the closed connections
+        await asyncio.sleep(0)
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        self._writers.append(writer)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line == b'\r\n':
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(
+                    int(headers['content-length']))
+                self.requests.append((headers, body))
+
+                response = self.respond(body)
+                if response is None:
+                    break
+
+                status, text = response
+                content = text.encode('utf-8')
+                head = ['HTTP/1.1 %d Status' % status]
+                if self.chunked:
+                    head.append('Transfer-Encoding: chunked')
+                    middle = len(content) // 2
+                    content = b''.join(
+                        b'%x\r\n%s\r\n' % (len(part), part)
+                        for part in (content[:middle], content[middle:]))
+                    content += b'0\r\n\r\n'
+                else:
+                    head.append('Content-Length: %d' % len(content))
+
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('ascii') +
+                             content)
+                await writer.drain()
+        finally:
+            writer.close()
+
+
+class AsyncClientTestCase(base.BaseTest):
+
+    def _client(self, endpoint, cls=dracclient.aiowsman.Client):
+        return cls('127.0.0.1', 'admin', 's3cr3t', port=endpoint.port,
+                   protocol='http')
+
+    def test_enumerate(self):
+        async def test():
+            async with FakeEndpoint([(200, '<result>yay!</result>')]) as ep:
+                async with self._client(ep) as client:
+                    resp = await client.enumerate('resource', auto_pull=False)
+
+            self.assertEqual('yay!', resp.text)
+            headers, body = ep.requests[0]
+            self.assertEqual('Basic YWRtaW46czNjcjN0',
+                             headers['authorization'])
+            self.assertIn(b'Enumerate', body)
+
+        asyncio.run(test())
+
+    def test_enumerate_with_auto_pull(self):
+        responses = [(200, test_utils.WSManEnumerations['context'][i])
+                     for i in range(4)]
+
+        async def test():
+            async with FakeEndpoint(responses) as ep:
+                async with self._client(ep) as client:
+                    resp_xml = await client.enumerate('FooResource')
+
+            self.assertEqual(
+                3, len(resp_xml.findall('.//{http://FooResource}FooResource')))
+            self.assertEqual(
+                1, len(resp_xml.findall('.//{http://BarResource}BazResource')))
+            self.assertEqual(0, len(resp_xml.findall(
+                './/{%s}EnumerationContext' % dracclient.wsman.NS_WSMAN_ENUM)))
+            # all requests are sent over the same keep-alive connection
+            self.assertEqual(1, ep.connections)
+            self.assertEqual(4, len(ep.requests))
+
+        asyncio.run(test())
+
+    def test_iter_enumerate(self):
+        responses = [(200, test_utils.WSManEnumerations['context'][i])
+                     for i in range(4)]
+
+        async def test():
+            async with FakeEndpoint(responses) as ep:
+                async with self._client(ep) as client:
+                    return [item.tag async for item
+                            in client.iter_enumerate('FooResource')]
+
+        self.assertEqual(['{http://FooResource}FooResource',
+                          '{http://FooResource}FooResource',
+                          '{http://FooResource}FooResource',
+                          '{http://BarResource}BazResource'],
+                         asyncio.run(test()))
+
+    def test_enumerate_with_prefetch(self):
+        responses = [(200, test_utils.WSManEnumerations['context'][i])
+                     for i in range(4)]
+
+        async def test():
+            async with FakeEndpoint(responses) as ep:
+                async with self._client(ep) as client:
+                    resp_xml = await client.enumerate('FooResource',
+                                                      prefetch=True,
+                                                      max_page_size=4096)
+
+            self.assertEqual(
+                3, len(resp_xml.findall('.//{http://FooResource}FooResource')))
+            self.assertEqual(
+                1, len(resp_xml.findall('.//{http://BarResource}BazResource')))
+            self.assertEqual(4, len(ep.requests))
+
+        asyncio.run(test())
+
+    def test_iter_enumerate_with_prefetch_closed_early(self):
+        responses = [(200, test_utils.WSManEnumerations['context'][i])
+                     for i in range(4)]
+        prefetches = []
+        ensure_future = asyncio.ensure_future
+
+        def record_prefetch(coro):
+            prefetches.append(ensure_future(coro))
+            return prefetches[-1]
+
+        async def test():
+            async with FakeEndpoint(responses) as ep:
+                async with self._client(ep) as client:
+                    items = client.iter_enumerate('FooResource',
+                                                  prefetch=True)
+                    with mock.patch.object(asyncio, 'ensure_future',
+                                           side_effect=record_prefetch):
+                        await items.__anext__()
+                    # lets the prefetch start its request
+                    await asyncio.sleep(0)
+                    await items.aclose()
+
+                    self.assertTrue(prefetches)
+                    for prefetch in prefetches:
+                        self.assertTrue(prefetch.done())
+
+        asyncio.run(test())
+
+    def test_enumerate_with_chunked_response(self):
+        async def test():
+            async with FakeEndpoint([(200, '<result>yay!</result>')],
+                                    chunked=True) as ep:
+                async with self._client(ep) as client:
+                    resp = await client.enumerate('resource', auto_pull=False)
+
+            self.assertEqual('yay!', resp.text)
+
+        asyncio.run(test())
+
+    def test_enumerate_with_invalid_status_code(self):
+        async def test():
+            async with FakeEndpoint([(500, '')]) as ep:
+                async with self._client(ep) as client:
+                    with self.assertRaises(exceptions.WSManInvalidResponse):
+                        await client.enumerate('resource')
+
+        asyncio.run(test())
+
+    def test_enumerate_with_request_failure(self):
+        async def test():
+            async with FakeEndpoint([]) as ep:
+                pass
+
+            async with self._client(ep) as client:
+                with self.assertRaises(exceptions.WSManRequestFailure):
+                    await client.enumerate('resource')
+
+        asyncio.run(test())
+
+    def test_invoke(self):
+        async def test():
+            async with FakeEndpoint([(200, '<result>yay!</result>')]) as ep:
+                async with self._client(ep) as client:
+                    resp = await client.invoke('http://resource', 'method',
+                                               {'selector': 'foo'},
+                                               {'property': 'bar'})
+
+            self.assertEqual('yay!', resp.text)
+
+        asyncio.run(test())
+
+    def test_enumerate_retried_on_closed_connection(self):
+        responses = [(200, '<result>foo</result>'), None,
+                     (200, '<result>bar</result>')]
+
+        async def test():
+            async with FakeEndpoint(responses) as ep:
+                async with self._client(ep) as client:
+                    await client.enumerate('resource', auto_pull=False)
+                    resp = await client.enumerate('resource', auto_pull=False)
+
+            self.assertEqual('bar', resp.text)
+            self.assertEqual(2, ep.connections)
+            self.assertEqual(3, len(ep.requests))
+
+        asyncio.run(test())
+
+    def test_invoke_not_retried_on_closed_connection(self):
+        responses = [(200, '<result>foo</result>'), None,
+                     (200, '<result>bar</result>')]
+
+        async def test():
+            async with FakeEndpoint(responses) as ep:
+                async with self._client(ep) as client:
+                    await client.invoke('http://resource', 'method', {}, {})
+                    with self.assertRaises(exceptions.WSManRequestFailure):
+                        await client.invoke('http://resource', 'method',
+                                            {}, {})
+
+            self.assertEqual(2, len(ep.requests))
+
+        asyncio.run(test())
+
+    def test_idempotent_invoke_retried_on_closed_connection(self):
+        responses = [(200, '<result>foo</result>'), None,
+                     (200, '<result>bar</result>')]
+
+        async def test():
+            async with FakeEndpoint(responses) as ep:
+                async with self._client(ep) as client:
+                    await client.invoke('http://resource', 'method', {}, {})
+                    resp = await client.invoke('http://resource', 'method',
+                                               {}, {}, idempotent=True)
+
+            self.assertEqual('bar', resp.text)
+            self.assertEqual(3, len(ep.requests))
+
+        asyncio.run(test())
+
+    def test_enumerate_with_timeout(self):
+        async def test():
+            # accepts the connections, but never responds
+            server = await asyncio.start_server(lambda reader, writer: None,
+                                                '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            try:
+                async with dracclient.aiowsman.Client(
+                        '127.0.0.1', 'admin', 's3cr3t', port=port,
+                        protocol='http', timeout=0.05) as client:
+                    await client.enumerate('resource', auto_pull=False)
+            finally:
+                server.close()
+                await server.wait_closed()
+
+        self.assertRaises(exceptions.WSManRequestFailure, asyncio.run, test())
+
+    def test_retry_policy(self):
+        policy = dracclient.wsman.RetryPolicy(backoff=0.01)
+
+        async def test():
+            async with FakeEndpoint([(503, ''),
+                                     (200, '<result>yay!</result>')]) as ep:
+                async with dracclient.aiowsman.Client(
+                        '127.0.0.1', 'admin', 's3cr3t', port=ep.port,
+                        protocol='http', retry_policy=policy) as client:
+                    resp = await client.enumerate('resource', auto_pull=False)
+
+            self.assertEqual('yay!', resp.text)
+            self.assertEqual(2, len(ep.requests))
+
+        asyncio.run(test())
+
+    def test_retry_policy_with_invoke(self):
+        policy = dracclient.wsman.RetryPolicy(backoff=0.01)
+
+        async def test():
+            async with FakeEndpoint([(503, ''),
+                                     (200, '<result>yay!</result>')]) as ep:
+                async with dracclient.aiowsman.Client(
+                        '127.0.0.1', 'admin', 's3cr3t', port=ep.port,
+                        protocol='http', retry_policy=policy) as client:
+                    with self.assertRaises(
+                            exceptions.WSManInvalidResponse):
+                        await client.invoke('http://resource', 'method',
+                                            {}, {})
+
+            self.assertEqual(1, len(ep.requests))
+
+        asyncio.run(test())
+
+    def test_observers(self):
+        observer = mock.Mock(spec=dracclient.wsman.Observer)
+
+        async def test():
+            async with FakeEndpoint([(200, '<result>yay!</result>')]) as ep:
+                async with dracclient.aiowsman.Client(
+                        '127.0.0.1', 'admin', 's3cr3t', port=ep.port,
+                        protocol='http', observers=[observer]) as client:
+                    await client.invoke('http://resource', 'Foo', {}, {})
+
+        asyncio.run(test())
+
+        stats = observer.request_finished.call_args[0][0]
+        self.assertEqual('Invoke', stats.operation)
+        self.assertEqual('Foo', stats.method)
+        self.assertEqual(1, stats.attempts)
+        self.assertEqual(200, stats.status_code)
+        self.assertEqual(len('<result>yay!</result>'), stats.response_size)
+        self.assertIsNone(stats.error)
+
+    def test_max_in_flight(self):
+        async def test():
+            async with FakeEndpoint([(200, '<result>yay!</result>')] *
+                                    2) as ep:
+                async with dracclient.aiowsman.Client(
+                        '127.0.0.1', 'admin', 's3cr3t', port=ep.port,
+                        protocol='http', max_in_flight=1) as client:
+                    await asyncio.gather(
+                        client.enumerate('resource', auto_pull=False),
+                        client.enumerate('resource', auto_pull=False))
+
+            # the second request waits for the first one and reuses its
+            # connection
+            self.assertEqual(1, ep.connections)
+
+        asyncio.run(test())
+
+    def test_invalid_max_in_flight(self):
+        self.assertRaises(exceptions.InvalidParameterValue,
+                          dracclient.aiowsman.Client, '127.0.0.1', 'admin',
+                          's3cr3t', max_in_flight=0)
+
+
+class AsyncDRACClientTestCase(base.BaseTest):
+
+    def _client(self, endpoint):
+        return dracclient.aioclient.AsyncDRACClient(
+            '127.0.0.1', 'admin', 's3cr3t', port=endpoint.port,
+            protocol='http')
+
+    def test_get_power_state(self):
+        async def test():
+            async with FakeEndpoint([(200, test_utils.BIOSEnumerations[
+                    uris.DCIM_ComputerSystem]['ok'])]) as ep:
+                async with self._client(ep) as client:
+                    return await client.get_power_state()
+
+        self.assertEqual('POWER_ON', asyncio.run(test()))
+
+    def test_set_power_state_invalid_target_state(self):
+        async def test():
+            async with FakeEndpoint([]) as ep:
+                async with self._client(ep) as client:
+                    await client.set_power_state('foo')
+
+        self.assertRaises(exceptions.InvalidParameterValue, asyncio.run,
+                          test())
+
+    def test_coalesce(self):
+        async def test():
+            async with FakeEndpoint([(200, test_utils.BIOSEnumerations[
+                    uris.DCIM_ComputerSystem]['ok'])]) as ep:
+                async with dracclient.aioclient.AsyncDRACClient(
+                        '127.0.0.1', 'admin', 's3cr3t', port=ep.port,
+                        protocol='http', coalesce=True) as client:
+                    states = await asyncio.gather(client.get_power_state(),
+                                                  client.get_power_state())
+
+            self.assertEqual(1, len(ep.requests))
+            return states
+
+        self.assertEqual(['POWER_ON', 'POWER_ON'], asyncio.run(test()))
+
+    def test_coalesce_failure(self):
+        async def test():
+            async with FakeEndpoint([(500, '')]) as ep:
+                async with dracclient.aioclient.AsyncDRACClient(
+                        '127.0.0.1', 'admin', 's3cr3t', port=ep.port,
+                        protocol='http', coalesce=True) as client:
+                    results = await asyncio.gather(
+                        client.get_power_state(), client.get_power_state(),
+                        return_exceptions=True)
+
+            self.assertEqual(1, len(ep.requests))
+            return results
+
+        for result in asyncio.run(test()):
+            self.assertIsInstance(result, exceptions.WSManInvalidResponse)
+
+    def test_coalesce_with_different_parameters(self):
+        response = (200, test_utils.BIOSEnumerations[
+            uris.DCIM_ComputerSystem]['ok'])
+
+        async def test():
+            async with FakeEndpoint([response, response]) as ep:
+                async with dracclient.aioclient.AsyncDRACClient(
+                        '127.0.0.1', 'admin', 's3cr3t', port=ep.port,
+                        protocol='http', coalesce=True) as client:
+                    await asyncio.gather(
+                        client.client.enumerate(uris.DCIM_ComputerSystem),
+                        client.client.enumerate(uris.DCIM_ComputerSystem,
+                                                max_elems=10))
+
+            return len(ep.requests)
+
+        self.assertEqual(2, asyncio.run(test()))
+
+    def test_list_bios_settings(self):
+        expected_enum_attr = bios.BIOSEnumerableAttribute(
+            name='MemTest',
+            read_only=False,
+            current_value='Disabled',
+            pending_value=None,
+            possible_values=['Enabled', 'Disabled'])
+        responses = [
+            (200, test_utils.BIOSEnumerations[uris.DCIM_BIOSEnumeration][
+                'ok']),
+            (200, test_utils.BIOSEnumerations[uris.DCIM_BIOSString]['ok']),
+            (200, test_utils.BIOSEnumerations[uris.DCIM_BIOSInteger]['ok'])]
+
+        async def test():
+            async with FakeEndpoint(responses) as ep:
+                async with self._client(ep) as client:
+                    return await client.list_bios_settings()
+
+        bios_settings = asyncio.run(test())
+
+        self.assertEqual(103, len(bios_settings))
+        self.assertEqual(expected_enum_attr, bios_settings['MemTest'])
+
+    def test_list_bios_settings_concurrently(self):
+        def respond(body):
+            for (uri, _) in bios.BIOS_ATTRIBUTE_NAMESPACES:
+                if ('>%s<' % uri).encode('utf-8') in body:
+                    return 200, test_utils.BIOSEnumerations[uri]['ok']
+
+        async def test():
+            async with FakeEndpoint(respond) as ep:
+                async with self._client(ep) as client:
+                    result = await client.list_bios_settings(concurrent=True)
+
+            self.assertEqual(3, ep.connections)
+            return result
+
+        self.assertEqual(103, len(asyncio.run(test())))
+
+    def test_set_bios_settings(self):
+        responses = [
+            (200, test_utils.BIOSEnumerations[uris.DCIM_BIOSEnumeration][
+                'ok']),
+            (200, test_utils.BIOSEnumerations[uris.DCIM_BIOSString]['ok']),
+            (200, test_utils.BIOSEnumerations[uris.DCIM_BIOSInteger]['ok']),
+            (200, test_utils.BIOSInvocations[uris.DCIM_BIOSService][
+                'SetAttributes']['ok'])]
+
+        async def test():
+            async with FakeEndpoint(responses) as ep:
+                async with self._client(ep) as client:
+                    result = await client.set_bios_settings(
+                        {'ProcVirtualization': 'Disabled'})
+
+            payload = lxml.etree.fromstring(ep.requests[-1][1])
+            values = payload.findall('.//{%s}AttributeValue' %
+                                     uris.DCIM_BIOSService)
+            self.assertEqual(['Disabled'], [value.text for value in values])
+            return result
+
+        self.assertEqual({'commit_required': True}, asyncio.run(test()))
+
+    def test_set_bios_settings_with_current_settings(self):
+        current_settings = {'ProcVirtualization': bios.BIOSEnumerableAttribute(
+            'ProcVirtualization', 'Enabled', None, False,
+            ['Enabled', 'Disabled'])}
+        responses = [
+            (200, test_utils.BIOSInvocations[uris.DCIM_BIOSService][
+                'SetAttributes']['ok'])]
+
+        async def test():
+            async with FakeEndpoint(responses) as ep:
+                async with self._client(ep) as client:
+                    result = await client.set_bios_settings(
+                        {'ProcVirtualization': 'Disabled'},
+                        current_settings=current_settings)
+
+            self.assertEqual(1, len(ep.requests))
+            return result
+
+        self.assertEqual({'commit_required': True}, asyncio.run(test()))
+
+    def test_set_bios_settings_in_chunks(self):
+        current_settings = dict(
+            (name, bios.BIOSEnumerableAttribute(
+                name, 'Enabled', None, False, ['Enabled', 'Disabled']))
+            for name in ('ProcVirtualization', 'LogicalProc'))
+        responses = [
+            (200, test_utils.BIOSInvocations[uris.DCIM_BIOSService][
+                'SetAttributes']['ok'])] * 2
+
+        async def test():
+            async with FakeEndpoint(responses) as ep:
+                async with self._client(ep) as client:
+                    result = await client.set_bios_settings(
+                        dict.fromkeys(current_settings, 'Disabled'),
+                        current_settings=current_settings, max_attributes=1)
+
+            self.assertEqual(2, len(ep.requests))
+            return result
+
+        self.assertEqual({'commit_required': True}, asyncio.run(test()))
+
+    def test_set_bios_settings_resent_on_closed_connection(self):
+        current_settings = dict(
+            (name, bios.BIOSEnumerableAttribute(
+                name, 'Enabled', None, False, ['Enabled', 'Disabled']))
+            for name in ('ProcVirtualization', 'LogicalProc'))
+        ok = (200, test_utils.BIOSInvocations[uris.DCIM_BIOSService][
+            'SetAttributes']['ok'])
+
+        async def test():
+            # SetAttributes is idempotent, like in DRACClient
+            async with FakeEndpoint([ok, None, ok]) as ep:
+                async with self._client(ep) as client:
+                    result = await client.set_bios_settings(
+                        dict.fromkeys(current_settings, 'Disabled'),
+                        current_settings=current_settings, max_attributes=1)
+
+            self.assertEqual(3, len(ep.requests))
+            return result
+
+        self.assertEqual({'commit_required': True}, asyncio.run(test()))
+
+    def test_list_jobs(self):
+        async def test():
+            async with FakeEndpoint([(200, test_utils.JobEnumerations[
+                    uris.DCIM_LifecycleJob]['ok'])]) as ep:
+                async with self._client(ep) as client:
+                    return await client.list_jobs()
+
+        self.assertEqual(6, len(asyncio.run(test())))
+
+    def test_wait_for_job(self):
+        jobs_xml = test_utils.JobEnumerations[uris.DCIM_LifecycleJob]['ok']
+
+        async def test():
+            async with FakeEndpoint([
+                    (200, jobs_xml),
+                    (200, jobs_xml.replace('>Running<', '>Failed<'))]) as ep:
+                async with self._client(ep) as client:
+                    job = await client.wait_for_job('JID_001436981582',
+                                                    poll_interval=0.01)
+
+            return job, len(ep.requests)
+
+        job, requests = asyncio.run(test())
+
+        self.assertEqual('Failed', job.state)
+        self.assertEqual(2, requests)
+
+    def test_create_config_job(self):
+        async def test():
+            async with FakeEndpoint([(200, test_utils.JobInvocations[
+                    uris.DCIM_BIOSService]['CreateTargetedConfigJob'][
+                        'ok'])]) as ep:
+                async with self._client(ep) as client:
+                    return await client.commit_pending_bios_changes()
+
+        self.assertEqual('JID_442507917525', asyncio.run(test()))
+
+    def test_delete_pending_config_failed(self):
+        async def test():
+            async with FakeEndpoint([(200, test_utils.JobInvocations[
+                    uris.DCIM_BIOSService]['DeletePendingConfiguration'][
+                        'error'])]) as ep:
+                async with self._client(ep) as client:
+                    await client.abandon_pending_bios_changes()
+
+        self.assertRaises(exceptions.DRACOperationFailed, asyncio.run, test())
+
+    def test_get_lifecycle_controller_version(self):
+        async def test():
+            async with FakeEndpoint([(200, test_utils.
+                                      LifecycleControllerEnumerations[
+                                          uris.DCIM_SystemView]['ok'])]) as ep:
+                async with self._client(ep) as client:
+                    return await client.get_lifecycle_controller_version()
+
+        self.assertEqual((2, 1, 0), asyncio.run(test()))
+
+    def test_list_physical_disks(self):
+        async def test():
+            async with FakeEndpoint([(200, test_utils.RAIDEnumerations[
+                    uris.DCIM_PhysicalDiskView]['ok'])]) as ep:
+                async with self._client(ep) as client:
+                    return await client.list_physical_disks()
+
+        self.assertEqual(2, len(asyncio.run(test())))
+
+    def test_create_virtual_disk_invalid_raid_level(self):
+        async def test():
+            async with FakeEndpoint([]) as ep:
+                async with self._client(ep) as client:
+                    await client.create_virtual_disk(
+                        'controller', ['disk1', 'disk2'], 'foo', 42)
+
+        self.assertRaises(exceptions.InvalidParameterValue, asyncio.run,
+                          test())
+
+    def test_cache(self):
+        async def test():
+            async with FakeEndpoint([
+                    (200, test_utils.RAIDEnumerations[
+                        uris.DCIM_PhysicalDiskView]['ok']),
+                    (200, test_utils.RAIDInvocations[uris.DCIM_RAIDService][
+                        'DeleteVirtualDisk']['ok']),
+                    (200, test_utils.RAIDEnumerations[
+                        uris.DCIM_PhysicalDiskView]['ok'])]) as ep:
+                async with dracclient.aioclient.AsyncDRACClient(
+                        '127.0.0.1', 'admin', 's3cr3t', port=ep.port,
+                        protocol='http',
+                        cache=dracclient.cache.ResourceCache(
+                            dracclient.cache.CONFIGURATION_TTLS)) as client:
+                    first = await client.list_physical_disks()
+                    second = await client.list_physical_disks()
+                    await client.delete_virtual_disk('disk1')
+                    third = await client.list_physical_disks()
+
+            return first, second, third, len(ep.requests)
+
+        first, second, third, requests = asyncio.run(test())
+
+        self.assertEqual(first, second)
+        self.assertEqual(first, third)
+        self.assertEqual(3, requests)
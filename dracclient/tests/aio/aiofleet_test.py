@@ -0,0 +1,101 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import asyncio
+
+import mock
+
+import dracclient.aioclient
+import dracclient.aiofleet
+import dracclient.aiowsman
+from dracclient import exceptions
+import dracclient.fleet
+from dracclient.resources import uris
+from dracclient.tests.aio import aioclient_test
+from dracclient.tests import base
+from dracclient.tests import utils as test_utils
+
+
+class AsyncFleetClientTestCase(base.BaseTest):
+
+    def _nodes(self, *endpoints):
+        return [{'host': '127.0.0.1', 'username': 'admin',
+                 'password': 's3cr3t', 'port': endpoint.port,
+                 'protocol': 'http'} for endpoint in endpoints]
+
+    def test_arun(self):
+        response = (200, test_utils.BIOSEnumerations[
+            uris.DCIM_ComputerSystem]['ok'])
+
+        async def test():
+            async with aioclient_test.FakeEndpoint([response]) as ep1, \
+                    aioclient_test.FakeEndpoint([(500, '')]) as ep2:
+                fleet = dracclient.fleet.FleetClient(
+                    self._nodes(ep1, ep2), mode='asyncio')
+                results = [result async for result
+                           in fleet.arun('get_power_state')]
+                await fleet.aclose()
+
+            return results
+
+        results = asyncio.run(test())
+
+        self.assertEqual(2, len(results))
+        succeeded = [result for result in results if result.exception is None]
+        failed = [result for result in results if result.exception is not None]
+        self.assertEqual(['POWER_ON'], [result.result for result in succeeded])
+        self.assertIsInstance(failed[0].exception,
+                              exceptions.WSManInvalidResponse)
+
+    def test_arun_with_timeout(self):
+        async def send(data, idempotent=True):
+            await asyncio.sleep(5)
+
+        async def test():
+            async with aioclient_test.FakeEndpoint([]) as ep:
+                fleet = dracclient.fleet.FleetClient(
+                    self._nodes(ep), mode='asyncio', timeout=0.05)
+                with mock.patch.object(dracclient.aiowsman.Client, '_send',
+                                       side_effect=send):
+                    results = [result async for result
+                               in fleet.arun('get_power_state')]
+                await fleet.aclose()
+
+            return results
+
+        results = asyncio.run(test())
+
+        self.assertEqual(1, len(results))
+        self.assertIsInstance(results[0].exception, exceptions.DRACTimeout)
+
+    def test_run_in_asyncio_mode(self):
+        fleet = dracclient.fleet.FleetClient(
+            [('host0', 'admin', 's3cr3t')], mode='asyncio')
+
+        with mock.patch.object(dracclient.aioclient.AsyncDRACClient,
+                               'get_power_state', autospec=True) as mock_get:
+            mock_get.return_value = 'POWER_ON'
+            results = list(fleet.run('get_power_state'))
+
+        self.assertEqual([dracclient.fleet.FleetResult('host0', 'POWER_ON',
+                                                       None)], results)
+
+    def test_arun_with_max_in_flight_per_host(self):
+        fleet = dracclient.fleet.FleetClient(
+            [('host0', 'admin', 's3cr3t')], mode='asyncio',
+            max_in_flight_per_host=2, timeout=30)
+
+        drac_client = dracclient.aiofleet._get_client(fleet, fleet.nodes[0])
+
+        self.assertEqual(2, drac_client.client.max_in_flight)
+        self.assertEqual(30, drac_client.client.timeout)
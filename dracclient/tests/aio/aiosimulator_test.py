@@ -0,0 +1,113 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import asyncio
+
+import dracclient.aioclient
+from dracclient import aiosimulator
+import dracclient.client
+from dracclient import exceptions
+import dracclient.fleet
+from dracclient import replay
+from dracclient.tests import base
+import dracclient.wsman
+
+
+class SimulatorTestCase(base.BaseTest):
+
+    def _client(self, node, **kwargs):
+        return dracclient.client.DRACClient(**dict(node, **kwargs))
+
+    def test_client(self):
+        responder = replay.Responder(page_size=10)
+
+        with aiosimulator.Simulator(responder=responder).in_thread() as sim:
+            with self._client(sim.nodes[0]) as drac_client:
+                bios_settings = drac_client.list_bios_settings()
+                jobs = drac_client.list_jobs()
+
+        self.assertEqual(103, len(bios_settings))
+        self.assertEqual(6, len(jobs))
+        # 66, 35 and 2 BIOS attributes in pages of 10, and a page of jobs
+        self.assertEqual(7 + 4 + 1 + 1, sim.stats()['requests'])
+        self.assertEqual(1, sim.stats()['connections'])
+
+    def test_async_client(self):
+        async def test():
+            async with aiosimulator.Simulator() as sim:
+                async with dracclient.aioclient.AsyncDRACClient(
+                        **sim.nodes[0]) as drac_client:
+                    return await drac_client.get_lifecycle_controller_version()
+
+        self.assertEqual((2, 1, 0), asyncio.run(test()))
+
+    def test_error_injection(self):
+        with aiosimulator.Simulator(error_rate=1.0).in_thread() as sim:
+            with self._client(sim.nodes[0]) as drac_client:
+                self.assertRaises(exceptions.WSManInvalidResponse,
+                                  drac_client.list_jobs)
+
+        self.assertEqual(1, sim.stats()['errors'])
+
+    def test_drop_injection(self):
+        with aiosimulator.Simulator(drop_rate=1.0).in_thread() as sim:
+            with self._client(sim.nodes[0]) as drac_client:
+                self.assertRaises(exceptions.WSManRequestFailure,
+                                  drac_client.list_jobs)
+
+        self.assertEqual(1, sim.stats()['dropped'])
+
+    def test_retry_injected_errors(self):
+        retry_policy = dracclient.wsman.RetryPolicy(max_attempts=10,
+                                                    backoff=0, budget=100)
+
+        with aiosimulator.Simulator(error_rate=0.5, error_status=503,
+                                    seed=0).in_thread() as sim:
+            with self._client(sim.nodes[0],
+                              retry_policy=retry_policy) as drac_client:
+                for _ in range(10):
+                    self.assertEqual(6, len(drac_client.list_jobs()))
+
+        self.assertLess(0, sim.stats()['errors'])
+
+    def test_max_concurrency(self):
+        async def test(sim):
+            async with dracclient.aioclient.AsyncDRACClient(
+                    **sim.nodes[0]) as drac_client:
+                return await asyncio.gather(
+                    *[drac_client.list_jobs() for _ in range(3)],
+                    return_exceptions=True)
+
+        async def run():
+            async with aiosimulator.Simulator(latency=0.05,
+                                              max_concurrency=1) as sim:
+                return sim, await test(sim)
+
+        sim, results = asyncio.run(run())
+
+        failures = [result for result in results
+                    if isinstance(result, exceptions.WSManInvalidResponse)]
+        self.assertEqual(2, len(failures))
+        self.assertEqual(2, sim.stats()['rejected'])
+        self.assertEqual(1, sim.stats()['max_in_flight'])
+
+    def test_fleet(self):
+        with aiosimulator.Simulator(hosts=20).in_thread() as sim:
+            with dracclient.fleet.FleetClient(sim.nodes) as fleet:
+                results = list(fleet.run('get_lifecycle_controller_version'))
+
+        self.assertEqual(20, len(results))
+        for result in results:
+            self.assertEqual((2, 1, 0), result.result)
+        for host in sim.hosts:
+            self.assertEqual(1, host.stats.requests)
@@ -0,0 +1,97 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from dracclient import cache
+from dracclient.resources import uris
+from dracclient.tests import base
+from dracclient import wsman
+
+
+@mock.patch.object(wsman, '_monotonic', spec_set=True, autospec=True)
+class ResourceCacheTestCase(base.BaseTest):
+
+    def setUp(self):
+        super(ResourceCacheTestCase, self).setUp()
+        self.cache = cache.ResourceCache(
+            ttls={'http://foo': 10, 'http://bar': 10, 'http://baz': None},
+            max_entries=2)
+
+    def test_get(self, mock_monotonic):
+        mock_monotonic.return_value = 100
+
+        self.cache.set('http://foo', 'key', 'value')
+
+        self.assertEqual('value', self.cache.get('http://foo', 'key'))
+        self.assertIsNone(self.cache.get('http://foo', 'other-key'))
+
+    def test_get_expired(self, mock_monotonic):
+        mock_monotonic.return_value = 100
+        self.cache.set('http://foo', 'key', 'value')
+
+        mock_monotonic.return_value = 110
+
+        self.assertIsNone(self.cache.get('http://foo', 'key'))
+        self.assertEqual(0, len(self.cache))
+
+    def test_set_not_cached_resource(self, mock_monotonic):
+        mock_monotonic.return_value = 100
+
+        self.cache.set('http://baz', 'key', 'value')
+        self.cache.set('http://unknown', 'key', 'value')
+
+        self.assertEqual(0, len(self.cache))
+
+    def test_evicts_least_recently_used(self, mock_monotonic):
+        mock_monotonic.return_value = 100
+        self.cache.set('http://foo', 'key1', 'value1')
+        self.cache.set('http://foo', 'key2', 'value2')
+        self.cache.get('http://foo', 'key1')
+
+        self.cache.set('http://bar', 'key', 'value')
+
+        self.assertEqual('value1', self.cache.get('http://foo', 'key1'))
+        self.assertIsNone(self.cache.get('http://foo', 'key2'))
+        self.assertEqual('value', self.cache.get('http://bar', 'key'))
+
+    def test_invalidate(self, mock_monotonic):
+        mock_monotonic.return_value = 100
+        self.cache.set('http://foo', 'key', 'value')
+        self.cache.set('http://bar', 'key', 'value')
+
+        self.cache.invalidate(['http://foo'])
+
+        self.assertIsNone(self.cache.get('http://foo', 'key'))
+        self.assertEqual('value', self.cache.get('http://bar', 'key'))
+
+        self.cache.invalidate()
+
+        self.assertEqual(0, len(self.cache))
+
+    def test_invalidate_for_invoke(self, mock_monotonic):
+        mock_monotonic.return_value = 100
+        bios_cache = cache.ResourceCache(
+            dict(cache.DEFAULT_TTLS, **cache.CONFIGURATION_TTLS))
+        bios_cache.set(uris.DCIM_BIOSString, 'key', 'value')
+        bios_cache.set(uris.DCIM_ControllerView, 'key', 'value')
+
+        bios_cache.invalidate_for_invoke(uris.DCIM_BIOSService)
+
+        self.assertIsNone(bios_cache.get(uris.DCIM_BIOSString, 'key'))
+        self.assertEqual('value',
+                         bios_cache.get(uris.DCIM_ControllerView, 'key'))
+
+        bios_cache.invalidate_for_invoke(uris.DCIM_ComputerSystem)
+
+        self.assertEqual(0, len(bios_cache))
@@ -11,12 +11,16 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import re
+import threading
+import time
 
 import lxml.etree
 import mock
 import requests_mock
 
+import dracclient.cache
 import dracclient.client
 from dracclient import exceptions
 from dracclient.resources import bios
@@ -27,6 +31,7 @@ from dracclient.resources import uris
 from dracclient.tests import base
 from dracclient.tests import utils as test_utils
 from dracclient import utils
+import dracclient.wsman
 
 
 @requests_mock.Mocker()
@@ -177,7 +182,8 @@ class ClientBootManagementTestCase(base.BaseTest):
         mock_invoke.assert_called_once_with(
             mock.ANY, uris.DCIM_BootConfigSetting,
             'ChangeBootOrderByInstanceID', expected_selectors,
-            expected_properties, expected_return_value=utils.RET_SUCCESS)
+            expected_properties, expected_return_value=utils.RET_SUCCESS,
+            idempotent=True)
 
     @requests_mock.Mocker()
     def test_change_boot_device_order_error(self, mock_requests):
@@ -244,6 +250,125 @@ class ClientBIOSConfigurationTestCase(base.BaseTest):
         self.assertIn('Proc1NumCores', bios_settings)
         self.assertEqual(expected_integer_attr, bios_settings['Proc1NumCores'])
 
+    @requests_mock.Mocker()
+    def test_list_bios_settings_shares_metadata(self, mock_requests):
+        self._mock_bios_enumerations(mock_requests)
+        other_client = dracclient.client.DRACClient(
+            **test_utils.FAKE_ENDPOINT)
+
+        bios_settings = self.drac_client.list_bios_settings()
+        other_bios_settings = other_client.list_bios_settings()
+
+        self.assertEqual(bios_settings, other_bios_settings)
+        attr = bios_settings['MemTest']
+        other_attr = other_bios_settings['MemTest']
+        self.assertFalse(hasattr(attr, '__dict__'))
+        self.assertEqual(('Enabled', 'Disabled'), attr.possible_values)
+        self.assertIs(attr.possible_values, other_attr.possible_values)
+        self.assertIs(attr.name, other_attr.name)
+        self.assertIs(attr.current_value, other_attr.current_value)
+
+    @mock.patch.object(bios, 'MAX_SHARED_VALUES', 2)
+    @mock.patch.dict(bios._shared_values, clear=True)
+    def test_shared_values_are_bounded(self):
+        for name in ('MemTest', 'ProcVirtualization', 'SriovGlobalEnable'):
+            bios.BIOSAttribute(name, None, None, False)
+
+        self.assertEqual(1, len(bios._shared_values))
+        self.assertIn('SriovGlobalEnable', bios._shared_values)
+
+    def test_bios_attribute_equality(self):
+        attr = bios.BIOSEnumerableAttribute('MemTest', 'Disabled', None,
+                                            False, ['Enabled', 'Disabled'])
+
+        self.assertEqual(attr, bios.BIOSEnumerableAttribute(
+            'MemTest', 'Disabled', None, False, ('Enabled', 'Disabled')))
+        self.assertNotEqual(attr, bios.BIOSEnumerableAttribute(
+            'MemTest', 'Enabled', None, False, ['Enabled', 'Disabled']))
+        self.assertNotEqual(attr, bios.BIOSAttribute('MemTest', 'Disabled',
+                                                     None, False))
+        self.assertNotEqual(attr, 'MemTest')
+
+    @requests_mock.Mocker()
+    def test_validate_many(self, mock_requests):
+        self._mock_bios_enumerations(mock_requests)
+        current_settings = self.drac_client.list_bios_settings()
+
+        # the attributes are reported in the order of the new settings
+        validation = bios.validate_many(
+            collections.OrderedDict([
+                ('ProcVirtualization', 'Disabled'), ('MemTest', 'Disabled'),
+                ('SystemModelName', 'bar'), ('Proc1NumCores', 16),
+                ('NumLock', 'Maybe'), ('Foo', 'bar')]),
+            current_settings)
+
+        self.assertEqual({'ProcVirtualization': 'Disabled'},
+                         validation.changed)
+        self.assertEqual(['MemTest'], validation.unchanged)
+        self.assertEqual(['SystemModelName', 'Proc1NumCores'],
+                         validation.read_only)
+        self.assertEqual(['Foo'], validation.unknown)
+        self.assertEqual(['NumLock'], list(validation.invalid))
+        self.assertIn("It must be in ['On', 'Off']",
+                      validation.invalid['NumLock'])
+
+    def test_compiled_regex_is_cached(self):
+        attr = bios.BIOSStringAttribute('AssetTag', '', None, False, 0, 10,
+                                        '^[[:alnum:]]{0,10}\\z')
+
+        self.assertIsNone(attr.validate('foo42'))
+        self.assertIsNotNone(attr.validate('foo-42'))
+        self.assertIs(bios._compile_pcre(attr.pcre_regex),
+                      bios._compile_pcre(attr.pcre_regex))
+
+    def test_translate_pcre(self):
+        for (pcre_regex, expected) in (
+                ('^[ -~]{0,30}$', '^[ -~]{0,30}$'),
+                ('[[:alpha:]_]+\\z', '[a-zA-Z_]+\\Z'),
+                ('(?<key>\\w+)\\h*=', '(?P<key>\\w+)[ \\t]*='),
+                ("(?'key'x)", '(?P<key>x)'),
+                ('[]\\z]', '[]\\z]'),
+                ('a\\Z', 'a(?=\\n?\\Z)')):
+            self.assertEqual(expected, bios._translate_pcre(pcre_regex))
+
+    def _mock_bios_enumerations(self, mock_requests, string_variant='ok'):
+        # concurrent enumerations may be sent in any order, so the responses
+        # are matched by the resource URI of the request
+        def resource_matcher(resource_uri):
+            return lambda request: (
+                '>%s<' % resource_uri) in request.body.decode('utf-8')
+
+        for (resource_uri, variant) in (
+                (uris.DCIM_BIOSEnumeration, 'ok'),
+                (uris.DCIM_BIOSString, string_variant),
+                (uris.DCIM_BIOSInteger, 'ok')):
+            mock_requests.post(
+                'https://1.2.3.4:443/wsman',
+                text=test_utils.BIOSEnumerations[resource_uri][variant],
+                additional_matcher=resource_matcher(resource_uri))
+
+    @requests_mock.Mocker()
+    def test_list_bios_settings_concurrently(self, mock_requests):
+        self._mock_bios_enumerations(mock_requests)
+
+        bios_settings = self.drac_client.list_bios_settings(concurrent=True)
+
+        self.assertEqual(103, len(bios_settings))
+        self.assertEqual(3, mock_requests.call_count)
+        self.assertIn('MemTest', bios_settings)
+        self.assertIn('SystemModelName', bios_settings)
+        self.assertIn('Proc1NumCores', bios_settings)
+
+    @requests_mock.Mocker()
+    def test_list_bios_settings_concurrently_with_colliding_attrs(
+            self, mock_requests):
+        self._mock_bios_enumerations(mock_requests,
+                                     string_variant='colliding')
+
+        self.assertRaises(exceptions.DRACOperationFailed,
+                          self.drac_client.list_bios_settings,
+                          concurrent=True)
+
     @requests_mock.Mocker()
     def test_list_bios_settings_with_colliding_attrs(self, mock_requests):
         mock_requests.post('https://1.2.3.4:443/wsman', [
@@ -285,7 +410,86 @@ class ClientBIOSConfigurationTestCase(base.BaseTest):
         self.assertEqual({'commit_required': True}, result)
         mock_invoke.assert_called_once_with(
             mock.ANY, uris.DCIM_BIOSService, 'SetAttributes',
-            expected_selectors, expected_properties)
+            expected_selectors, expected_properties, idempotent=True)
+
+    @requests_mock.Mocker()
+    def test_set_bios_settings_with_current_settings(self, mock_requests):
+        self._mock_bios_enumerations(mock_requests)
+        current_settings = self.drac_client.list_bios_settings()
+        mock_requests.reset_mock()
+        mock_requests.post('https://1.2.3.4:443/wsman',
+                           text=test_utils.BIOSInvocations[
+                               uris.DCIM_BIOSService]['SetAttributes']['ok'])
+
+        result = self.drac_client.set_bios_settings(
+            {'ProcVirtualization': 'Disabled'},
+            current_settings=current_settings)
+
+        self.assertEqual({'commit_required': True}, result)
+        self.assertEqual(1, mock_requests.call_count)
+        self.assertIn(b'SetAttributes', mock_requests.last_request.body)
+
+    @requests_mock.Mocker()
+    def test_set_bios_settings_with_invalid_current_settings(
+            self, mock_requests):
+        self._mock_bios_enumerations(mock_requests)
+        current_settings = self.drac_client.list_bios_settings()
+        mock_requests.reset_mock()
+
+        self.assertRaises(exceptions.DRACOperationFailed,
+                          self.drac_client.set_bios_settings,
+                          {'MemTest': 'Maybe'},
+                          current_settings=current_settings)
+        self.assertEqual(0, mock_requests.call_count)
+
+    @requests_mock.Mocker()
+    def test_set_bios_settings_in_chunks(self, mock_requests):
+        self._mock_bios_enumerations(mock_requests)
+        current_settings = self.drac_client.list_bios_settings()
+        mock_requests.reset_mock()
+        mock_requests.post('https://1.2.3.4:443/wsman', [
+            {'text': test_utils.BIOSInvocations[
+                uris.DCIM_BIOSService]['SetAttributes']['ok']},
+            {'text': test_utils.BIOSInvocations[
+                uris.DCIM_BIOSService]['SetAttributes']['ok']}])
+
+        result = self.drac_client.set_bios_settings(
+            collections.OrderedDict([('ProcVirtualization', 'Disabled'),
+                                     ('LogicalProc', 'Disabled'),
+                                     ('NumLock', 'Off')]),
+            current_settings=current_settings, max_attributes=2)
+
+        self.assertEqual({'commit_required': True}, result)
+        self.assertEqual(2, mock_requests.call_count)
+        (first, second) = [request.body
+                           for request in mock_requests.request_history]
+        self.assertIn(b'>ProcVirtualization<', first)
+        self.assertIn(b'>LogicalProc<', first)
+        self.assertNotIn(b'>NumLock<', first)
+        self.assertIn(b'>NumLock<', second)
+        self.assertNotIn(b'>LogicalProc<', second)
+
+    @mock.patch.object(dracclient.client.WSManClient, 'invoke',
+                       spec_set=True, autospec=True)
+    def test_set_bios_settings_in_chunks_by_bytes(self, mock_invoke):
+        current_settings = dict(
+            (name, bios.BIOSEnumerableAttribute(
+                name, 'Enabled', None, False, ['Enabled', 'Disabled']))
+            for name in ('ProcVirtualization', 'LogicalProc', 'NumLock'))
+        mock_invoke.return_value = lxml.etree.fromstring(
+            test_utils.BIOSInvocations[uris.DCIM_BIOSService][
+                'SetAttributes']['ok'])
+
+        result = self.drac_client.set_bios_settings(
+            dict.fromkeys(current_settings, 'Disabled'),
+            current_settings=current_settings, max_attributes=None,
+            max_bytes=bios._attribute_size('ProcVirtualization', 'Disabled'))
+
+        self.assertEqual({'commit_required': True}, result)
+        self.assertEqual(
+            [['LogicalProc'], ['NumLock'], ['ProcVirtualization']],
+            sorted(call[1]['properties']['AttributeName']
+                   for call in mock_invoke.call_args_list))
 
     @requests_mock.Mocker()
     def test_set_bios_settings_error(self, mock_requests):
@@ -413,21 +617,117 @@ class ClientJobManagementTestCase(base.BaseTest):
 
         self.assertEqual(6, len(jobs))
 
-    @mock.patch.object(dracclient.client.WSManClient, 'enumerate',
+    @requests_mock.Mocker()
+    def test_get_jobs(self, mock_requests):
+        mock_requests.post(
+            'https://1.2.3.4:443/wsman',
+            text=test_utils.JobEnumerations[uris.DCIM_LifecycleJob]['ok'])
+
+        jobs = self.drac_client.get_jobs(['JID_001436912645',
+                                          'JID_001436981582', 'JID_42'])
+
+        self.assertEqual(1, mock_requests.call_count)
+        self.assertIn('InstanceID="JID_001436912645" or '
+                      'InstanceID="JID_001436981582" or '
+                      'InstanceID="JID_42"',
+                      mock_requests.last_request.text)
+        self.assertEqual(['JID_001436912645', 'JID_001436981582', 'JID_42'],
+                         sorted(jobs))
+        self.assertEqual('Completed', jobs['JID_001436912645'].state)
+        self.assertEqual('Running', jobs['JID_001436981582'].state)
+        self.assertIsNone(jobs['JID_42'])
+
+    @requests_mock.Mocker()
+    @mock.patch.object(dracclient.resources.job, 'MAX_JOBS_PER_QUERY', 2)
+    def test_get_jobs_in_batches(self, mock_requests):
+        mock_requests.post(
+            'https://1.2.3.4:443/wsman',
+            text=test_utils.JobEnumerations[uris.DCIM_LifecycleJob]['ok'])
+
+        jobs = self.drac_client.get_jobs(['JID_001436912645', 'JID_42',
+                                          'JID_001436981582'])
+
+        self.assertEqual(2, mock_requests.call_count)
+        self.assertEqual('Running', jobs['JID_001436981582'].state)
+
+    @requests_mock.Mocker()
+    @mock.patch.object(dracclient.resources.job.time, 'sleep',
+                       spec_set=True, autospec=True)
+    def test_wait_for_jobs(self, mock_requests, mock_sleep):
+        jobs_xml = test_utils.JobEnumerations[uris.DCIM_LifecycleJob]['ok']
+        mock_requests.post('https://1.2.3.4:443/wsman', [
+            {'text': jobs_xml},
+            {'text': jobs_xml.replace('>Running<', '>Completed<')}])
+
+        jobs = self.drac_client.wait_for_jobs(
+            ['JID_001436912645', 'JID_001436981582'])
+
+        self.assertEqual(['Completed', 'Completed'],
+                         [jobs[job_id].state for job_id in sorted(jobs)])
+        self.assertEqual(2, mock_requests.call_count)
+        self.assertEqual(1, mock_sleep.call_count)
+        self.assertIn('JID_001436912645',
+                      mock_requests.request_history[0].text)
+        self.assertNotIn('JID_001436912645',
+                         mock_requests.request_history[1].text)
+
+    @mock.patch.object(dracclient.resources.job.random, 'uniform',
+                       spec_set=True, autospec=True)
+    @mock.patch.object(dracclient.resources.job.time, 'sleep',
+                       spec_set=True, autospec=True)
+    @mock.patch.object(dracclient.resources.job.JobManagement, 'get_jobs',
+                       spec_set=True, autospec=True)
+    def test_wait_for_job_with_backoff(self, mock_get_jobs, mock_sleep,
+                                       mock_uniform):
+        running_job = dracclient.resources.job.Job(
+            id='JID_42', name=None, start_time=None, until_time=None,
+            message=None, state='Running', percent_complete='50')
+        finished_job = running_job._replace(state='Failed')
+        mock_get_jobs.side_effect = [{}, {'JID_42': running_job},
+                                     {'JID_42': running_job},
+                                     {'JID_42': running_job},
+                                     {'JID_42': finished_job}]
+        mock_uniform.side_effect = lambda low, high: high
+
+        job = self.drac_client.wait_for_job('JID_42', poll_interval=1,
+                                            max_poll_interval=4)
+
+        self.assertEqual(finished_job, job)
+        self.assertEqual([mock.call(1), mock.call(2), mock.call(4),
+                          mock.call(4)], mock_sleep.call_args_list)
+
+    @mock.patch.object(dracclient.wsman, '_monotonic', spec_set=True,
+                       autospec=True)
+    @mock.patch.object(dracclient.resources.job.time, 'sleep',
                        spec_set=True, autospec=True)
-    def test_list_jobs_only_unfinished(self, mock_enumerate):
+    @mock.patch.object(dracclient.resources.job.JobManagement, 'get_jobs',
+                       spec_set=True, autospec=True)
+    def test_wait_for_jobs_timeout(self, mock_get_jobs, mock_sleep,
+                                   mock_monotonic):
+        mock_get_jobs.return_value = {}
+        mock_monotonic.side_effect = [100, 105, 111]
+
+        self.assertRaises(exceptions.DRACTimeout,
+                          self.drac_client.wait_for_jobs, ['JID_42'],
+                          timeout=10, poll_interval=8)
+        self.assertEqual(2, mock_get_jobs.call_count)
+        self.assertEqual(1, mock_sleep.call_count)
+        self.assertLessEqual(mock_sleep.call_args[0][0], 5)
+
+    @mock.patch.object(dracclient.client.WSManClient, 'iter_enumerate',
+                       spec_set=True, autospec=True)
+    def test_list_jobs_only_unfinished(self, mock_iter_enumerate):
         expected_filter_query = ('select * from DCIM_LifecycleJob '
                                  'where Name != "CLEARALL" and '
                                  'JobStatus != "Reboot Completed" and '
                                  'JobStatus != "Completed" and '
                                  'JobStatus != "Completed with Errors" and '
                                  'JobStatus != "Failed"')
-        mock_enumerate.return_value = lxml.etree.fromstring(
-            test_utils.JobEnumerations[uris.DCIM_LifecycleJob]['ok'])
+        mock_iter_enumerate.return_value = iter([])
 
         self.drac_client.list_jobs(only_unfinished=True)
 
-        mock_enumerate.assert_called_once_with(
+        mock_iter_enumerate.assert_called_once_with(
             mock.ANY, uris.DCIM_LifecycleJob,
             filter_query=expected_filter_query)
 
@@ -575,6 +875,57 @@ class ClientJobManagementTestCase(base.BaseTest):
             cim_creation_class_name, cim_name, target)
 
 
+@requests_mock.Mocker()
+class JobQueueWatcherTestCase(base.BaseTest):
+
+    def setUp(self):
+        super(JobQueueWatcherTestCase, self).setUp()
+        self.drac_client = dracclient.client.DRACClient(
+            **test_utils.FAKE_ENDPOINT)
+        self.watcher = dracclient.resources.job.JobQueueWatcher(
+            self.drac_client)
+        self.jobs_xml = test_utils.JobEnumerations[
+            uris.DCIM_LifecycleJob]['ok']
+
+    def test_poll(self, mock_requests):
+        mock_requests.post('https://1.2.3.4:443/wsman', [
+            {'text': self.jobs_xml},
+            {'text': self.jobs_xml},
+            {'text': self.jobs_xml.replace('>Running<', '>Completed<')}])
+
+        self.assertEqual(6, len(self.watcher.poll()))
+        self.assertEqual([], self.watcher.poll())
+
+        changed = self.watcher.poll()
+
+        self.assertEqual(['JID_001436981582'],
+                         [drac_job.id for drac_job in changed])
+        self.assertEqual('Completed', changed[0].state)
+
+    @mock.patch.object(dracclient.wsman, '_monotonic', spec_set=True,
+                       autospec=True)
+    @mock.patch.object(dracclient.resources.job.time, 'sleep',
+                       spec_set=True, autospec=True)
+    def test_watch(self, mock_requests, mock_sleep, mock_monotonic):
+        mock_requests.post('https://1.2.3.4:443/wsman', [
+            {'text': self.jobs_xml},
+            {'text': self.jobs_xml.replace('>Running<', '>Failed<')}])
+        clock = {'now': 100}
+        mock_monotonic.side_effect = lambda: clock['now']
+
+        def sleep(seconds):
+            clock['now'] += seconds
+
+        mock_sleep.side_effect = sleep
+
+        jobs = list(self.watcher.watch(poll_interval=8, timeout=10))
+
+        self.assertEqual(7, len(jobs))
+        self.assertEqual('Failed', jobs[-1].state)
+        self.assertEqual([mock.call(8), mock.call(2)],
+                         mock_sleep.call_args_list)
+
+
 class ClientBIOSChangesTestCase(base.BaseTest):
 
     def setUp(self):
@@ -952,3 +1303,243 @@ class WSManClientTestCase(base.BaseTest):
         self.assertRaises(exceptions.DRACUnexpectedReturnValue, client.invoke,
                           'http://resource', 'Foo',
                           expected_return_value='4242')
+
+
+@requests_mock.Mocker()
+class ClientCacheTestCase(base.BaseTest):
+
+    def setUp(self):
+        super(ClientCacheTestCase, self).setUp()
+        ttls = dict(dracclient.cache.DEFAULT_TTLS,
+                    **dracclient.cache.CONFIGURATION_TTLS)
+        self.drac_client = dracclient.client.DRACClient(
+            cache=dracclient.cache.ResourceCache(ttls),
+            **test_utils.FAKE_ENDPOINT)
+
+    def test_not_cached_by_default(self, mock_requests):
+        mock_requests.post(
+            'https://1.2.3.4:443/wsman',
+            text=test_utils.LifecycleControllerEnumerations[
+                uris.DCIM_SystemView]['ok'])
+        drac_client = dracclient.client.DRACClient(**test_utils.FAKE_ENDPOINT)
+
+        drac_client.get_lifecycle_controller_version()
+        drac_client.get_lifecycle_controller_version()
+
+        self.assertEqual(2, mock_requests.call_count)
+
+    def test_configuration_not_cached_by_default(self, mock_requests):
+        mock_requests.post(
+            'https://1.2.3.4:443/wsman',
+            text=test_utils.RAIDEnumerations[uris.DCIM_VirtualDiskView]['ok'])
+        drac_client = dracclient.client.DRACClient(
+            cache=dracclient.cache.ResourceCache(), **test_utils.FAKE_ENDPOINT)
+
+        drac_client.list_virtual_disks()
+        drac_client.list_virtual_disks()
+
+        self.assertEqual(2, mock_requests.call_count)
+
+    def test_get_lifecycle_controller_version(self, mock_requests):
+        mock_requests.post(
+            'https://1.2.3.4:443/wsman',
+            text=test_utils.LifecycleControllerEnumerations[
+                uris.DCIM_SystemView]['ok'])
+
+        self.assertEqual((2, 1, 0),
+                         self.drac_client.get_lifecycle_controller_version())
+        self.assertEqual((2, 1, 0),
+                         self.drac_client.get_lifecycle_controller_version())
+        self.assertEqual(1, mock_requests.call_count)
+
+    def test_list_boot_devices_11g_reuses_version(self, mock_requests):
+        mock_requests.post('https://1.2.3.4:443/wsman', [
+            {'text': test_utils.LifecycleControllerEnumerations[
+                uris.DCIM_SystemView]['ok'].replace('2.1.0', '1.7.5')},
+            {'text': test_utils.BIOSEnumerations[
+                uris.DCIM_BootSourceSetting]['ok-11g']}])
+
+        self.assertEqual((1, 7, 5),
+                         self.drac_client.get_lifecycle_controller_version())
+        boot_devices = self.drac_client.list_boot_devices()
+
+        self.assertEqual(3, len(boot_devices['IPL']))
+        self.assertEqual(2, mock_requests.call_count)
+
+    def test_list_physical_disks(self, mock_requests):
+        mock_requests.post(
+            'https://1.2.3.4:443/wsman',
+            text=test_utils.RAIDEnumerations[uris.DCIM_PhysicalDiskView]['ok'])
+
+        physical_disks = self.drac_client.list_physical_disks()
+
+        self.assertEqual(physical_disks,
+                         self.drac_client.list_physical_disks())
+        self.assertEqual(1, mock_requests.call_count)
+
+    def test_invalidate_cache(self, mock_requests):
+        mock_requests.post(
+            'https://1.2.3.4:443/wsman',
+            text=test_utils.RAIDEnumerations[uris.DCIM_ControllerView]['ok'])
+
+        self.drac_client.list_raid_controllers()
+        self.drac_client.invalidate_cache([uris.DCIM_VirtualDiskView])
+        self.drac_client.list_raid_controllers()
+        self.assertEqual(1, mock_requests.call_count)
+
+        self.drac_client.invalidate_cache()
+        self.drac_client.list_raid_controllers()
+        self.assertEqual(2, mock_requests.call_count)
+
+    def test_create_virtual_disk_invalidates_cache(self, mock_requests):
+        mock_requests.post('https://1.2.3.4:443/wsman', [
+            {'text': test_utils.RAIDEnumerations[
+                uris.DCIM_VirtualDiskView]['ok']},
+            {'text': test_utils.RAIDInvocations[uris.DCIM_RAIDService][
+                'CreateVirtualDisk']['ok']},
+            {'text': test_utils.RAIDEnumerations[
+                uris.DCIM_VirtualDiskView]['ok']}])
+
+        self.drac_client.list_virtual_disks()
+        self.drac_client.create_virtual_disk(
+            raid_controller='controller', physical_disks=['disk1', 'disk2'],
+            raid_level='1', size_mb=42)
+        self.drac_client.list_virtual_disks()
+
+        self.assertEqual(3, mock_requests.call_count)
+
+
+class WSManClientCoalesceTestCase(base.BaseTest):
+
+    def setUp(self):
+        super(WSManClientCoalesceTestCase, self).setUp()
+        self.client = dracclient.client.WSManClient(coalesce=True,
+                                                    **test_utils.FAKE_ENDPOINT)
+        self.release = threading.Event()
+
+    def _run_concurrently(self, func, count=4):
+        results = []
+
+        def run():
+            try:
+                results.append(func())
+            except Exception as exc:
+                results.append(exc)
+
+        threads = [threading.Thread(target=run) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+
+        # gives the threads the time to join the running call
+        time.sleep(0.1)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+
+        return results
+
+    @mock.patch.object(dracclient.wsman.Client, 'enumerate', spec_set=True,
+                       autospec=True)
+    def test_enumerate(self, mock_enumerate):
+        doc = lxml.etree.fromstring('<result>yay!</result>')
+
+        def enumerate(*args, **kwargs):
+            self.release.wait(5)
+            return doc
+
+        mock_enumerate.side_effect = enumerate
+
+        results = self._run_concurrently(
+            lambda: self.client.enumerate('http://resource'))
+
+        self.assertEqual([doc] * 4, results)
+        self.assertEqual(1, mock_enumerate.call_count)
+
+    @mock.patch.object(dracclient.wsman.Client, 'enumerate', spec_set=True,
+                       autospec=True)
+    def test_enumerate_failure(self, mock_enumerate):
+        def enumerate(*args, **kwargs):
+            self.release.wait(5)
+            raise exceptions.WSManRequestFailure('boom')
+
+        mock_enumerate.side_effect = enumerate
+
+        results = self._run_concurrently(
+            lambda: self.client.enumerate('http://resource'))
+
+        self.assertEqual(4, len(results))
+        for result in results:
+            self.assertIsInstance(result, exceptions.WSManRequestFailure)
+        self.assertEqual(1, mock_enumerate.call_count)
+
+    @mock.patch.object(dracclient.wsman.Client, 'enumerate', spec_set=True,
+                       autospec=True)
+    def test_enumerate_interrupted(self, mock_enumerate):
+        class Interrupted(BaseException):
+            pass
+
+        def enumerate(*args, **kwargs):
+            self.release.wait(5)
+            raise Interrupted()
+
+        def interrupted_enumerate():
+            try:
+                self.client.enumerate('http://resource')
+            except Interrupted as exc:
+                return exc
+
+        mock_enumerate.side_effect = enumerate
+
+        results = self._run_concurrently(interrupted_enumerate)
+
+        self.assertEqual(4, len(results))
+        for result in results:
+            self.assertIsInstance(result, Interrupted)
+        self.assertEqual(1, mock_enumerate.call_count)
+
+    @mock.patch.object(dracclient.wsman.Client, 'enumerate', spec_set=True,
+                       autospec=True)
+    def test_enumerate_with_different_parameters(self, mock_enumerate):
+        doc = lxml.etree.fromstring('<result>yay!</result>')
+        max_elems = iter([10, 20, 10, 20])
+
+        def enumerate(*args, **kwargs):
+            self.release.wait(5)
+            return doc
+
+        mock_enumerate.side_effect = enumerate
+
+        results = self._run_concurrently(
+            lambda: self.client.enumerate('http://resource',
+                                          max_elems=next(max_elems)))
+
+        self.assertEqual([doc] * 4, results)
+        self.assertEqual(2, mock_enumerate.call_count)
+
+    @mock.patch.object(dracclient.wsman.Client, 'enumerate', spec_set=True,
+                       autospec=True)
+    def test_enumerate_sequential_calls(self, mock_enumerate):
+        mock_enumerate.return_value = lxml.etree.fromstring('<result/>')
+
+        self.client.enumerate('http://resource')
+        self.client.enumerate('http://resource')
+        self.client.enumerate('http://resource', filter_query='select *')
+
+        self.assertEqual(3, mock_enumerate.call_count)
+
+    @mock.patch.object(dracclient.wsman.Client, 'iter_enumerate',
+                       spec_set=True, autospec=True)
+    def test_iter_enumerate(self, mock_iter_enumerate):
+        items = [lxml.etree.Element('foo'), lxml.etree.Element('bar')]
+
+        def iter_enumerate(*args, **kwargs):
+            self.release.wait(5)
+            return iter(items)
+
+        mock_iter_enumerate.side_effect = iter_enumerate
+
+        results = self._run_concurrently(
+            lambda: list(self.client.iter_enumerate('http://resource')))
+
+        self.assertEqual([items] * 4, results)
+        self.assertEqual(1, mock_iter_enumerate.call_count)
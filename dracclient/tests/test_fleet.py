@@ -0,0 +1,353 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+import threading
+import time
+
+import lxml.etree
+import mock
+import requests_mock
+
+import dracclient.client
+from dracclient import exceptions
+import dracclient.fleet
+from dracclient import replay
+from dracclient.resources import bios
+from dracclient.resources import uris
+from dracclient.tests import base
+from dracclient.tests import utils as test_utils
+import dracclient.wsman
+
+
+class FleetClientTestCase(base.BaseTest):
+
+    def setUp(self):
+        super(FleetClientTestCase, self).setUp()
+        self.nodes = [('host%d' % i, 'admin', 's3cr3t') for i in range(5)]
+
+    def test_invalid_mode(self):
+        self.assertRaises(exceptions.InvalidParameterValue,
+                          dracclient.fleet.FleetClient, self.nodes,
+                          mode='foo')
+
+    def test_invalid_node(self):
+        self.assertRaises(exceptions.InvalidParameterValue,
+                          dracclient.fleet.FleetClient, [('host', 'admin')])
+
+    def test_invalid_method(self):
+        fleet = dracclient.fleet.FleetClient(self.nodes)
+
+        self.assertRaises(exceptions.InvalidParameterValue, fleet.run,
+                          'close_connections')
+        self.assertRaises(exceptions.InvalidParameterValue, fleet.run,
+                          '_get_client')
+
+    def test_dict_nodes(self):
+        fleet = dracclient.fleet.FleetClient(
+            [{'host': 'host0', 'username': 'admin', 'password': 's3cr3t',
+              'port': 8443}])
+
+        self.assertEqual(['host0'], fleet.hosts)
+        self.assertEqual(8443, fleet.nodes[0]['port'])
+
+    @requests_mock.Mocker()
+    def test_run(self, mock_requests):
+        mock_requests.post(
+            requests_mock.ANY,
+            text=test_utils.BIOSEnumerations[uris.DCIM_ComputerSystem]['ok'])
+
+        with dracclient.fleet.FleetClient(self.nodes) as fleet:
+            results = list(fleet.run('get_power_state'))
+
+        self.assertEqual(sorted(fleet.hosts),
+                         sorted(result.host for result in results))
+        for result in results:
+            self.assertEqual('POWER_ON', result.result)
+            self.assertIsNone(result.exception)
+
+    @requests_mock.Mocker()
+    def test_run_with_partial_failure(self, mock_requests):
+        mock_requests.post(
+            'https://host0:443/wsman',
+            text=test_utils.BIOSEnumerations[uris.DCIM_ComputerSystem]['ok'])
+        mock_requests.post('https://host1:443/wsman', status_code=500)
+
+        with dracclient.fleet.FleetClient(self.nodes[:2]) as fleet:
+            results = dict((result.host, result)
+                           for result in fleet.run('get_power_state'))
+
+        self.assertEqual('POWER_ON', results['host0'].result)
+        self.assertIsNone(results['host0'].exception)
+        self.assertIsNone(results['host1'].result)
+        self.assertIsInstance(results['host1'].exception,
+                              exceptions.WSManInvalidResponse)
+
+    @mock.patch.object(dracclient.client.DRACClient, 'get_power_state',
+                       autospec=True)
+    def test_run_with_bounded_concurrency(self, mock_get_power_state):
+        lock = threading.Lock()
+        counters = {'running': 0, 'max_running': 0}
+
+        def get_power_state(drac_client):
+            with lock:
+                counters['running'] += 1
+                counters['max_running'] = max(counters['max_running'],
+                                              counters['running'])
+            threading.Event().wait(0.01)
+            with lock:
+                counters['running'] -= 1
+            return 'POWER_ON'
+
+        mock_get_power_state.side_effect = get_power_state
+
+        with dracclient.fleet.FleetClient(self.nodes,
+                                          max_concurrency=2) as fleet:
+            results = list(fleet.run('get_power_state'))
+
+        self.assertEqual(5, len(results))
+        self.assertEqual(2, counters['max_running'])
+
+    @mock.patch.object(dracclient.client.DRACClient, 'get_power_state',
+                       autospec=True)
+    def test_run_with_backpressure(self, mock_get_power_state):
+        mock_get_power_state.return_value = 'POWER_ON'
+
+        with dracclient.fleet.FleetClient(self.nodes,
+                                          max_concurrency=2) as fleet:
+            results = fleet.run('get_power_state')
+            next(results)
+            started = mock_get_power_state.call_count
+            results.close()
+
+        self.assertLessEqual(started, 3)
+
+    @mock.patch.object(dracclient.client.DRACClient, 'get_power_state',
+                       autospec=True)
+    def test_run_with_timeout(self, mock_get_power_state):
+        release = threading.Event()
+
+        def get_power_state(drac_client):
+            if drac_client.client.host == 'host1':
+                release.wait(5)
+            return 'POWER_ON'
+
+        mock_get_power_state.side_effect = get_power_state
+
+        with dracclient.fleet.FleetClient(self.nodes[:2],
+                                          timeout=0.05) as fleet:
+            results = {}
+            for result in fleet.run('get_power_state'):
+                results[result.host] = result
+                if result.host == 'host1':
+                    release.set()
+
+        self.assertEqual('POWER_ON', results['host0'].result)
+        self.assertIsInstance(results['host1'].exception,
+                              exceptions.DRACTimeout)
+
+    def test_run_with_timeout_passed_to_client(self):
+        fleet = dracclient.fleet.FleetClient(self.nodes, timeout=30)
+
+        drac_client = fleet._get_client(fleet.nodes[0])
+
+        self.assertEqual(30, drac_client.client.timeout)
+
+    def test_clients_of_nodes_differing_in_any_parameter(self):
+        fleet = dracclient.fleet.FleetClient(
+            [('host0', 'admin', 's3cr3t'), ('host0', 'root', 'calvin'),
+             ('host0', 'admin', 's3cr3t', 443, '/wsman', 'http'),
+             ('host0', 'admin', 's3cr3t')])
+
+        drac_clients = [fleet._get_client(node) for node in fleet.nodes]
+
+        self.assertEqual(3, len(set(map(id, drac_clients))))
+        self.assertIs(drac_clients[0], drac_clients[3])
+        self.assertEqual('root', drac_clients[1].client.username)
+        self.assertEqual('http', drac_clients[2].client.protocol)
+
+    @mock.patch.object(dracclient.client, 'DRACClient', autospec=True)
+    def test_client_created_once_by_concurrent_workers(self,
+                                                       mock_drac_client):
+        def create_client(**kwargs):
+            # widens the window between the lookup and the insertion
+            time.sleep(0.05)
+            return mock.Mock()
+
+        mock_drac_client.side_effect = create_client
+        fleet = dracclient.fleet.FleetClient(self.nodes[:1])
+        drac_clients = []
+        threads = [threading.Thread(target=lambda: drac_clients.append(
+            fleet._get_client(fleet.nodes[0]))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(1, mock_drac_client.call_count)
+        self.assertEqual(1, len(set(map(id, drac_clients))))
+
+    def test_clients_of_nodes_with_unhashable_parameters(self):
+        observers = [dracclient.wsman.Observer()]
+        fleet = dracclient.fleet.FleetClient(
+            [{'host': 'host0', 'username': 'admin', 'password': 's3cr3t',
+              'observers': observers},
+             {'host': 'host0', 'username': 'admin', 'password': 's3cr3t',
+              'observers': observers}])
+
+        self.assertIs(fleet._get_client(fleet.nodes[0]),
+                      fleet._get_client(fleet.nodes[1]))
+
+    @mock.patch.dict(dracclient.wsman._host_limiters, clear=True)
+    def test_run_with_max_in_flight_per_host(self):
+        fleet = dracclient.fleet.FleetClient(self.nodes,
+                                             max_in_flight_per_host=2)
+
+        drac_client = fleet._get_client(fleet.nodes[0])
+
+        self.assertEqual(2, drac_client.client.limiter.max_in_flight)
+
+
+class BIOSPlannerTestCase(base.BaseTest):
+
+    def setUp(self):
+        super(BIOSPlannerTestCase, self).setUp()
+        self.profile = {'ProcVirtualization': 'Disabled',
+                        'MemTest': 'Disabled'}
+
+    def _mock_nodes(self, mock_requests, count):
+        responder = replay.Responder()
+        lock = threading.Lock()
+        in_flight = collections.Counter()
+        self.max_in_flight = 0
+
+        def respond(request, context):
+            with lock:
+                in_flight[request.hostname] += 1
+                self.max_in_flight = max(self.max_in_flight,
+                                         in_flight[request.hostname])
+            try:
+                context.status_code, content = responder.respond(
+                    request.body)
+                return content
+            finally:
+                with lock:
+                    in_flight[request.hostname] -= 1
+
+        mock_requests.post(requests_mock.ANY, content=respond)
+        return [('host%d' % i, 'admin', 's3cr3t') for i in range(count)]
+
+    @requests_mock.Mocker()
+    def test_plan_and_apply(self, mock_requests):
+        fleet = dracclient.fleet.FleetClient(
+            self._mock_nodes(mock_requests, 3), max_concurrency=2)
+        planner = dracclient.fleet.BIOSPlanner(fleet)
+        plan = planner.plan(self.profile)
+        planned_requests = mock_requests.call_count
+        results = planner.apply(plan)
+        applied_requests = mock_requests.call_count - planned_requests
+
+        self.assertEqual(3, len(plan.pending))
+        self.assertEqual([], plan.failed)
+        groups = plan.groups()
+        self.assertEqual(1, len(groups))
+        self.assertEqual({'ProcVirtualization': 'Disabled'}, groups[0][0])
+        self.assertEqual(fleet.nodes,
+                         [node_plan.node for node_plan in groups[0][1]])
+        self.assertEqual(fleet.nodes, [result.node for result in results])
+        for result in results:
+            self.assertIsNone(result.exception)
+            self.assertEqual('JID_442507917525', result.job_id)
+        # a SetAttributes and a CreateTargetedConfigJob per node
+        self.assertEqual(6, applied_requests)
+        self.assertLessEqual(self.max_in_flight, 1)
+
+    @requests_mock.Mocker()
+    def test_plan_with_invalid_profile(self, mock_requests):
+        planner = dracclient.fleet.BIOSPlanner(
+            dracclient.fleet.FleetClient(self._mock_nodes(mock_requests, 2)))
+        plan = planner.plan({'ProcVirtualization': 'foo'})
+        planned_requests = mock_requests.call_count
+        results = planner.apply(plan)
+
+        self.assertEqual(planned_requests, mock_requests.call_count)
+        self.assertEqual([], results)
+        self.assertEqual(2, len(plan.failed))
+        for node_plan in plan.failed:
+            self.assertIsInstance(node_plan.exception,
+                                  exceptions.DRACOperationFailed)
+
+    @mock.patch.object(dracclient.client.DRACClient,
+                       'commit_pending_bios_changes', autospec=True)
+    @mock.patch.object(dracclient.client.WSManClient, 'invoke',
+                       autospec=True)
+    @mock.patch.object(dracclient.client.DRACClient, 'list_bios_settings',
+                       autospec=True)
+    def test_plan_groups(self, mock_list_bios_settings, mock_invoke,
+                         mock_commit_pending_bios_changes):
+        settings = {
+            'ProcVirtualization': bios.BIOSEnumerableAttribute(
+                'ProcVirtualization', 'Enabled', None, False,
+                ['Enabled', 'Disabled']),
+            'MemTest': bios.BIOSEnumerableAttribute(
+                'MemTest', 'Enabled', None, False, ['Enabled', 'Disabled'])}
+        up_to_date = dict(
+            (name, bios.BIOSEnumerableAttribute(
+                name, 'Disabled', None, False, ['Enabled', 'Disabled']))
+            for name in settings)
+        node_settings = {
+            'host0': settings, 'host1': up_to_date, 'host2': settings,
+            'host3': dict(settings, MemTest=up_to_date['MemTest'])}
+
+        def list_bios_settings(drac_client):
+            if drac_client.client.host not in node_settings:
+                raise exceptions.WSManRequestFailure()
+            return node_settings[drac_client.client.host]
+
+        mock_list_bios_settings.side_effect = list_bios_settings
+        mock_invoke.return_value = lxml.etree.fromstring(
+            test_utils.BIOSInvocations[uris.DCIM_BIOSService][
+                'SetAttributes']['ok'])
+        mock_commit_pending_bios_changes.return_value = 'JID_1'
+        fleet = dracclient.fleet.FleetClient(
+            [('host%d' % i, 'admin', 's3cr3t') for i in range(5)])
+
+        plan = dracclient.fleet.BIOSPlanner(fleet).plan(self.profile)
+
+        self.assertEqual(['host1'], [node_plan.node['host']
+                                     for node_plan in plan.up_to_date])
+        self.assertEqual(['host4'], [node_plan.node['host']
+                                     for node_plan in plan.failed])
+        groups = plan.groups()
+        self.assertEqual(
+            [({'ProcVirtualization': 'Disabled', 'MemTest': 'Disabled'},
+              ['host0', 'host2']),
+             ({'ProcVirtualization': 'Disabled'}, ['host3'])],
+            [(changes, [node_plan.node['host'] for node_plan in node_plans])
+             for (changes, node_plans) in groups])
+
+        results = dracclient.fleet.BIOSPlanner(fleet).apply(plan,
+                                                            reboot=True)
+
+        self.assertEqual(['host0', 'host2', 'host3'],
+                         [result.node['host'] for result in results])
+        self.assertEqual(['JID_1'] * 3,
+                         [result.job_id for result in results])
+        self.assertEqual(3, mock_invoke.call_count)
+        properties = [call[1]['properties'] for call
+                      in mock_invoke.call_args_list]
+        # the nodes of a group share the invocations built for it
+        self.assertEqual(2, len(set(map(id, properties))))
+        self.assertIn(['ProcVirtualization'],
+                      [props['AttributeName'] for props in properties])
+        mock_commit_pending_bios_changes.assert_called_with(mock.ANY, True)
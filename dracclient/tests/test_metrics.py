@@ -0,0 +1,80 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import requests_mock
+
+import dracclient.client
+from dracclient import exceptions
+from dracclient import metrics
+from dracclient.resources import uris
+from dracclient.tests import base
+from dracclient.tests import utils as test_utils
+
+
+class HistogramTestCase(base.BaseTest):
+
+    def test_empty(self):
+        histogram = metrics.Histogram(1)
+
+        self.assertEqual(
+            metrics.HistogramSummary(count=0, mean=None, min=None, max=None,
+                                     p50=None, p90=None, p99=None),
+            histogram.summary())
+
+    def test_percentile(self):
+        histogram = metrics.Histogram(1, buckets=4)
+        for value in [1] * 50 + [3] * 40 + [100] * 10:
+            histogram.add(value)
+
+        self.assertEqual(1, histogram.percentile(50))
+        self.assertEqual(4, histogram.percentile(90))
+        # beyond the last bucket
+        self.assertEqual(100, histogram.percentile(99))
+        self.assertEqual([50, 0, 40, 0, 10], histogram.counts)
+
+        summary = histogram.summary()
+        self.assertEqual(100, summary.count)
+        self.assertEqual(11.7, summary.mean)
+        self.assertEqual(1, summary.min)
+        self.assertEqual(100, summary.max)
+
+
+@requests_mock.Mocker()
+class HistogramCollectorTestCase(base.BaseTest):
+
+    def setUp(self):
+        super(HistogramCollectorTestCase, self).setUp()
+        self.collector = metrics.HistogramCollector()
+        self.drac_client = dracclient.client.DRACClient(
+            observers=[self.collector], **test_utils.FAKE_ENDPOINT)
+
+    def test_collect(self, mock_requests):
+        mock_requests.post(
+            'https://1.2.3.4:443/wsman',
+            [{'text': test_utils.JobEnumerations[
+                uris.DCIM_LifecycleJob]['ok']},
+             {'status_code': 500}])
+
+        self.drac_client.list_jobs()
+        self.assertRaises(exceptions.WSManInvalidResponse,
+                          self.drac_client.list_jobs)
+
+        summary = self.collector.summary()
+        self.assertEqual(1, summary[('Enumerate', 'response_size')].count)
+        self.assertEqual(
+            len(test_utils.JobEnumerations[uris.DCIM_LifecycleJob]['ok']),
+            summary[('Enumerate', 'response_size')].max)
+        self.assertEqual(1, summary[('Enumerate', 'parse_time')].count)
+        self.assertEqual(1, summary[('Enumerate', 'pages')].max)
+        self.assertEqual(2, self.collector.requests['Enumerate'])
+        self.assertEqual(1, self.collector.errors['Enumerate'])
@@ -0,0 +1,74 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import lxml.etree
+import mock
+
+from dracclient import replay
+from dracclient.resources import uris
+from dracclient.tests import base
+import dracclient.wsman
+
+
+class ResponderTestCase(base.BaseTest):
+
+    def setUp(self):
+        super(ResponderTestCase, self).setUp()
+        self.responder = replay.Responder(page_size=2)
+
+    def _request(self, payload_cls, *args):
+        payload = payload_cls('http://1.2.3.4/wsman', *args)
+        status, content = self.responder.respond(payload.build())
+        return status, lxml.etree.fromstring(content)
+
+    def test_enumerate_in_pages(self):
+        status, resp_xml = self._request(dracclient.wsman._EnumeratePayload,
+                                         uris.DCIM_LifecycleJob)
+
+        self.assertEqual(200, status)
+        self.assertEqual(2, len(dracclient.wsman._enum_items(resp_xml)))
+        self.assertEqual('page-2', dracclient.wsman._enum_context(resp_xml))
+
+        status, resp_xml = self._request(dracclient.wsman._PullPayload,
+                                         uris.DCIM_LifecycleJob, 'page-4')
+
+        self.assertEqual(200, status)
+        self.assertEqual(2, len(dracclient.wsman._enum_items(resp_xml)))
+        self.assertIsNone(dracclient.wsman._enum_context(resp_xml))
+
+    @mock.patch.object(replay, 'MAX_CACHED_PAGES', 2)
+    def test_pages_cache_is_bounded(self):
+        for max_elems in (1, 2, 3):
+            status, resp_xml = self._request(
+                dracclient.wsman._EnumeratePayload, uris.DCIM_LifecycleJob,
+                True, max_elems)
+
+            self.assertEqual(200, status)
+            self.assertEqual(min(max_elems, 2),
+                             len(dracclient.wsman._enum_items(resp_xml)))
+
+        self.assertEqual(2, len(self.responder._pages))
+
+    def test_invoke(self):
+        status, resp_xml = self._request(
+            dracclient.wsman._InvokePayload, uris.DCIM_BIOSService,
+            'SetAttributes', {}, {})
+
+        self.assertEqual(200, status)
+
+    def test_unknown_action(self):
+        status, _ = self._request(
+            dracclient.wsman._InvokePayload, uris.DCIM_BIOSService,
+            'Foo', {}, {})
+
+        self.assertEqual(400, status)
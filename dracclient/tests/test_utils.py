@@ -0,0 +1,75 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+
+import lxml.etree
+
+from dracclient.tests import base
+from dracclient import utils
+
+RESOURCE_XML = """
+<n1:Foo xmlns:n1="http://FooResource"
+        xmlns:n2="http://BarResource"
+        xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+  <n2:Name>ignored</n2:Name>
+  <!-- comment -->
+  <n1:Name> foo </n1:Name>
+  <n1:Size>42</n1:Size>
+  <n1:Pending xsi:nil="true"/>
+  <n1:Nested>
+    <n1:Deep>bar</n1:Deep>
+  </n1:Nested>
+  <n1:Name>duplicate</n1:Name>
+</n1:Foo>
+"""
+
+Foo = collections.namedtuple('Foo', ['name', 'size', 'pending'])
+
+
+class UtilsTestCase(base.BaseTest):
+
+    def setUp(self):
+        super(UtilsTestCase, self).setUp()
+        self.doc = lxml.etree.fromstring(RESOURCE_XML)
+
+    def test_get_wsman_resource_attrs(self):
+        attrs = utils.get_wsman_resource_attrs(
+            self.doc, 'http://FooResource', ['Name', 'Size', 'Pending'],
+            nullable_attrs=['Pending'])
+
+        self.assertEqual({'Name': 'foo', 'Size': '42', 'Pending': None},
+                         attrs)
+
+    def test_get_wsman_resource_attrs_matches_single_lookup(self):
+        for attr_name in ('Name', 'Size', 'Deep'):
+            self.assertEqual(
+                utils.get_wsman_resource_attr(self.doc, 'http://FooResource',
+                                              attr_name),
+                utils.get_wsman_resource_attrs(
+                    self.doc, 'http://FooResource', [attr_name])[attr_name])
+
+    def test_get_wsman_resource_attrs_missing(self):
+        self.assertRaises(AttributeError, utils.get_wsman_resource_attrs,
+                          self.doc, 'http://FooResource', ['Name', 'Missing'])
+
+    def test_field_map(self):
+        field_map = utils.WSManFieldMap(
+            'http://FooResource', Foo,
+            [('name', 'Name'),
+             ('size', 'Size', int),
+             ('pending', 'Pending')],
+            nullable_attrs=['Pending'])
+
+        self.assertEqual(Foo(name='foo', size=42, pending=None),
+                         field_map.parse(self.doc))
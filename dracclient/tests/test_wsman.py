@@ -12,14 +12,18 @@
 #    under the License.
 
 import collections
+import threading
+import time
 import uuid
 
 import lxml.etree
 import lxml.objectify
 import mock
+import requests.exceptions
 import requests_mock
 
 from dracclient import exceptions
+from dracclient.resources import uris
 from dracclient.tests import base
 from dracclient.tests import utils as test_utils
 import dracclient.wsman
@@ -89,6 +93,196 @@ class ClientTestCase(base.BaseTest):
         mock_pull.assert_called_once_with(self.client, 'FooResource',
                                           'enum-context-uuid', 42)
 
+    @requests_mock.Mocker()
+    def test_iter_enumerate(self, mock_requests):
+        mock_requests.post(
+            'https://1.2.3.4:443/wsman',
+            [{'text': test_utils.WSManEnumerations['context'][0]},
+             {'text': test_utils.WSManEnumerations['context'][1]},
+             {'text': test_utils.WSManEnumerations['context'][2]},
+             {'text': test_utils.WSManEnumerations['context'][3]}])
+
+        items = self.client.iter_enumerate('FooResource')
+
+        self.assertEqual(0, mock_requests.call_count)
+        self.assertEqual('{http://FooResource}FooResource', next(items).tag)
+        # the next page is only pulled when the previous one is consumed
+        self.assertEqual(2, mock_requests.call_count)
+        self.assertEqual(['{http://FooResource}FooResource',
+                          '{http://FooResource}FooResource',
+                          '{http://BarResource}BazResource'],
+                         [item.tag for item in items])
+        self.assertEqual(4, mock_requests.call_count)
+
+    @requests_mock.Mocker()
+    def test_iter_enumerate_with_optimized_response(self, mock_requests):
+        mock_requests.post(
+            'https://1.2.3.4:443/wsman',
+            text=test_utils.JobEnumerations[uris.DCIM_LifecycleJob]['ok'])
+
+        items = list(self.client.iter_enumerate(uris.DCIM_LifecycleJob,
+                                                max_elems=42))
+
+        self.assertEqual(6, len(items))
+        payload = lxml.etree.fromstring(mock_requests.last_request.body)
+        self.assertEqual('42', payload.find(
+            './/{%s}MaxElements' % dracclient.wsman.NS_WSMAN).text)
+
+    @requests_mock.Mocker()
+    def test_enumerate_with_prefetch(self, mock_requests):
+        mock_requests.post(
+            'https://1.2.3.4:443/wsman',
+            [{'text': test_utils.WSManEnumerations['context'][0]},
+             {'text': test_utils.WSManEnumerations['context'][1]},
+             {'text': test_utils.WSManEnumerations['context'][2]},
+             {'text': test_utils.WSManEnumerations['context'][3]}])
+
+        resp_xml = self.client.enumerate('FooResource', prefetch=True)
+
+        self.assertEqual(4, mock_requests.call_count)
+        self.assertEqual(
+            3, len(resp_xml.findall('.//{http://FooResource}FooResource')))
+        self.assertEqual(
+            1, len(resp_xml.findall('.//{http://BarResource}BazResource')))
+
+    @requests_mock.Mocker()
+    def test_iter_enumerate_with_prefetch(self, mock_requests):
+        mock_requests.post(
+            'https://1.2.3.4:443/wsman',
+            [{'text': test_utils.WSManEnumerations['context'][0]},
+             {'text': test_utils.WSManEnumerations['context'][1]},
+             {'text': test_utils.WSManEnumerations['context'][2]},
+             {'text': test_utils.WSManEnumerations['context'][3]}])
+
+        items = self.client.iter_enumerate('FooResource', prefetch=True)
+        next(items)
+        # the page following the one being consumed is already requested
+        self.client._prefetch_executor.shutdown(wait=True)
+
+        self.assertEqual(3, mock_requests.call_count)
+
+    @requests_mock.Mocker()
+    def test_iter_enumerate_with_prefetch_closed_early(self, mock_requests):
+        started = threading.Event()
+        finished = threading.Event()
+
+        def slow_pull(request, context):
+            started.set()
+            time.sleep(0.05)
+            finished.set()
+            return test_utils.WSManEnumerations['context'][2]
+
+        mock_requests.post(
+            'https://1.2.3.4:443/wsman',
+            [{'text': test_utils.WSManEnumerations['context'][0]},
+             {'text': test_utils.WSManEnumerations['context'][1]},
+             {'text': slow_pull}])
+
+        items = self.client.iter_enumerate('FooResource', prefetch=True)
+        next(items)
+        next(items)
+        started.wait()
+        items.close()
+
+        # the running pull is waited for instead of being left behind
+        self.assertTrue(finished.is_set())
+
+    @requests_mock.Mocker()
+    def test_iter_enumerate_with_max_page_size(self, mock_requests):
+        mock_requests.post(
+            'https://1.2.3.4:443/wsman',
+            [{'text': test_utils.WSManEnumerations['context'][0]},
+             {'text': test_utils.WSManEnumerations['context'][1]},
+             {'text': test_utils.WSManEnumerations['context'][2]},
+             {'text': test_utils.WSManEnumerations['context'][3]}])
+        page_size = len(test_utils.WSManEnumerations['context'][1])
+
+        items = list(self.client.iter_enumerate(
+            'FooResource', max_elems=42, max_page_size=page_size * 3))
+
+        self.assertEqual(4, len(items))
+        max_elems = [
+            lxml.etree.fromstring(request.body).find(
+                './/{%s}MaxElements' % dracclient.wsman.NS_WSMAN).text
+            for request in mock_requests.request_history[1:]]
+        # the enumeration response has no items to learn from, then the
+        # page size is divided by the size per item of the last page
+        self.assertEqual(['42', '3', '5'], max_elems)
+
+    @requests_mock.Mocker()
+    @mock.patch.object(dracclient.wsman, 'STREAM_CHUNK_SIZE', 7)
+    def test_iter_enumerate_with_stream(self, mock_requests):
+        mock_requests.post(
+            'https://1.2.3.4:443/wsman',
+            [{'text': test_utils.WSManEnumerations['context'][0]},
+             {'text': test_utils.WSManEnumerations['context'][1]},
+             {'text': test_utils.WSManEnumerations['context'][2]},
+             {'text': test_utils.WSManEnumerations['context'][3]}])
+
+        items = list(self.client.iter_enumerate('FooResource', stream=True))
+
+        self.assertEqual(['{http://FooResource}FooResource',
+                          '{http://FooResource}FooResource',
+                          '{http://FooResource}FooResource',
+                          '{http://BarResource}BazResource'],
+                         [item.tag for item in items])
+        # the items are detached from the response, but kept intact
+        self.assertIsNone(items[0].getparent())
+        self.assertEqual(1, len(items[0]))
+        self.assertEqual(4, mock_requests.call_count)
+        payload = lxml.etree.fromstring(mock_requests.last_request.body)
+        self.assertEqual('enum-context-uuid', payload.find(
+            './/{%s}EnumerationContext' % dracclient.wsman.NS_WSMAN_ENUM).text)
+
+    @requests_mock.Mocker()
+    def test_iter_enumerate_with_stream_and_optimized_response(
+            self, mock_requests):
+        mock_requests.post(
+            'https://1.2.3.4:443/wsman',
+            text=test_utils.JobEnumerations[uris.DCIM_LifecycleJob]['ok'])
+
+        items = list(self.client.iter_enumerate(uris.DCIM_LifecycleJob,
+                                                stream=True))
+
+        self.assertEqual(6, len(items))
+        self.assertEqual(1, mock_requests.call_count)
+
+    @requests_mock.Mocker()
+    def test_iter_enumerate_with_stream_and_max_page_size(self,
+                                                          mock_requests):
+        mock_requests.post(
+            'https://1.2.3.4:443/wsman',
+            [{'text': test_utils.WSManEnumerations['context'][0]},
+             {'text': test_utils.WSManEnumerations['context'][1]},
+             {'text': test_utils.WSManEnumerations['context'][2]},
+             {'text': test_utils.WSManEnumerations['context'][3]}])
+        page_size = len(test_utils.WSManEnumerations['context'][1])
+
+        list(self.client.iter_enumerate('FooResource', max_elems=42,
+                                        max_page_size=page_size * 3,
+                                        stream=True))
+
+        max_elems = [
+            lxml.etree.fromstring(request.body).find(
+                './/{%s}MaxElements' % dracclient.wsman.NS_WSMAN).text
+            for request in mock_requests.request_history[1:]]
+        self.assertEqual(['42', '3', '5'], max_elems)
+
+    def test_iter_enumerate_with_stream_and_prefetch(self):
+        self.assertRaises(exceptions.InvalidParameterValue,
+                          self.client.iter_enumerate, 'FooResource',
+                          stream=True, prefetch=True)
+
+    @requests_mock.Mocker()
+    def test_iter_enumerate_with_stream_and_invalid_status_code(
+            self, mock_requests):
+        mock_requests.post('https://1.2.3.4:443/wsman', status_code=500,
+                           reason='dumb request')
+
+        items = self.client.iter_enumerate('FooResource', stream=True)
+
+        self.assertRaises(exceptions.WSManInvalidResponse, list, items)
+
     @requests_mock.Mocker()
     def test_pull(self, mock_requests):
         expected_resp = '<result>yay!</result>'
@@ -108,6 +302,429 @@ class ClientTestCase(base.BaseTest):
 
         self.assertEqual('yay!', resp.text)
 
+    @requests_mock.Mocker()
+    def test_connection_reuse(self, mock_requests):
+        mock_requests.post('https://1.2.3.4:443/wsman',
+                           text='<result>yay!</result>')
+
+        self.client.enumerate('resource', auto_pull=False)
+        session = self.client._session
+        self.client.enumerate('resource', auto_pull=False)
+
+        self.assertIsNotNone(session)
+        self.assertIs(session, self.client._session)
+        self.assertEqual(2, mock_requests.call_count)
+        self.assertEqual('Basic YWRtaW46czNjcjN0',
+                         mock_requests.last_request.headers['Authorization'])
+
+    @requests_mock.Mocker()
+    def test_session_recycled_after_max_requests(self, mock_requests):
+        mock_requests.post('https://1.2.3.4:443/wsman',
+                           text='<result>yay!</result>')
+        self.client.max_requests_per_connection = 2
+
+        self.client.enumerate('resource', auto_pull=False)
+        session = self.client._session
+        self.client.enumerate('resource', auto_pull=False)
+        self.assertIs(session, self.client._session)
+        self.client.enumerate('resource', auto_pull=False)
+
+        self.assertIsNot(session, self.client._session)
+
+    @requests_mock.Mocker()
+    @mock.patch.object(dracclient.wsman, '_monotonic', autospec=True)
+    def test_session_recycled_after_idle_timeout(self, mock_requests,
+                                                 mock_monotonic):
+        mock_requests.post('https://1.2.3.4:443/wsman',
+                           text='<result>yay!</result>')
+        self.client.idle_timeout = 30
+        mock_monotonic.return_value = 100
+
+        self.client.enumerate('resource', auto_pull=False)
+        session = self.client._session
+        mock_monotonic.return_value = 120
+        self.client.enumerate('resource', auto_pull=False)
+        self.assertIs(session, self.client._session)
+        mock_monotonic.return_value = 151
+        self.client.enumerate('resource', auto_pull=False)
+
+        self.assertIsNot(session, self.client._session)
+
+    @requests_mock.Mocker()
+    def test_close(self, mock_requests):
+        mock_requests.post('https://1.2.3.4:443/wsman',
+                           text='<result>yay!</result>')
+
+        with self.client as client:
+            client.enumerate('resource', auto_pull=False)
+            self.assertIsNotNone(client._session)
+
+        self.assertIsNone(self.client._session)
+
+
+class LogPolicyTestCase(base.BaseTest):
+
+    def test_format_redacts_secrets(self):
+        body = ('<s:Body><wsman:SelectorSet>'
+                '<wsman:Selector Name="InstanceID">JID_42</wsman:Selector>'
+                '</wsman:SelectorSet><n1:Password>s3cr3t</n1:Password>'
+                '<n1:Target>BIOS.Setup.1-1</n1:Target></s:Body>')
+
+        self.assertEqual(
+            '<s:Body><wsman:SelectorSet>'
+            '<wsman:Selector Name="InstanceID">***</wsman:Selector>'
+            '</wsman:SelectorSet><n1:Password>***</n1:Password>'
+            '<n1:Target>BIOS.Setup.1-1</n1:Target></s:Body>',
+            dracclient.wsman.LogPolicy().format(body))
+
+    def test_format_redacts_password_attributes(self):
+        body = (b'<n1:AttributeName>SetupPassword</n1:AttributeName>'
+                b'<n1:AttributeValue>s3cr3t</n1:AttributeValue>')
+
+        self.assertEqual(
+            '<n1:AttributeName>SetupPassword</n1:AttributeName>'
+            '<n1:AttributeValue>***</n1:AttributeValue>',
+            dracclient.wsman.LogPolicy().format(body))
+
+    def test_format_keeps_other_attributes(self):
+        body = ('<n1:AttributeName>ProcVirtualization</n1:AttributeName>'
+                '<n1:AttributeValue>Disabled</n1:AttributeValue>')
+
+        self.assertEqual(body, dracclient.wsman.LogPolicy().format(body))
+
+    def test_format_truncates(self):
+        policy = dracclient.wsman.LogPolicy(max_length=8, redact=False)
+
+        self.assertEqual('<result>... (13 characters truncated)',
+                         policy.format('<result>yay!</result>'))
+
+    @mock.patch.object(dracclient.wsman.LOG, 'isEnabledFor',
+                       return_value=True)
+    def test_sample(self, mock_is_enabled_for):
+        self.assertTrue(dracclient.wsman.LogPolicy().sample())
+        self.assertFalse(
+            dracclient.wsman.LogPolicy(sample_rate=0).sample())
+
+    @mock.patch.object(dracclient.wsman.LOG, 'isEnabledFor',
+                       return_value=False)
+    def test_sample_without_debug_logging(self, mock_is_enabled_for):
+        self.assertFalse(dracclient.wsman.LogPolicy().sample())
+
+    @requests_mock.Mocker()
+    @mock.patch.object(dracclient.wsman.LogPolicy, 'format', autospec=True)
+    @mock.patch.object(dracclient.wsman.LOG, 'isEnabledFor',
+                       return_value=False)
+    def test_bodies_not_formatted_without_debug_logging(
+            self, mock_requests, mock_is_enabled_for, mock_format):
+        mock_requests.post('https://1.2.3.4:443/wsman',
+                           text='<result>yay!</result>')
+        client = dracclient.wsman.Client(**test_utils.FAKE_ENDPOINT)
+
+        client.enumerate('resource', auto_pull=False)
+
+        self.assertFalse(mock_format.called)
+
+    @requests_mock.Mocker()
+    @mock.patch.object(dracclient.wsman.LOG, 'isEnabledFor',
+                       return_value=True)
+    @mock.patch.object(dracclient.wsman.LOG, 'debug')
+    def test_bodies_logged(self, mock_requests, mock_debug,
+                           mock_is_enabled_for):
+        mock_requests.post('https://1.2.3.4:443/wsman',
+                           text='<result>yay!</result>')
+        client = dracclient.wsman.Client(
+            log_policy=dracclient.wsman.LogPolicy(max_length=8),
+            **test_utils.FAKE_ENDPOINT)
+
+        client.enumerate('resource', auto_pull=False)
+
+        payloads = [call[0][1]['payload'] for call in mock_debug.call_args_list
+                    if 'payload' in call[0][1]]
+        self.assertEqual(2, len(payloads))
+        self.assertEqual('<result>... (13 characters truncated)',
+                         payloads[1])
+
+
+class RecordingObserver(dracclient.wsman.Observer):
+
+    def __init__(self):
+        self.requests = []
+        self.enumerations = []
+
+    def request_finished(self, stats):
+        self.requests.append(stats)
+
+    def enumeration_finished(self, resource_uri, pages):
+        self.enumerations.append((resource_uri, pages))
+
+
+@requests_mock.Mocker()
+class ObserverTestCase(base.BaseTest):
+
+    def setUp(self):
+        super(ObserverTestCase, self).setUp()
+        self.observer = RecordingObserver()
+        self.client = dracclient.wsman.Client(observers=[self.observer],
+                                              **test_utils.FAKE_ENDPOINT)
+        self.pages = test_utils.WSManEnumerations['context']
+
+    def _mock_pages(self, mock_requests):
+        mock_requests.post('https://1.2.3.4:443/wsman',
+                           [{'text': page} for page in self.pages])
+
+    def test_enumerate(self, mock_requests):
+        self._mock_pages(mock_requests)
+
+        self.client.enumerate('FooResource')
+
+        self.assertEqual(['Enumerate', 'Pull', 'Pull', 'Pull'],
+                         [stats.operation for stats in self.observer.requests])
+        self.assertEqual([len(page) for page in self.pages],
+                         [stats.response_size
+                          for stats in self.observer.requests])
+        for stats, request in zip(self.observer.requests,
+                                  mock_requests.request_history):
+            self.assertEqual('FooResource', stats.resource_uri)
+            self.assertIsNone(stats.method)
+            self.assertEqual(1, stats.attempts)
+            self.assertEqual(len(request.body), stats.request_size)
+            self.assertEqual(200, stats.status_code)
+            self.assertGreaterEqual(stats.parse_time, 0)
+            self.assertIsNone(stats.error)
+        self.assertEqual([('FooResource', 4)], self.observer.enumerations)
+
+    def test_iter_enumerate_with_stream(self, mock_requests):
+        self._mock_pages(mock_requests)
+
+        list(self.client.iter_enumerate('FooResource', stream=True))
+
+        self.assertEqual([len(page) for page in self.pages],
+                         [stats.response_size
+                          for stats in self.observer.requests])
+        self.assertEqual([('FooResource', 4)], self.observer.enumerations)
+
+    def test_invoke(self, mock_requests):
+        mock_requests.post('https://1.2.3.4:443/wsman',
+                           text='<result>yay!</result>')
+
+        self.client.invoke('http://resource', 'Foo', {}, {})
+
+        self.assertEqual(1, len(self.observer.requests))
+        self.assertEqual('Invoke', self.observer.requests[0].operation)
+        self.assertEqual('Foo', self.observer.requests[0].method)
+        self.assertEqual([], self.observer.enumerations)
+
+    def test_failed_request(self, mock_requests):
+        mock_requests.post('https://1.2.3.4:443/wsman', status_code=500)
+
+        self.assertRaises(exceptions.WSManInvalidResponse,
+                          self.client.enumerate, 'FooResource')
+
+        stats = self.observer.requests[0]
+        self.assertEqual(500, stats.status_code)
+        self.assertIsInstance(stats.error, exceptions.WSManInvalidResponse)
+        self.assertEqual([], self.observer.enumerations)
+
+    def test_failing_observer(self, mock_requests):
+        mock_requests.post('https://1.2.3.4:443/wsman',
+                           text='<result>yay!</result>')
+        observer = mock.Mock(spec=dracclient.wsman.Observer)
+        observer.request_finished.side_effect = ValueError
+        client = dracclient.wsman.Client(observers=[observer, self.observer],
+                                         **test_utils.FAKE_ENDPOINT)
+
+        resp = client.invoke('http://resource', 'Foo', {}, {})
+
+        self.assertEqual('yay!', resp.text)
+        self.assertEqual(1, len(self.observer.requests))
+
+
+@mock.patch.object(dracclient.wsman.time, 'sleep', spec_set=True,
+                   autospec=True)
+@requests_mock.Mocker()
+class RetryPolicyTestCase(base.BaseTest):
+
+    def _client(self, **kwargs):
+        return dracclient.wsman.Client(
+            retry_policy=dracclient.wsman.RetryPolicy(**kwargs),
+            **test_utils.FAKE_ENDPOINT)
+
+    def test_enumerate_retried(self, mock_sleep, mock_requests):
+        mock_requests.post('https://1.2.3.4:443/wsman', [
+            {'status_code': 503},
+            {'exc': requests.exceptions.ConnectionError},
+            {'text': '<result>yay!</result>'}])
+
+        resp = self._client().enumerate('resource', auto_pull=False)
+
+        self.assertEqual('yay!', resp.text)
+        self.assertEqual(3, mock_requests.call_count)
+        self.assertEqual(2, mock_sleep.call_count)
+        first_delay = mock_sleep.call_args_list[0][0][0]
+        second_delay = mock_sleep.call_args_list[1][0][0]
+        self.assertTrue(0.25 <= first_delay <= 0.5)
+        self.assertTrue(0.5 <= second_delay <= 1)
+
+    def test_pull_retried(self, mock_sleep, mock_requests):
+        mock_requests.post('https://1.2.3.4:443/wsman', [
+            {'status_code': 504},
+            {'text': '<result>yay!</result>'}])
+
+        resp = self._client().pull('resource', 'context')
+
+        self.assertEqual('yay!', resp.text)
+        self.assertEqual(2, mock_requests.call_count)
+
+    def test_not_retried_on_other_status_codes(self, mock_sleep,
+                                               mock_requests):
+        mock_requests.post('https://1.2.3.4:443/wsman', status_code=500)
+
+        self.assertRaises(exceptions.WSManInvalidResponse,
+                          self._client().enumerate, 'resource',
+                          auto_pull=False)
+        self.assertEqual(1, mock_requests.call_count)
+        self.assertFalse(mock_sleep.called)
+
+    def test_max_attempts(self, mock_sleep, mock_requests):
+        mock_requests.post('https://1.2.3.4:443/wsman',
+                           exc=requests.exceptions.ConnectionError)
+
+        self.assertRaises(exceptions.WSManRequestFailure,
+                          self._client(max_attempts=4).enumerate,
+                          'resource', auto_pull=False)
+        self.assertEqual(4, mock_requests.call_count)
+
+    def test_max_elapsed(self, mock_sleep, mock_requests):
+        mock_requests.post('https://1.2.3.4:443/wsman', status_code=503)
+
+        self.assertRaises(exceptions.WSManInvalidResponse,
+                          self._client(max_elapsed=0.1).enumerate,
+                          'resource', auto_pull=False)
+        self.assertEqual(1, mock_requests.call_count)
+
+    def test_budget(self, mock_sleep, mock_requests):
+        mock_requests.post('https://1.2.3.4:443/wsman', status_code=503)
+        client = self._client(budget=1, budget_ratio=0)
+
+        self.assertRaises(exceptions.WSManInvalidResponse, client.enumerate,
+                          'resource', auto_pull=False)
+        self.assertEqual(2, mock_requests.call_count)
+
+        self.assertRaises(exceptions.WSManInvalidResponse, client.enumerate,
+                          'resource', auto_pull=False)
+        self.assertEqual(3, mock_requests.call_count)
+
+    def test_invoke_not_retried(self, mock_sleep, mock_requests):
+        mock_requests.post('https://1.2.3.4:443/wsman', [
+            {'status_code': 503},
+            {'text': '<result>yay!</result>'}])
+
+        self.assertRaises(exceptions.WSManInvalidResponse,
+                          self._client().invoke, 'http://resource', 'Foo',
+                          {}, {})
+        self.assertEqual(1, mock_requests.call_count)
+
+    def test_idempotent_invoke_retried(self, mock_sleep, mock_requests):
+        mock_requests.post('https://1.2.3.4:443/wsman', [
+            {'status_code': 503},
+            {'text': '<result>yay!</result>'}])
+
+        resp = self._client().invoke('http://resource', 'Foo', {}, {},
+                                     idempotent=True)
+
+        self.assertEqual('yay!', resp.text)
+        self.assertEqual(2, mock_requests.call_count)
+
+
+@mock.patch.dict(dracclient.wsman._host_limiters, clear=True)
+class HostLimiterTestCase(base.BaseTest):
+
+    def test_shared_by_clients_of_host(self):
+        client1 = dracclient.wsman.Client(max_in_flight=2,
+                                          **test_utils.FAKE_ENDPOINT)
+        client2 = dracclient.wsman.Client(max_in_flight=4,
+                                          **test_utils.FAKE_ENDPOINT)
+        client3 = dracclient.wsman.Client('1.2.3.5', 'admin', 's3cr3t',
+                                          max_in_flight=2)
+
+        self.assertIs(client1.limiter, client2.limiter)
+        self.assertEqual(2, client2.limiter.max_in_flight)
+        self.assertIsNot(client1.limiter, client3.limiter)
+
+    def test_no_limit_by_default(self):
+        client = dracclient.wsman.Client(**test_utils.FAKE_ENDPOINT)
+
+        self.assertIsNone(client.limiter)
+
+    def test_invalid_max_in_flight(self):
+        self.assertRaises(exceptions.InvalidParameterValue,
+                          dracclient.wsman.HostLimiter, 0)
+
+    def test_fifo_order(self):
+        limiter = dracclient.wsman.HostLimiter(1)
+        order = []
+        limiter.acquire()
+
+        threads = []
+        for i in range(3):
+            def run(i=i):
+                with limiter:
+                    order.append(i)
+
+            thread = threading.Thread(target=run)
+            thread.start()
+            threads.append(thread)
+            # waits until the thread is queued
+            while limiter.stats().waiting < i + 1:
+                time.sleep(0.001)
+
+        limiter.release()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([0, 1, 2], order)
+        stats = limiter.stats()
+        self.assertEqual(0, stats.in_flight)
+        self.assertEqual(0, stats.waiting)
+        self.assertEqual(4, stats.requests)
+        self.assertEqual(3, stats.queued)
+        self.assertGreater(stats.total_wait, 0)
+        self.assertGreaterEqual(stats.total_wait, stats.max_wait)
+
+    @requests_mock.Mocker()
+    def test_requests_release_slot(self, mock_requests):
+        mock_requests.post('https://1.2.3.4:443/wsman', [
+            {'text': '<result>yay!</result>'},
+            {'status_code': 500}])
+        client = dracclient.wsman.Client(max_in_flight=1,
+                                         **test_utils.FAKE_ENDPOINT)
+
+        client.enumerate('resource', auto_pull=False)
+        self.assertRaises(exceptions.WSManInvalidResponse, client.enumerate,
+                          'resource', auto_pull=False)
+
+        self.assertEqual(0, client.limiter.stats().in_flight)
+        self.assertEqual(2, client.limiter.stats().requests)
+
+    @requests_mock.Mocker()
+    def test_streamed_response_holds_slot(self, mock_requests):
+        mock_requests.post(
+            'https://1.2.3.4:443/wsman',
+            text=test_utils.JobEnumerations[uris.DCIM_LifecycleJob]['ok'])
+        client = dracclient.wsman.Client(max_in_flight=1,
+                                         **test_utils.FAKE_ENDPOINT)
+
+        items = client.iter_enumerate(uris.DCIM_LifecycleJob, stream=True)
+        next(items)
+        self.assertEqual(1, client.limiter.stats().in_flight)
+
+        items.close()
+        self.assertEqual(0, client.limiter.stats().in_flight)
+
+        self.assertEqual(6, len(list(client.iter_enumerate(
+            uris.DCIM_LifecycleJob, stream=True))))
+        self.assertEqual(0, client.limiter.stats().in_flight)
+
 
 class PayloadTestCase(base.BaseTest):
 
@@ -314,3 +931,75 @@ class PayloadTestCase(base.BaseTest):
 
         self.assertEqual(lxml.etree.tostring(expected_payload_obj),
                          lxml.etree.tostring(payload_obj))
+
+
+class PayloadTemplateTestCase(base.BaseTest):
+
+    def setUp(self):
+        super(PayloadTemplateTestCase, self).setUp()
+        dracclient.wsman._templates.clear()
+
+    def _assert_identical(self, payload):
+        payload.message_id = 'uuid:%s' % uuid.uuid4()
+        expected = payload._build_tree()
+
+        with mock.patch.object(uuid, 'uuid4', autospec=True) as mock_uuid:
+            mock_uuid.return_value = payload.message_id[len('uuid:'):]
+            # first build creates the template, the second one reuses it
+            self.assertEqual(expected, payload.build())
+            self.assertEqual(expected, payload.build())
+
+    def test_enumerate(self):
+        for optimization in (True, False):
+            self._assert_identical(dracclient.wsman._EnumeratePayload(
+                'http://host:443/wsman', 'http://resource', optimization,
+                42))
+
+    def test_enumerate_with_filter(self):
+        self._assert_identical(dracclient.wsman._EnumeratePayload(
+            'http://host:443/wsman', 'http://resource',
+            filter_query='select * from foo where bar > 1 & baz < "2"',
+            filter_dialect='cql'))
+
+    def test_pull(self):
+        self._assert_identical(dracclient.wsman._PullPayload(
+            'http://host:443/wsman', 'http://resource', 'context-uuid', 13))
+
+    def test_invoke(self):
+        self._assert_identical(dracclient.wsman._InvokePayload(
+            'http://host:443/wsman', 'http://resource_uri', 'method',
+            collections.OrderedDict([('selector1', 'foo'),
+                                     ('selector2', 'bar')]),
+            collections.OrderedDict([('property1', 'baz'),
+                                     ('property2', ['1', '<2>', '3&4'])])))
+
+    def test_invoke_with_empty_list(self):
+        self._assert_identical(dracclient.wsman._InvokePayload(
+            'http://host:443/wsman', 'http://resource_uri', 'method', {},
+            {'property': []}))
+
+    def test_fallback_on_special_text(self):
+        for value in (u'caf\xe9', 'line\r\n', None):
+            self._assert_identical(dracclient.wsman._InvokePayload(
+                'http://host:443/wsman', 'http://resource_uri', 'method',
+                {'selector': 'foo'}, {'property': value}))
+
+        # no template is created for payloads falling back to the tree
+        self.assertEqual(0, len(dracclient.wsman._templates))
+
+    def test_template_reused_for_different_endpoint_and_values(self):
+        for host in ('host1', 'host2'):
+            self._assert_identical(dracclient.wsman._InvokePayload(
+                'https://%s:443/wsman' % host, 'http://resource_uri',
+                'method', {'selector': host}, {'property': host}))
+
+        self.assertEqual(1, len(dracclient.wsman._templates))
+
+    def test_template_cache_is_bounded(self):
+        for i in range(dracclient.wsman.MAX_PAYLOAD_TEMPLATES + 1):
+            dracclient.wsman._InvokePayload(
+                'http://host:443/wsman', 'http://resource_uri',
+                'method%d' % i, {}, {}).build()
+
+        self.assertLessEqual(len(dracclient.wsman._templates),
+                             dracclient.wsman.MAX_PAYLOAD_TEMPLATES)
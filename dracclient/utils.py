@@ -15,6 +15,8 @@
 Common functionalities shared between different DRAC modules.
 """
 
+from dracclient import exceptions
+
 NS_XMLSchema_Instance = 'http://www.w3.org/2001/XMLSchema-instance'
 
 # ReturnValue constants
@@ -44,6 +46,19 @@ def find_xml(doc, item, namespace, find_all=False):
     return doc.find(query)
 
 
+def filter_xml(elems, item, namespace):
+    """Filter the elements of a given name.
+
+    :param elems: iterable of element objects, eg. the items of an
+                  enumeration.
+    :param item: the element name.
+    :param namespace: the namespace of the element.
+    :returns: a generator of the matching element objects.
+    """
+    tag = '{%(namespace)s}%(item)s' % {'namespace': namespace, 'item': item}
+    return (elem for elem in elems if elem.tag == tag)
+
+
 def get_wsman_resource_attr(doc, resource_uri, attr_name, nullable=False):
     """Find an attribute of a resource in an ElementTree object.
 
@@ -57,6 +72,52 @@ def get_wsman_resource_attr(doc, resource_uri, attr_name, nullable=False):
     """
     item = find_xml(doc, attr_name, resource_uri)
 
+    return _get_attr_value(item, nullable)
+
+
+def get_wsman_resource_attrs(doc, resource_uri, attr_names,
+                             nullable_attrs=()):
+    """Find multiple attributes of a resource in an ElementTree object.
+
+    Equivalent to calling get_wsman_resource_attr for each attribute, but
+    walks the children of the resource only once.
+
+    :param doc: the element tree object of the resource.
+    :param resource_uri: the resource URI of the namespace.
+    :param attr_names: iterable of the names of the attributes.
+    :param nullable_attrs: iterable of the names of the attributes which may
+                           be nil, see get_wsman_resource_attr.
+    :returns: a dictionary with the value of the attributes using their name
+              as the key.
+    :raises: AttributeError if an attribute is missing
+    """
+    prefix = '{%s}' % resource_uri
+    prefix_len = len(prefix)
+    items = dict.fromkeys(attr_names)
+
+    for item in doc.iterchildren():
+        tag = item.tag
+        # comments and processing instructions have no string tag
+        if not isinstance(tag, str) or tag[:prefix_len] != prefix:
+            continue
+
+        attr_name = tag[prefix_len:]
+        if attr_name in items and items[attr_name] is None:
+            items[attr_name] = item
+
+    nullable_attrs = frozenset(nullable_attrs)
+    result = {}
+    for (attr_name, item) in items.items():
+        if item is None:
+            # not a child of the resource, look it up in the whole subtree
+            item = find_xml(doc, attr_name, resource_uri)
+
+        result[attr_name] = _get_attr_value(item, attr_name in nullable_attrs)
+
+    return result
+
+
+def _get_attr_value(item, nullable):
     if not nullable:
         return item.text.strip()
     else:
@@ -65,6 +126,73 @@ def get_wsman_resource_attr(doc, resource_uri, attr_name, nullable=False):
             return item.text.strip()
 
 
+class WSManFieldMap(object):
+    """Declarative mapping of the attributes of a resource to a namedtuple"""
+
+    def __init__(self, resource_uri, cls, fields, nullable_attrs=()):
+        """Creates WSManFieldMap object
+
+        :param resource_uri: the resource URI of the namespace.
+        :param cls: the namedtuple class created by parse.
+        :param fields: list of tuples of the namedtuple field, the name of
+                       the attribute and optionally a function converting
+                       the value of the attribute.
+        :param nullable_attrs: names of the attributes which may be nil.
+        """
+        self.resource_uri = resource_uri
+        self.cls = cls
+        self.fields = [(field[0], field[1],
+                        field[2] if len(field) > 2 else None)
+                       for field in fields]
+        self.attr_names = frozenset(attr_name
+                                    for (_, attr_name, _) in self.fields)
+        self.nullable_attrs = frozenset(nullable_attrs)
+
+    def parse(self, doc):
+        """Creates the namedtuple from the element tree of a resource
+
+        :param doc: the element tree object of the resource.
+        :returns: a namedtuple object
+        :raises: AttributeError if an attribute is missing
+        """
+        attrs = get_wsman_resource_attrs(doc, self.resource_uri,
+                                         self.attr_names, self.nullable_attrs)
+
+        values = {}
+        for (field, attr_name, convert) in self.fields:
+            value = attrs[attr_name]
+            if convert is not None:
+                value = convert(value)
+            values[field] = value
+
+        return self.cls(**values)
+
+
+def check_return_value(doc, resource_uri, expected_return_value=None):
+    """Check the return value of a method invocation.
+
+    :param doc: the element tree object of the invocation response.
+    :param resource_uri: the resource URI of the namespace.
+    :param expected_return_value: expected return value reported back by the
+        DRAC card. If not set, only error return values are checked.
+    :raises: DRACOperationFailed on error reported back by the DRAC
+             interface
+    :raises: DRACUnexpectedReturnValue on return value mismatch
+    """
+
+    return_value = find_xml(doc, 'ReturnValue', resource_uri).text
+    if return_value == RET_ERROR:
+        message_elems = find_xml(doc, 'Message', resource_uri, True)
+        messages = [message_elem.text for message_elem in message_elems]
+        raise exceptions.DRACOperationFailed(drac_messages=messages)
+
+    if (expected_return_value is not None and
+            return_value != expected_return_value):
+        raise exceptions.DRACUnexpectedReturnValue(
+            expected_return_value=expected_return_value,
+            actual_return_value=return_value)
+
+
 def is_reboot_required(doc, resource_uri):
     """Check the response document if reboot is requested.
 
@@ -11,11 +11,19 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+from concurrent import futures
+import copy
 import logging
+import random
+import re
+import threading
+import time
 import uuid
 
 from lxml import etree as ElementTree
 import requests
+import requests.adapters
 import requests.exceptions
 
 from dracclient import exceptions
@@ -36,12 +44,100 @@ NS_MAP = {'s': NS_SOAP_ENV,
 FILTER_DIALECT_MAP = {'cql': 'http://schemas.dmtf.org/wbem/cql/1/dsp0202.pdf',
                       'wql': 'http://schemas.microsoft.com/wbem/wsman/1/WQL'}
 
+DEFAULT_POOL_SIZE = requests.adapters.DEFAULT_POOLSIZE
+
+# upper bound of the number of elements requested when adapting it to the
+# size of the responses
+MAX_ADAPTIVE_ELEMS = 512
+
+# number of bytes read at once from streamed responses
+STREAM_CHUNK_SIZE = 16384
+
+# maximum number of payload templates cached
+MAX_PAYLOAD_TEMPLATES = 256
+
+# maximum number of characters of the bodies logged
+DEFAULT_LOG_MAX_LENGTH = 4096
+
+_REDACTED = '***'
+# values of selectors and of elements named like passwords
+_SECRET_VALUES_RE = re.compile(
+    r'(<(?:[\w.-]+:)?(?:Selector|\w*Password\w*|\w*Passphrase\w*)\b'
+    r'[^>]*(?<!/)>)[^<]+', re.IGNORECASE)
+# attribute values of SetAttributes invocations setting passwords
+_SECRET_ATTRIBUTE_NAME_RE = re.compile(
+    r'AttributeName\b[^>]*>[^<]*(?:Password|Passphrase)', re.IGNORECASE)
+_ATTRIBUTE_VALUES_RE = re.compile(r'(<(?:[\w.-]+:)?AttributeValue\b'
+                                  r'[^>]*(?<!/)>)[^<]+')
+
+_monotonic = getattr(time, 'monotonic', time.time)
+
+# status codes of transient failures worth retrying
+RETRY_STATUS_CODES = (502, 503, 504)
+
+RequestStats = collections.namedtuple(
+    'RequestStats', ['operation', 'resource_uri', 'method', 'attempts',
+                     'request_size', 'response_size', 'status_code',
+                     'wait_time', 'download_time', 'parse_time', 'error'])
+
+LimiterStats = collections.namedtuple(
+    'LimiterStats', ['in_flight', 'waiting', 'requests', 'queued',
+                     'total_wait', 'max_wait'])
+
+# limiters shared by the clients talking to the same host and port
+_host_limiters = {}
+_host_limiters_lock = threading.Lock()
+
 
 class Client(object):
     """Simple client for talking over WSMan protocol."""
 
     def __init__(self, host, username, password, port=443, path='/wsman',
-                 protocol='https'):
+                 protocol='https', pool_size=DEFAULT_POOL_SIZE,
+                 idle_timeout=None, max_requests_per_connection=None,
+                 timeout=None, max_in_flight=None, retry_policy=None,
+                 observers=None, log_policy=None):
+        """Creates client object
+
+        :param host: hostname or IP of the WSMan endpoint
+        :param username: username for accessing the WSMan endpoint
+        :param password: password for accessing the WSMan endpoint
+        :param port: port for accessing the WSMan endpoint
+        :param path: path for accessing the WSMan endpoint
+        :param protocol: protocol for accessing the WSMan endpoint
+        :param pool_size: maximum number of keep-alive connections kept open
+                          to the endpoint
+        :param idle_timeout: number of seconds without any request after
+                             which the pool of connections is discarded
+                             instead of being reused. The connections are
+                             discarded together, a connection idle while
+                             others are busy is still reused. If not set,
+                             connections are reused until the endpoint
+                             closes them.
+        :param max_requests_per_connection: number of requests after which
+                                            the pool of connections is
+                                            recycled. The requests are
+                                            counted over the whole pool, so
+                                            no connection carries more, but
+                                            they are all recycled together.
+                                            If not set, there is no limit.
+        :param timeout: number of seconds to wait for the endpoint to accept
+                        the connection or to send data before giving up. If
+                        not set, waits forever.
+        :param max_in_flight: maximum number of requests in flight to the
+                              host, shared by every client talking to the
+                              same host and port. Requests over the limit wait
+                              in FIFO order. If not set, there is no limit.
+        :param retry_policy: a RetryPolicy object used to retry the requests
+                             failed with transient errors. Enumerations and
+                             pulls are retried, invocations only when marked
+                             idempotent. If not set, nothing is retried.
+        :param observers: list of Observer objects notified of every request
+        :param log_policy: a LogPolicy object controlling the logging of the
+                           bodies of the requests and responses at debug
+                           level. Defaults to truncated and redacted bodies
+                           of every request.
+        """
         self.host = host
         self.username = username
         self.password = password
@@ -53,33 +149,190 @@ class Client(object):
             'host': self.host,
             'port': self.port,
             'path': self.path})
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.max_requests_per_connection = max_requests_per_connection
+        self.timeout = timeout
+
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._session_requests = 0
+        self._session_last_used = None
+        self._prefetch_executor = None
+
+        self.retry_policy = retry_policy
+        self.observers = list(observers or ())
+        self.log_policy = log_policy or LogPolicy()
+
+        self.limiter = None
+        if max_in_flight is not None:
+            self.limiter = get_host_limiter(host, port, max_in_flight)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Closes the pooled connections to the endpoint
+
+        The client can still be used afterwards, in which case new
+        connections are opened on demand.
+        """
+        with self._session_lock:
+            self._close_session()
+
+            if self._prefetch_executor is not None:
+                self._prefetch_executor.shutdown(wait=False)
+                self._prefetch_executor = None
+
+    def _close_session(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def _create_session(self):
+        session = requests.Session()
+        session.auth = requests.auth.HTTPBasicAuth(self.username,
+                                                   self.password)
+        # TODO(ifarkas): enable cert verification
+        session.verify = False
+
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1,
+                                                pool_maxsize=self.pool_size)
+        session.mount('%s://' % self.protocol, adapter)
+
+        return session
+
+    def _get_session(self):
+        # requests doesn't expose the pooled connections, so the limits of
+        # the connections are enforced on the session holding them
+        with self._session_lock:
+            now = _monotonic()
+
+            if self._session is not None:
+                idle_expired = (
+                    self.idle_timeout is not None and
+                    now - self._session_last_used > self.idle_timeout)
+                exhausted = (
+                    self.max_requests_per_connection is not None and
+                    self._session_requests >= self.max_requests_per_connection)
+
+                if idle_expired or exhausted:
+                    LOG.debug('Recycling connections to %(endpoint)s',
+                              {'endpoint': self.endpoint})
+                    self._close_session()
+
+            if self._session is None:
+                self._session = self._create_session()
+                self._session_requests = 0
+
+            self._session_requests += 1
+            self._session_last_used = now
+
+            return self._session
+
+    def _do_request(self, payload, stream=False, retry=True,
+                    observation=None):
+        if retry and self.retry_policy is not None:
+            return self.retry_policy.call(
+                lambda: self._limited_request(payload, stream, observation))
+
+        return self._limited_request(payload, stream, observation)
+
+    def _request_xml(self, payload, retry=True):
+        # sends the request and parses the response, notifying the observers
+        if not self.observers:
+            resp = self._do_request(payload, retry=retry)
+            return ElementTree.fromstring(resp.content), len(resp.content)
+
+        observation = _Observation(payload)
+        try:
+            resp = self._do_request(payload, retry=retry,
+                                    observation=observation)
+            started = _monotonic()
+            resp_xml = ElementTree.fromstring(resp.content)
+            observation.parse_time = _monotonic() - started
+        except Exception as exc:
+            self._notify('request_finished', observation.stats(exc))
+            raise
+
+        self._notify('request_finished', observation.stats())
+        return resp_xml, len(resp.content)
+
+    def _notify(self, event, *args):
+        _notify(self.observers, event, *args)
+
+    def _limited_request(self, payload, stream, observation):
+        if self.limiter is None:
+            return self._send_request(payload, stream, observation)
+
+        self.limiter.acquire()
+        try:
+            resp = self._send_request(payload, stream, observation)
+        except Exception:
+            self.limiter.release()
+            raise
+
+        if stream:
+            # the slot is kept until the body is read
+            resp = _LimitedResponse(resp, self.limiter)
+        else:
+            self.limiter.release()
+
+        return resp
 
-    def _do_request(self, payload):
+    def _send_request(self, payload, stream, observation=None):
         payload = payload.build()
-        LOG.debug('Sending request to %(endpoint)s: %(payload)s',
-                  {'endpoint': self.endpoint, 'payload': payload})
+        log_bodies = self.log_policy.sample()
+        if log_bodies:
+            LOG.debug('Sending request to %(endpoint)s: %(payload)s',
+                      {'endpoint': self.endpoint,
+                       'payload': self.log_policy.format(payload)})
+        started = _monotonic()
         try:
-            resp = requests.post(
-                self.endpoint,
-                auth=requests.auth.HTTPBasicAuth(self.username, self.password),
-                data=payload,
-                # TODO(ifarkas): enable cert verification
-                verify=False)
+            resp = self._get_session().post(self.endpoint, data=payload,
+                                            timeout=self.timeout,
+                                            stream=stream)
         except requests.exceptions.RequestException:
             LOG.exception('Request failed')
+            if observation is not None:
+                observation.record_attempt(len(payload))
             raise exceptions.WSManRequestFailure()
 
-        LOG.debug('Received response from %(endpoint)s: %(payload)s',
-                  {'endpoint': self.endpoint, 'payload': resp.content})
+        if observation is not None:
+            observation.record_attempt(len(payload), resp,
+                                       _monotonic() - started, stream)
+
+        if stream:
+            # the size of the body is logged by the consumer of the stream
+            LOG.debug('Receiving streamed response from %(endpoint)s',
+                      {'endpoint': self.endpoint})
+        elif log_bodies:
+            LOG.debug('Received response from %(endpoint)s: %(payload)s',
+                      {'endpoint': self.endpoint,
+                       'payload': self.log_policy.format(resp.content)})
+
         if not resp.ok:
+            resp.close()
             raise exceptions.WSManInvalidResponse(
                 status_code=resp.status_code,
                 reason=resp.reason)
         else:
             return resp
 
+    def _get_prefetch_executor(self):
+        with self._session_lock:
+            if self._prefetch_executor is None:
+                self._prefetch_executor = futures.ThreadPoolExecutor(
+                    max_workers=self.pool_size)
+
+            return self._prefetch_executor
+
     def enumerate(self, resource_uri, optimization=True, max_elems=100,
-                  auto_pull=True, filter_query=None, filter_dialect='cql'):
+                  auto_pull=True, filter_query=None, filter_dialect='cql',
+                  prefetch=False, max_page_size=None):
         """Executes enumerate operation over WSMan.
 
         :param resource_uri: URI of resource to enumerate.
@@ -92,6 +345,12 @@ class Client(object):
         :param filter_query: filter query string.
         :param filter_dialect: filter dialect. Valid options are: 'cql' and
                                'wql'.
+        :param prefetch: flag to send the next pull on a background thread
+                         while the current response is being processed.
+        :param max_page_size: size of the pull responses to aim for, in bytes.
+                              If set, the number of elements requested by
+                              the next pull is adapted to the size of the
+                              previous responses, starting with max_elems.
         :returns: an lxml.etree.Element object of the response received.
         :raises: WSManRequestFailure on request failures
         :raises: WSManInvalidResponse when receiving invalid response
@@ -101,36 +360,214 @@ class Client(object):
                                     optimization, max_elems,
                                     filter_query, filter_dialect)
 
-        resp = self._do_request(payload)
-        resp_xml = ElementTree.fromstring(resp.content)
+        resp_xml, resp_size = self._request_xml(payload)
 
         if auto_pull:
-            find_items_query = './/{%s}Items' % NS_WSMAN_ENUM
-            full_resp_xml = resp_xml
-
-            context = self._enum_context(full_resp_xml)
-            while context is not None:
-                resp_xml = self.pull(resource_uri, context, max_elems)
-                context = self._enum_context(resp_xml)
-
-                items_xml = full_resp_xml.find(find_items_query)
-                if items_xml is not None:
-                    # merge enumeration items
-                    for item in resp_xml.find(find_items_query):
-                        items_xml.append(item)
-                else:
-                    full_resp_xml = resp_xml
-
-            # remove enumeration context because items are already merged
-            enum_context_elem = full_resp_xml.find('.//{%s}EnumerationContext'
-                                                   % NS_WSMAN_ENUM)
-            if enum_context_elem is not None:
-                enum_context_elem.getparent().remove(enum_context_elem)
+            pages = self._iter_pages(resource_uri, resp_xml, resp_size,
+                                     max_elems, prefetch, max_page_size)
+            enumeration = _Enumeration(next(pages))
+            for page in pages:
+                enumeration.add(page)
 
-            return full_resp_xml
+            return enumeration.result()
         else:
             return resp_xml
 
+    def iter_enumerate(self, resource_uri, max_elems=100, filter_query=None,
+                       filter_dialect='cql', prefetch=False,
+                       max_page_size=None, stream=False):
+        """Executes enumerate operation over WSMan, yielding the items.
+
+        Unlike enumerate with auto_pull, the items are not merged into a
+        single document. Each page is pulled only when the items of the
+        previous one are consumed and it is released afterwards.
+
+        With stream, the responses are parsed while they are being received
+        and each item is yielded as soon as it is complete, detached from
+        the response document. Neither the body nor the document of a whole
+        response is kept in memory then.
+
+        :param resource_uri: URI of resource to enumerate.
+        :param max_elems: maximum number of elements returned by a single
+                          operation.
+        :param filter_query: filter query string.
+        :param filter_dialect: filter dialect. Valid options are: 'cql' and
+                               'wql'.
+        :param prefetch: flag to pull the next page on a background thread
+                         while the items of the current one are consumed.
+        :param max_page_size: size of the pull responses to aim for, in bytes.
+                              See enumerate.
+        :param stream: flag to parse the responses incrementally. Can't be
+                       combined with prefetch.
+        :returns: a generator of lxml.etree.Element objects of the items
+                  received.
+        :raises: WSManRequestFailure on request failures
+        :raises: WSManInvalidResponse when receiving invalid response
+        :raises: InvalidParameterValue when combining stream and prefetch
+        """
+
+        payload = _EnumeratePayload(self.endpoint, resource_uri, True,
+                                    max_elems, filter_query, filter_dialect)
+
+        if stream:
+            if prefetch:
+                raise exceptions.InvalidParameterValue(
+                    reason="'stream' and 'prefetch' are mutually exclusive")
+
+            return self._iter_streamed_items(payload, resource_uri, max_elems,
+                                             max_page_size)
+        else:
+            return self._iter_items(payload, resource_uri, max_elems,
+                                    prefetch, max_page_size)
+
+    def _iter_items(self, payload, resource_uri, max_elems, prefetch,
+                    max_page_size):
+        resp_xml, resp_size = self._request_xml(payload)
+
+        pages = self._iter_pages(resource_uri, resp_xml, resp_size,
+                                 max_elems, prefetch, max_page_size)
+        del resp_xml
+
+        for page in pages:
+            items = _enum_items(page)
+            del page
+
+            for item in items:
+                yield item
+
+            del items
+
+    def _iter_streamed_items(self, payload, resource_uri, max_elems,
+                             max_page_size):
+        sizer = None
+        if max_page_size is not None:
+            sizer = _PageSizer(max_elems, max_page_size)
+
+        pages = 0
+        while True:
+            page = _StreamedPage()
+            for item in self._stream_page(payload, page):
+                yield item
+            pages += 1
+
+            if page.context is None:
+                self._notify('enumeration_finished', resource_uri, pages)
+                return
+
+            if sizer is not None:
+                sizer.update_count(page.size, page.items_count)
+                max_elems = sizer.max_elems
+
+            payload = _PullPayload(self.endpoint, resource_uri, page.context,
+                                   max_elems)
+
+    def _stream_page(self, payload, page):
+        observation = None
+        if self.observers:
+            observation = _Observation(payload)
+
+        try:
+            resp = self._do_request(payload, stream=True,
+                                    observation=observation)
+        except Exception as exc:
+            if observation is not None:
+                self._notify('request_finished', observation.stats(exc))
+            raise
+
+        parser = ElementTree.XMLPullParser(events=('end',))
+        chunks = resp.iter_content(STREAM_CHUNK_SIZE)
+        download_time = parse_time = 0.0
+        complete = False
+
+        try:
+            while True:
+                started = _monotonic()
+                chunk = next(chunks, None)
+                download_time += _monotonic() - started
+                if chunk is None:
+                    break
+
+                page.size += len(chunk)
+                started = _monotonic()
+                parser.feed(chunk)
+                parse_time += _monotonic() - started
+                for item in page.read_events(parser):
+                    yield item
+
+            started = _monotonic()
+            parser.close()
+            parse_time += _monotonic() - started
+            for item in page.read_events(parser):
+                yield item
+
+            complete = True
+        except Exception as exc:
+            if observation is not None:
+                observation.record_stream(page.size, download_time,
+                                          parse_time)
+                self._notify('request_finished', observation.stats(exc))
+            raise
+        finally:
+            if not complete:
+                # drop the connection instead of reading the rest of the body
+                resp.close()
+
+        LOG.debug('Received streamed response from %(endpoint)s: '
+                  '%(size)d bytes, %(count)d items',
+                  {'endpoint': self.endpoint, 'size': page.size,
+                   'count': page.items_count})
+
+        if observation is not None:
+            observation.record_stream(page.size, download_time, parse_time)
+            self._notify('request_finished', observation.stats())
+
+    def _iter_pages(self, resource_uri, resp_xml, resp_size, max_elems,
+                    prefetch, max_page_size):
+        sizer = None
+        if max_page_size is not None:
+            sizer = _PageSizer(max_elems, max_page_size)
+            sizer.update(resp_size, resp_xml)
+
+        next_page = None
+        pages = 0
+        try:
+            while True:
+                context = _enum_context(resp_xml)
+                if context is not None and prefetch:
+                    next_page = self._get_prefetch_executor().submit(
+                        self._pull_page, resource_uri, context, max_elems,
+                        sizer)
+
+                yield resp_xml
+                pages += 1
+
+                if context is None:
+                    self._notify('enumeration_finished', resource_uri, pages)
+                    return
+
+                if next_page is not None:
+                    resp_xml = next_page.result()
+                    next_page = None
+                else:
+                    resp_xml = self._pull_page(resource_uri, context,
+                                               max_elems, sizer)
+        finally:
+            # a pull already running shares the session with the caller, so
+            # it is waited for instead of being left behind
+            if next_page is not None and not next_page.cancel():
+                futures.wait([next_page])
+
+    def _pull_page(self, resource_uri, context, max_elems, sizer):
+        if sizer is None:
+            return self.pull(resource_uri, context, max_elems)
+
+        payload = _PullPayload(self.endpoint, resource_uri, context,
+                               sizer.max_elems)
+        resp_xml, resp_size = self._request_xml(payload)
+        sizer.update(resp_size, resp_xml)
+
+        return resp_xml
+
     def pull(self, resource_uri, context, max_elems=100):
         """Executes pull operation over WSMan.
 
@@ -144,18 +581,21 @@ class Client(object):
 
         payload = _PullPayload(self.endpoint, resource_uri, context,
                                max_elems)
-        resp = self._do_request(payload)
-        resp_xml = ElementTree.fromstring(resp.content)
+        resp_xml, _ = self._request_xml(payload)
 
         return resp_xml
 
-    def invoke(self, resource_uri, method, selectors, properties):
+    def invoke(self, resource_uri, method, selectors, properties,
+               idempotent=False):
         """Executes invoke operation over WSMan.
 
         :param resource_uri: URI of resource to invoke
         :param method: name of the method to invoke
         :param selector: dict of selectors
         :param properties: dict of properties
+        :param idempotent: indicates whether invoking the method again has no
+                           further effect, in which case failed requests are
+                           retried according to the retry policy
         :returns: an lxml.etree.Element object of the response received.
         :raises: WSManRequestFailure on request failures
         :raises: WSManInvalidResponse when receiving invalid response
@@ -163,27 +603,559 @@ class Client(object):
 
         payload = _InvokePayload(self.endpoint, resource_uri, method,
                                  selectors, properties)
-        resp = self._do_request(payload)
-        resp_xml = ElementTree.fromstring(resp.content)
+        resp_xml, _ = self._request_xml(payload, retry=idempotent)
 
         return resp_xml
 
-    def _enum_context(self, resp):
-        context_elem = resp.find('.//{%s}EnumerationContext' % NS_WSMAN_ENUM)
-        if context_elem is not None:
-            return context_elem.text
+
+def _enum_context(resp):
+    context_elem = resp.find('.//{%s}EnumerationContext' % NS_WSMAN_ENUM)
+    if context_elem is not None:
+        return context_elem.text
+
+
+def _enum_items(resp):
+    # optimized enumerations return the first page in the wsman namespace,
+    # pulls in the enumeration namespace
+    for namespace in (NS_WSMAN, NS_WSMAN_ENUM):
+        items_elem = resp.find('.//{%s}Items' % namespace)
+        if items_elem is not None:
+            return list(items_elem.iterchildren(ElementTree.Element))
+
+    return []
+
+
+class _PageSizer(object):
+    """Adapts the number of elements pulled to the size of the responses.
+
+    Shared by the blocking and the asyncio clients.
+    """
+
+    def __init__(self, max_elems, max_page_size):
+        self.max_elems = max_elems
+        self.max_page_size = max_page_size
+
+    def update(self, resp_size, resp_xml):
+        """Accounts for a response received."""
+
+        self.update_count(resp_size, len(_enum_items(resp_xml)))
+
+    def update_count(self, resp_size, items_count):
+        """Accounts for a response received with the given item count."""
+
+        if not items_count:
+            return
+
+        # the envelope is accounted to the items as well, which slightly
+        # underestimates the number of elements fitting in a page
+        item_size = max(1, resp_size // items_count)
+        self.max_elems = max(1, min(MAX_ADAPTIVE_ELEMS,
+                                    self.max_page_size // item_size))
+
+
+class _StreamedPage(object):
+    """State of an enumeration response parsed while it is received."""
+
+    _items_tags = frozenset(['{%s}Items' % NS_WSMAN,
+                             '{%s}Items' % NS_WSMAN_ENUM])
+    _context_tag = '{%s}EnumerationContext' % NS_WSMAN_ENUM
+
+    def __init__(self):
+        self.context = None
+        self.size = 0
+        self.items_count = 0
+
+    def read_events(self, parser):
+        """Yields the items completed by the data fed to the parser."""
+
+        for (_, elem) in parser.read_events():
+            parent = elem.getparent()
+            if parent is not None and parent.tag in self._items_tags:
+                # detach the item, so that it is freed once the consumer
+                # is done with it
+                parent.remove(elem)
+                self.items_count += 1
+                yield elem
+            elif elem.tag == self._context_tag:
+                self.context = elem.text
+
+
+class RetryPolicy(object):
+    """Retries requests failed with transient errors
+
+    Failed connections and responses with a status code in
+    RETRY_STATUS_CODES are retried with an exponentially growing, randomized
+    delay, until max_attempts or max_elapsed is reached. The retries are
+    limited by a budget, refilled by the requests, so that a failing endpoint
+    isn't flooded with them. The policy can be shared by many clients.
+    """
+
+    def __init__(self, max_attempts=3, backoff=0.5, max_backoff=10,
+                 max_elapsed=30, budget=10, budget_ratio=0.2,
+                 status_codes=RETRY_STATUS_CODES):
+        """Creates RetryPolicy object
+
+        :param max_attempts: maximum number of attempts of a request
+        :param backoff: number of seconds before the first retry
+        :param max_backoff: maximum number of seconds between retries
+        :param max_elapsed: number of seconds since the first attempt after
+                            which a request isn't retried anymore
+        :param budget: maximum number of retries available at once
+        :param budget_ratio: number of retries added to the budget by every
+                             request
+        :param status_codes: status codes of the responses retried
+        """
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_elapsed = max_elapsed
+        self.budget = budget
+        self.budget_ratio = budget_ratio
+        self.status_codes = frozenset(status_codes)
+
+        self._lock = threading.Lock()
+        self._tokens = float(budget)
+
+    def call(self, request):
+        """Calls request, retrying it on transient errors
+
+        :param request: callable without arguments sending the request
+        :returns: the return value of request
+        :raises: the exception raised by the last attempt
+        """
+        self._refill()
+
+        started = _monotonic()
+        attempt = 1
+        while True:
+            try:
+                return request()
+            except (exceptions.WSManRequestFailure,
+                    exceptions.WSManInvalidResponse) as exc:
+                delay = self._retry_delay(exc, attempt, started)
+                if delay is None:
+                    raise
+
+            LOG.debug('Retrying request in %(delay).2f seconds, attempt '
+                      '%(attempt)d of %(max_attempts)d',
+                      {'delay': delay, 'attempt': attempt + 1,
+                       'max_attempts': self.max_attempts})
+            time.sleep(delay)
+            attempt += 1
+
+    def _refill(self):
+        # every request adds to the budget
+        with self._lock:
+            self._tokens = min(self.budget, self._tokens + self.budget_ratio)
+
+    def _retry_delay(self, exc, attempt, started):
+        if attempt >= self.max_attempts:
+            return None
+
+        if (isinstance(exc, exceptions.WSManInvalidResponse) and
+                exc.kwargs.get('status_code') not in self.status_codes):
+            return None
+
+        interval = min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+        delay = random.uniform(interval / 2.0, interval)
+        if _monotonic() + delay - started > self.max_elapsed:
+            return None
+
+        with self._lock:
+            if self._tokens < 1:
+                LOG.warning('Retry budget exhausted, not retrying request')
+                return None
+            self._tokens -= 1
+
+        return delay
+
+
+class LogPolicy(object):
+    """Controls the logging of the request and response bodies
+
+    The bodies are only formatted when debug logging is enabled and the
+    request is sampled. Selector values and anything looking like a password
+    are redacted, and long bodies are truncated.
+    """
+
+    def __init__(self, max_length=DEFAULT_LOG_MAX_LENGTH, sample_rate=1.0,
+                 redact=True):
+        """Creates LogPolicy object
+
+        :param max_length: maximum number of characters logged of a body. If
+                           None, bodies aren't truncated.
+        :param sample_rate: ratio of the requests whose bodies are logged,
+                            between 0 and 1
+        :param redact: flag to redact the selectors and the passwords
+        """
+        self.max_length = max_length
+        self.sample_rate = sample_rate
+        self.redact = redact
+
+    def sample(self):
+        """Returns whether the bodies of a request should be logged"""
+
+        if not LOG.isEnabledFor(logging.DEBUG):
+            return False
+
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def format(self, body):
+        """Returns the loggable text of a body
+
+        :param body: body of a request or response, as text or bytes
+        """
+        if isinstance(body, bytes):
+            body = body.decode('utf-8', 'replace')
+
+        if self.redact:
+            body = _SECRET_VALUES_RE.sub(r'\1' + _REDACTED, body)
+            if _SECRET_ATTRIBUTE_NAME_RE.search(body):
+                body = _ATTRIBUTE_VALUES_RE.sub(r'\1' + _REDACTED, body)
+
+        if self.max_length is not None and len(body) > self.max_length:
+            body = '%s... (%d characters truncated)' % (
+                body[:self.max_length], len(body) - self.max_length)
+
+        return body
+
+
+class Observer(object):
+    """Base class of the observers of the requests sent by a Client
+
+    The observers are called from the thread sending the request, so they
+    must be thread-safe and quick.
+    """
+
+    def request_finished(self, stats):
+        """Called when a request has finished, successfully or not
+
+        :param stats: a RequestStats object. The wait_time is the number of
+                      seconds between sending the request and receiving the
+                      headers of the response, including establishing the
+                      connection, download_time is the time spent reading
+                      the body and parse_time is the time spent parsing it.
+                      Timings are of the last attempt, except for
+                      parse_time. error is the exception raised by the
+                      request, if any.
+        """
+
+    def enumeration_finished(self, resource_uri, pages):
+        """Called when every page of an enumeration has been received
+
+        :param resource_uri: URI of the enumerated resource
+        :param pages: number of pages, the Enumerate response and the Pull
+                      ones
+        """
+
+
+def _notify(observers, event, *args):
+    for observer in observers:
+        try:
+            getattr(observer, event)(*args)
+        except Exception:
+            # instrumentation must not break the requests
+            LOG.exception('Observer %(observer)r failed on %(event)s',
+                          {'observer': observer, 'event': event})
+
+
+class _Observation(object):
+    """Statistics of a request being sent"""
+
+    def __init__(self, payload):
+        self.operation = payload.operation
+        self.resource_uri = payload.resource_uri
+        self.method = getattr(payload, 'method', None)
+        self.attempts = 0
+        self.request_size = 0
+        self.response_size = 0
+        self.status_code = None
+        self.wait_time = 0.0
+        self.download_time = 0.0
+        self.parse_time = 0.0
+
+    def record_attempt(self, request_size, resp=None, duration=0.0,
+                       stream=False):
+        self.attempts += 1
+        self.request_size = request_size
+        if resp is None:
+            return
+
+        self.status_code = resp.status_code
+        self.wait_time = min(resp.elapsed.total_seconds(), duration)
+        if not stream:
+            self.response_size = len(resp.content)
+            self.download_time = duration - self.wait_time
+
+    def record_stream(self, response_size, download_time, parse_time):
+        self.response_size = response_size
+        self.download_time = download_time
+        self.parse_time = parse_time
+
+    def stats(self, error=None):
+        return RequestStats(
+            operation=self.operation, resource_uri=self.resource_uri,
+            method=self.method, attempts=self.attempts,
+            request_size=self.request_size,
+            response_size=self.response_size, status_code=self.status_code,
+            wait_time=self.wait_time, download_time=self.download_time,
+            parse_time=self.parse_time, error=error)
+
+
+def get_host_limiter(host, port, max_in_flight):
+    """Returns the limiter shared by the clients of a host
+
+    :param host: hostname or IP of the WSMan endpoint
+    :param port: port of the WSMan endpoint
+    :param max_in_flight: maximum number of requests in flight, only used
+                          when creating the limiter
+    :returns: a HostLimiter object
+    """
+    with _host_limiters_lock:
+        limiter = _host_limiters.get((host, port))
+        if limiter is None:
+            limiter = HostLimiter(max_in_flight)
+            _host_limiters[(host, port)] = limiter
+
+        return limiter
+
+
+class HostLimiter(object):
+    """Limits the number of requests in flight to a host
+
+    Requests over the limit wait in FIFO order for a slot to be released.
+    """
+
+    def __init__(self, max_in_flight):
+        """Creates HostLimiter object
+
+        :param max_in_flight: maximum number of requests in flight
+        :raises: InvalidParameterValue on non-positive max_in_flight
+        """
+        if max_in_flight < 1:
+            raise exceptions.InvalidParameterValue(
+                reason="'max_in_flight' must be a positive integer")
+
+        self.max_in_flight = max_in_flight
+        self._lock = threading.Lock()
+        self._waiters = collections.deque()
+        self._in_flight = 0
+        self._requests = 0
+        self._queued = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    def acquire(self):
+        """Waits for a free slot"""
+
+        with self._lock:
+            self._requests += 1
+            if self._in_flight < self.max_in_flight and not self._waiters:
+                self._in_flight += 1
+                return
+
+            waiter = threading.Event()
+            self._waiters.append(waiter)
+            self._queued += 1
+
+        started = _monotonic()
+        # the slot is handed over by release
+        waiter.wait()
+        waited = _monotonic() - started
+
+        with self._lock:
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+
+    def release(self):
+        """Releases a slot, handing it over to the first waiter"""
+
+        with self._lock:
+            if self._waiters:
+                self._waiters.popleft().set()
+            else:
+                self._in_flight -= 1
+
+    def stats(self):
+        """Returns the usage of the limiter
+
+        :returns: a LimiterStats object with the number of requests in flight
+                  and waiting, the number of requests and the ones which had
+                  to wait, and the total and maximum seconds spent waiting
+        """
+        with self._lock:
+            return LimiterStats(
+                in_flight=self._in_flight, waiting=len(self._waiters),
+                requests=self._requests, queued=self._queued,
+                total_wait=self._total_wait, max_wait=self._max_wait)
+
+
+class _LimitedResponse(object):
+    """Streamed response holding a slot of a HostLimiter until it's read"""
+
+    def __init__(self, resp, limiter):
+        self._resp = resp
+        self._limiter = limiter
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._resp, name)
+
+    def iter_content(self, chunk_size):
+        try:
+            for chunk in self._resp.iter_content(chunk_size):
+                yield chunk
+        finally:
+            self._release()
+
+    def close(self):
+        try:
+            self._resp.close()
+        finally:
+            self._release()
+
+    def _release(self):
+        if not self._released:
+            self._released = True
+            self._limiter.release()
+
+
+class _Enumeration(object):
+    """Merges the items of an enumeration received in multiple responses.
+
+    Shared by the blocking and the asyncio clients, so that both of them
+    return the same document for the same sequence of responses.
+    """
+
+    def __init__(self, resp_xml):
+        self.full_resp_xml = resp_xml
+        self.context = _enum_context(resp_xml)
+
+    def add(self, resp_xml):
+        """Merges the items of a pull response into the enumeration."""
+
+        find_items_query = './/{%s}Items' % NS_WSMAN_ENUM
+        self.context = _enum_context(resp_xml)
+
+        items_xml = self.full_resp_xml.find(find_items_query)
+        if items_xml is not None:
+            # merge enumeration items
+            for item in resp_xml.find(find_items_query):
+                items_xml.append(item)
+        else:
+            self.full_resp_xml = resp_xml
+
+    def result(self):
+        """Returns the merged response document."""
+
+        # remove enumeration context because items are already merged
+        enum_context_elem = self.full_resp_xml.find(
+            './/{%s}EnumerationContext' % NS_WSMAN_ENUM)
+        if enum_context_elem is not None:
+            enum_context_elem.getparent().remove(enum_context_elem)
+
+        return self.full_resp_xml
+
+
+# text which is serialized by lxml the same way as by _escape_text
+_TEMPLATE_SAFE_TEXT = re.compile(r'[\t\n\x20-\x7e]*\Z')
+_TEMPLATE_MARKER = 'dracclient%sfield' % uuid.uuid4().hex
+_TEMPLATE_MARKER_RE = re.compile(r'%s(\d+)_' % _TEMPLATE_MARKER)
+
+_templates = {}
+
+
+def _escape_text(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace(
+        '>', '&gt;').encode('ascii')
+
+
+class _PayloadTemplate(object):
+    """Serialized payload with placeholders for the text of its elements.
+
+    Payloads of the same structure only differ in the text of some of their
+    elements, eg. MessageID or the selector values, so the serialized
+    document is split at those and the pieces are reused.
+    """
+
+    def __init__(self, chunks, fields):
+        self.chunks = chunks
+        self.fields = fields
+
+    @classmethod
+    def create(cls, payload, fields_count):
+        markers = ['%s%d_' % (_TEMPLATE_MARKER, i)
+                   for i in range(fields_count)]
+        doc = payload._with_fields(markers)._build_tree().decode('ascii')
+        parts = _TEMPLATE_MARKER_RE.split(doc)
+
+        return cls([chunk.encode('ascii') for chunk in parts[0::2]],
+                   [int(field) for field in parts[1::2]])
+
+    def render(self, values):
+        result = [self.chunks[0]]
+        for (field, chunk) in zip(self.fields, self.chunks[1:]):
+            result.append(_escape_text(values[field]))
+            result.append(chunk)
+
+        return b''.join(result)
 
 
 class _Payload(object):
-    """Payload generation for WSMan requests."""
+    """Payload generation for WSMan requests.
+
+    Subclasses describe the variable text of the payload in
+    _template_fields, which allows reusing the serialized document of
+    payloads with the same _template_key instead of building a new tree.
+    """
 
     def build(self):
+        self.message_id = 'uuid:%s' % uuid.uuid4()
+
+        values = self._template_fields()
+        if not all(isinstance(value, str) and _TEMPLATE_SAFE_TEXT.match(value)
+                   for value in values):
+            return self._build_tree()
+
+        key = self._template_key()
+        template = _templates.get(key)
+        if template is None:
+            template = _PayloadTemplate.create(self, len(values))
+            if len(_templates) >= MAX_PAYLOAD_TEMPLATES:
+                _templates.clear()
+            _templates[key] = template
+
+        return template.render(values)
+
+    def _build_tree(self):
         request = self._create_envelope()
         self._add_header(request)
         self._add_body(request)
 
         return ElementTree.tostring(request)
 
+    def _template_key(self):
+        """Returns the key identifying the structure of the payload."""
+
+        raise NotImplementedError()
+
+    def _template_fields(self):
+        """Returns the variable text of the payload."""
+
+        raise NotImplementedError()
+
+    def _with_fields(self, values):
+        """Returns a copy of the payload with the variable text replaced."""
+
+        raise NotImplementedError()
+
     def _create_envelope(self):
         return ElementTree.Element('{%s}Envelope' % NS_SOAP_ENV, nsmap=NS_MAP)
 
@@ -204,7 +1176,7 @@ class _Payload(object):
         msg_id_elem = ElementTree.SubElement(header,
                                              '{%s}MessageID' % NS_WS_ADDR)
         msg_id_elem.set(qn_must_understand, 'true')
-        msg_id_elem.text = 'uuid:%s' % uuid.uuid4()
+        msg_id_elem.text = self.message_id
 
         reply_to_elem = ElementTree.SubElement(header,
                                                '{%s}ReplyTo' % NS_WS_ADDR)
@@ -221,6 +1193,8 @@ class _Payload(object):
 class _EnumeratePayload(_Payload):
     """Payload generation for WSMan enumerate operation."""
 
+    operation = 'Enumerate'
+
     def __init__(self, endpoint, resource_uri, optimization=True,
                  max_elems=100, filter_query=None, filter_dialect=None):
         self.endpoint = endpoint
@@ -240,6 +1214,31 @@ class _EnumeratePayload(_Payload):
 
             self.filter_query = filter_query
 
+    def _template_key(self):
+        return ('enumerate', self.filter_dialect, bool(self.optimization))
+
+    def _template_fields(self):
+        values = [self.endpoint, self.resource_uri, self.message_id]
+        if self.filter_query is not None:
+            values.append(self.filter_query)
+        if self.optimization:
+            values.append(str(self.max_elems))
+
+        return values
+
+    def _with_fields(self, values):
+        payload = copy.copy(self)
+        values = list(values)
+        (payload.endpoint, payload.resource_uri,
+         payload.message_id) = values[:3]
+        del values[:3]
+        if self.filter_query is not None:
+            payload.filter_query = values.pop(0)
+        if self.optimization:
+            payload.max_elems = values.pop(0)
+
+        return payload
+
     def _add_header(self, envelope):
         header = super(_EnumeratePayload, self)._add_header(envelope)
 
@@ -282,12 +1281,28 @@ class _EnumeratePayload(_Payload):
 class _PullPayload(_Payload):
     """Payload generation for WSMan pull operation."""
 
+    operation = 'Pull'
+
     def __init__(self, endpoint, resource_uri, context, max_elems=100):
         self.endpoint = endpoint
         self.resource_uri = resource_uri
         self.context = context
         self.max_elems = max_elems
 
+    def _template_key(self):
+        return ('pull',)
+
+    def _template_fields(self):
+        return [self.endpoint, self.resource_uri, self.message_id,
+                self.context, str(self.max_elems)]
+
+    def _with_fields(self, values):
+        payload = copy.copy(self)
+        (payload.endpoint, payload.resource_uri, payload.message_id,
+         payload.context, payload.max_elems) = values
+
+        return payload
+
     def _add_header(self, envelope):
         header = super(_PullPayload, self)._add_header(envelope)
 
@@ -321,6 +1336,8 @@ class _PullPayload(_Payload):
 class _InvokePayload(_Payload):
     """Payload generation for WSMan invoke operation."""
 
+    operation = 'Invoke'
+
     def __init__(self, endpoint, resource_uri, method, selectors=None,
                  properties=None):
         self.endpoint = endpoint
@@ -329,6 +1346,46 @@ class _InvokePayload(_Payload):
         self.selectors = selectors
         self.properties = properties
 
+    def _template_key(self):
+        # the resource URI is also the namespace of the properties, so it
+        # is part of the structure
+        properties = tuple(
+            (name, len(value) if isinstance(value, list) else None)
+            for (name, value) in self.properties.items())
+
+        return ('invoke', self.resource_uri, self.method,
+                tuple(self.selectors), properties)
+
+    def _template_fields(self):
+        values = [self.endpoint, self.message_id]
+        values.extend(self.selectors.values())
+        for value in self.properties.values():
+            if isinstance(value, list):
+                values.extend(value)
+            else:
+                values.append(value)
+
+        return values
+
+    def _with_fields(self, values):
+        payload = copy.copy(self)
+        values = iter(values)
+        payload.endpoint = next(values)
+        payload.message_id = next(values)
+        # ordered like the source payload, whose key and fields follow the
+        # iteration order of its dictionaries
+        payload.selectors = collections.OrderedDict(
+            (name, next(values)) for name in self.selectors)
+
+        payload.properties = collections.OrderedDict()
+        for (name, value) in self.properties.items():
+            if isinstance(value, list):
+                payload.properties[name] = [next(values) for _ in value]
+            else:
+                payload.properties[name] = next(values)
+
+        return payload
+
     def _add_header(self, envelope):
         header = super(_InvokePayload, self)._add_header(envelope)
 